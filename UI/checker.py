@@ -0,0 +1,78 @@
+import threading
+from typing import NamedTuple, Optional, Tuple
+
+
+class CheckResult(NamedTuple):
+    seq: int
+    first_error: int
+    complete: bool
+
+
+class AsyncChecker:
+    """
+    Compares the buffer against the target on a worker thread.
+
+    submit() takes a native snapshot of the buffer, so the Tk thread can keep editing the
+    original, and hands it to the worker. Only the newest snapshot is kept: one that was
+    superseded before the worker picked it up is never checked. The native comparison
+    releases the GIL, so input keeps flowing while a large buffer is being walked.
+
+    Every submission gets a sequence number; poll() only hands out the result of the
+    latest one; anything older is stale and dropped.
+    """
+
+    def __init__(self) -> None:
+        self.seq: int = 0
+        self._cond = threading.Condition()
+        self._job: Optional[Tuple[int, object, bytes]] = None   # (seq, snapshot, target bytes)
+        self._result: Optional[CheckResult] = None
+        self._closed: bool = False
+        self._thread = threading.Thread(target=self._run, name="correctness-checker", daemon=True)
+        self._thread.start()
+
+    def submit(self, buffer, encoded: bytes) -> int:
+        snapshot = buffer.snapshot()
+        with self._cond:
+            self.seq += 1
+            self._job = (self.seq, snapshot, encoded)
+            self._result = None
+            self._cond.notify()
+            return self.seq
+
+    def invalidate(self) -> None:
+        """Drops whatever is queued or in flight (e.g. the run was reset)."""
+        with self._cond:
+            self.seq += 1
+            self._job = None
+            self._result = None
+
+    def poll(self) -> Optional[CheckResult]:
+        """Result of the latest submission, once; None while it is still running."""
+        with self._cond:
+            res = self._result
+            if res is None or res.seq != self.seq:
+                return None
+            self._result = None
+            return res
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._job is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                seq, snapshot, encoded = self._job
+                self._job = None
+
+            first_error, complete = snapshot.check_equal_so_far(encoded)
+
+            with self._cond:
+                if seq == self.seq:
+                    self._result = CheckResult(seq, first_error, complete)
@@ -0,0 +1,140 @@
+import os
+import struct
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import implicit_treap
+from clipboard import Clip, HISTORY_SIZE, REGISTER_COUNT
+from engine import EngineState
+from replay import EditLog
+from session import GameSession
+
+_HERE: str = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHECKPOINT_PATH: str = os.path.join(_HERE, "run.ckpt")
+
+
+@dataclass
+class Checkpoint:
+    """
+    Saved state of an unfinished run: engine state, buffer, edit log, clipboard and the
+    metrics counters that cannot be recomputed from the text.
+
+    Treaps are stored as implicittreap32.dumps() blobs (raw code points), so saving is one
+    walk per treap and loading builds each one in O(N), no per-char inserts. A clip held
+    by a register and by the history ring is stored once.
+    """
+    engine: EngineState
+    buffer: bytes                      # implicittreap32.dumps()
+    log: bytes                         # EditLog.to_bytes()
+    keystrokes: int = 0
+    chars_typed: int = 0
+    errors: int = 0
+    clips: List[bytes] = field(default_factory=list)
+    registers: List[int] = field(default_factory=list)   # clip index per register, -1 = empty
+    history: List[int] = field(default_factory=list)     # clip index per history slot, newest first
+
+    MAGIC = b"PPCK"
+    VERSION = 1
+    # magic, version, keystrokes, chars typed, errors, clip count, register count, history length
+    _HEADER = struct.Struct("<4sHIIIHBB")
+
+    @property
+    def difficulty(self) -> str:
+        return self.engine.difficulty
+
+    @classmethod
+    def capture(cls, session: GameSession) -> "Checkpoint":
+        clipboard = session.clipboard
+        clips: List[bytes] = []
+        index: Dict[int, int] = {}
+
+        def clip_index(clip: Optional[Clip]) -> int:
+            if clip is None:
+                return -1
+            if id(clip) not in index:
+                index[id(clip)] = len(clips)
+                clips.append(clip.tree.dumps())
+            return index[id(clip)]
+
+        metrics = session.metrics
+        return cls(session.engine.state(), session.buffer.dumps(), session.log.to_bytes(),
+                   metrics.keystrokes, metrics.chars_typed, metrics.errors, clips,
+                   [clip_index(clip) for clip in clipboard.registers],
+                   [clip_index(clip) for clip in clipboard.history])
+
+    def restore(self, session: GameSession) -> str:
+        """
+        Puts the run back into a session (and its engine).
+
+        Returns:
+            str: the buffer text, for the widget
+        """
+        session.engine.restore(self.engine)
+        text = session.restore(implicit_treap.implicittreap32.loads(self.buffer), EditLog.from_bytes(self.log))
+
+        metrics = session.metrics
+        metrics.keystrokes = self.keystrokes
+        metrics.chars_typed = self.chars_typed
+        metrics.errors = self.errors
+
+        clips = [Clip(implicit_treap.implicittreap32.loads(raw)) for raw in self.clips]
+        clipboard = session.clipboard
+        clipboard.registers = [clips[i] if i != -1 else None for i in self.registers]
+        clipboard.history.clear()
+        clipboard.history.extend(clips[i] for i in self.history)
+        return text
+
+    # -------------------------------------------------------------------------
+    # Serialization
+    # -------------------------------------------------------------------------
+    # header, then every blob (engine, buffer, log, clips...) prefixed with its
+    # u32 length, then the register and history slot arrays
+    # -------------------------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        parts = [self._HEADER.pack(self.MAGIC, self.VERSION, self.keystrokes, self.chars_typed, self.errors,
+                                   len(self.clips), len(self.registers), len(self.history))]
+        for blob in [self.engine.to_bytes(), self.buffer, self.log] + self.clips:
+            parts.append(struct.pack("<I", len(blob)))
+            parts.append(blob)
+        parts.append(array("h", self.registers + self.history).tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Checkpoint":
+        magic, version, keystrokes, chars_typed, errors, n_clips, n_registers, n_history = \
+            cls._HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Not a checkpoint")
+        if n_registers != REGISTER_COUNT or n_history > HISTORY_SIZE:
+            raise ValueError("Invalid checkpoint: clipboard layout changed")
+
+        view = memoryview(data)
+        pos = cls._HEADER.size
+        blobs: List[bytes] = []
+        for _ in range(3 + n_clips):
+            (n,) = struct.unpack_from("<I", view, pos)
+            blobs.append(view[pos + 4:pos + 4 + n].tobytes())
+            pos += 4 + n
+        slots = array("h")
+        slots.frombytes(view[pos:pos + 2 * (n_registers + n_history)].tobytes())
+        if len(slots) != n_registers + n_history:
+            raise ValueError("Invalid checkpoint: truncated")
+        # a register may be empty (-1), a history slot always holds a clip
+        if any(not -1 <= i < n_clips for i in slots[:n_registers]) or \
+                any(not 0 <= i < n_clips for i in slots[n_registers:]):
+            raise ValueError("Invalid checkpoint: bad clip index")
+
+        engine, buffer, log = blobs[:3]
+        return cls(EngineState.from_bytes(engine), buffer, log, keystrokes, chars_typed, errors,
+                   blobs[3:], slots[:n_registers].tolist(), slots[n_registers:].tolist())
+
+
+def read(path: str = DEFAULT_CHECKPOINT_PATH) -> Optional[Checkpoint]:
+    """The checkpoint at path, None when there is none (or it cannot be read)."""
+    try:
+        with open(path, "rb") as f:
+            return Checkpoint.from_bytes(f.read())
+    except (OSError, ValueError, struct.error):
+        return None
@@ -0,0 +1,98 @@
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+# registers 0-9; 0 is the default one Ctrl+C / Ctrl+X / Ctrl+V use
+REGISTER_COUNT: int = 10
+# how many past clips the history ring keeps
+HISTORY_SIZE: int = 16
+# register numbers from here on address the history ring (HISTORY_BASE + 0 = newest clip)
+HISTORY_BASE: int = REGISTER_COUNT
+
+
+class Clip:
+    """
+    One clipboard entry: an implicittreap that shares its nodes copy-on-write with the
+    buffer it was copied from (and with every place it gets pasted into). The text is
+    only materialized once, the first time the widget needs it.
+    """
+    __slots__ = ("tree", "_text")
+
+    def __init__(self, tree) -> None:
+        self.tree = tree
+        self._text: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.tree.to_string()
+        return self._text
+
+    def size(self) -> int:
+        return self.tree.size()
+
+
+class ClipboardRegisters:
+    """
+    Named clipboard registers plus a history ring of the latest clips.
+
+    Every copy or cut lands in a register and is pushed onto the history ring; a clip
+    that sits in both is the same object. Holding many large clips is cheap, since
+    copy() only adds references to subtrees of the buffer (see memory()).
+    """
+
+    def __init__(self) -> None:
+        self.registers: List[Optional[Clip]] = [None] * REGISTER_COUNT
+        self.history: Deque[Clip] = deque(maxlen=HISTORY_SIZE)
+
+    @staticmethod
+    def _validate(register: int) -> None:
+        if not 0 <= register < HISTORY_BASE + HISTORY_SIZE:
+            raise ValueError(f"Invalid register: {register}")
+
+    def store(self, register: int, tree) -> Clip:
+        """Puts a freshly copied / cut treap into a register (not into the history ring slots)."""
+        if not 0 <= register < REGISTER_COUNT:
+            raise ValueError(f"Invalid register: {register}")
+        clip = Clip(tree)
+        self.registers[register] = clip
+        self.history.appendleft(clip)
+        return clip
+
+    def get(self, register: int) -> Optional[Clip]:
+        """Clip in a register or history slot, None when it is empty."""
+        self._validate(register)
+        if register < REGISTER_COUNT:
+            return self.registers[register]
+        k = register - HISTORY_BASE
+        return self.history[k] if k < len(self.history) else None
+
+    def memory(self) -> List[Tuple[str, int, int, int]]:
+        """
+        Returns:
+            List[Tuple[str, int, int, int]]: (name, chars, bytes held by the clip alone,
+            nodes shared with the buffer or other clips) per filled register / history slot
+        """
+        rows: List[Tuple[str, int, int, int]] = []
+        named = [(f"R{i}", clip) for i, clip in enumerate(self.registers)]
+        ring = [(f"H{k}", clip) for k, clip in enumerate(self.history)]
+        for name, clip in named + ring:
+            if clip is None:
+                continue
+            mem = clip.tree.memory()
+            rows.append((name, mem["nodes"], mem["owned_bytes"], mem["shared_nodes"]))
+        return rows
+
+    def format(self) -> str:
+        rows = self.memory()
+        if not rows:
+            return "CLIPBOARD EMPTY"
+        lines = [f"{'REG':<4}{'CHARS':>7}{'OWN KB':>8}{'SHARED':>8}"]
+        ring_owned = 0
+        for name, chars, owned, shared in rows:
+            if name.startswith("H"):
+                ring_owned += owned
+                continue
+            lines.append(f"{name:<4}{chars:>7}{owned / 1024:>8.1f}{shared:>8}")
+        # the ring is summed up, it mostly holds the same clips as the registers
+        lines.append(f"HIST {len(self.history)} clips, {ring_owned / 1024:0.1f} KB own")
+        return "\n".join(lines)
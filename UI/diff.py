@@ -0,0 +1,250 @@
+from array import array
+from typing import List, Tuple
+
+import implicit_treap
+
+INF: int = 1 << 30
+
+
+class DiffEngine:
+    """
+    Keeps an edit-distance alignment between the typed text and the target passage,
+    so every mistake is an error on its own (one typo no longer turns everything after
+    it red, a skipped or doubled character only costs one error).
+
+    tpos[i] is the target position typed char i is aligned to; an extra character
+    stores -1 - c instead, where c is the target position the alignment has reached at
+    it (typed[:i] lies in target[:c], typed[i + 1:] in target[c:]). ok[i] is 1 when
+    typed char i matches its target char. A typed char is wrong when it is extra or
+    differs from its target char; target chars skipped between two aligned ones are
+    counted as missing. The target tail after the last aligned char is simply not
+    typed yet.
+
+    The typed text itself is not kept here: the region being realigned is read from the
+    treap buffer (GameSession passes its own, already edited one), so an edit never
+    copies the whole text. Without a buffer the engine mirrors the edits into a treap
+    of its own.
+
+    apply() only realigns the region around an edit: from the last correctly matched
+    char BAND positions before it to the first correctly matched char BAND positions
+    after it (the old alignment is reused on both sides), with a banded DP over that
+    region. Cost is O(region * band) per edit instead of O(N * M). The anchors move
+    at most MAX_SCAN chars past BAND looking for a match (mashed keys do not drag the
+    region back to the last correct char), and a region whose DP would exceed
+    MAX_CELLS (a large paste over a selection of another size) is aligned straight
+    along the diagonal instead: every char against the target char at its position,
+    mismatches are errors.
+    """
+
+    BAND: int = 8
+    MAX_SCAN: int = 64
+    MAX_CELLS: int = 1 << 15
+
+    def __init__(self, target: str, buffer=None) -> None:
+        self.target: str = target
+        # edits are applied to buffer by its owner before apply() sees them
+        self._owns_buffer: bool = buffer is None
+        self.buffer = buffer
+        self.reset()
+
+    def reset(self) -> None:
+        if self._owns_buffer:
+            self.buffer = implicit_treap.implicittreap32()
+        self.tpos: array = array("i")
+        self.ok: array = array("B")
+        self.errors: int = 0      # wrong typed chars
+        self.missing: int = 0     # target chars skipped inside the typed part
+
+    def __len__(self) -> int:
+        return len(self.tpos)
+
+    def is_error(self, i: int) -> bool:
+        return not self.ok[i]
+
+    def error_ranges(self, lo: int, hi: int) -> List[Tuple[int, int]]:
+        """Runs [start, end) of wrong typed chars within [lo, hi), for tagging the visible lines."""
+        ranges: List[Tuple[int, int]] = []
+        run = -1
+        for i in range(max(0, lo), min(hi, len(self.tpos))):
+            if self.is_error(i):
+                if run == -1:
+                    run = i
+            elif run != -1:
+                ranges.append((run, i))
+                run = -1
+        if run != -1:
+            ranges.append((run, min(hi, len(self.tpos))))
+        return ranges
+
+    # -------------------------------------------------------------------------
+    # Incremental update
+    # -------------------------------------------------------------------------
+
+    def _matched(self, i: int) -> bool:
+        return self.ok[i] == 1
+
+    def _first(self, i: int) -> int:
+        """Target position typed[i:] starts at."""
+        t = self.tpos[i]
+        return t if t >= 0 else -1 - t
+
+    def _after(self, i: int) -> int:
+        """Target position the alignment of typed[:i + 1] ends at."""
+        t = self.tpos[i]
+        return t + 1 if t >= 0 else -1 - t
+
+    def apply(self, start: int, end: int, inserted: str) -> Tuple[int, int]:
+        """
+        Mirrors an edit ([start, end) of the typed text replaced by inserted) and realigns
+        the region around it.
+
+        Returns:
+            Tuple[int, int]: new typed range [lo, hi) whose error flags may have changed.
+        """
+        n_old = len(self.tpos)
+        if self._owns_buffer:
+            if end > start:
+                self.buffer.delete_range(start, end)
+            if inserted:
+                self.buffer.insert_text(start, inserted)
+
+        # fast paths for the common case, editing at the end behind a correctly matched char
+        if end == n_old and (start == 0 or self._matched(start - 1)):
+            ta = self.tpos[start - 1] + 1 if start > 0 else 0
+            if start == end and self.target.startswith(inserted, ta):
+                self.tpos.extend(range(ta, ta + len(inserted)))
+                self.ok.frombytes(b"\x01" * len(inserted))
+                return start, start + len(inserted)
+            if not inserted:
+                errors, missing = self._region_stats(start, end, ta, -1)
+                self.errors -= errors
+                self.missing -= missing
+                del self.tpos[start:]
+                del self.ok[start:]
+                return start, start
+
+        # left anchor: last correctly matched char at least BAND before the edit, or
+        # wherever the scan gives up (any char is a valid cut, just a worse one)
+        a = max(0, start - self.BAND)
+        limit = max(0, a - self.MAX_SCAN)
+        while a > limit and not self._matched(a - 1):
+            a -= 1
+        ta = self._after(a - 1) if a > 0 else 0
+
+        # right anchor: first correctly matched char at least BAND after the edit
+        b = min(n_old, end + self.BAND)
+        limit = min(n_old, b + self.MAX_SCAN)
+        while b < limit and not self._matched(b):
+            b += 1
+        free_end = b >= n_old
+        tb = self._first(b) if not free_end else -1
+
+        old_errors, old_missing = self._region_stats(a, b, ta, tb)
+
+        b_new = b + len(inserted) - (end - start)
+        s = self.buffer.substr(a, b_new)
+        target = self.target
+        region = self._align(s, ta, tb)
+        self.tpos[a:b] = array("i", region)
+        self.ok[a:b] = array("B", [t >= 0 and s[k] == target[t] for k, t in enumerate(region)])
+
+        new_errors, new_missing = self._region_stats(a, b_new, ta, tb)
+        self.errors += new_errors - old_errors
+        self.missing += new_missing - old_missing
+        return a, b_new
+
+    def _region_stats(self, a: int, b: int, ta: int, tb: int) -> Tuple[int, int]:
+        """(wrong chars, skipped target chars) of typed[a:b] aligned between the anchors."""
+        errors = aligned = 0
+        for i in range(a, b):
+            if not self.ok[i]:
+                errors += 1
+            if self.tpos[i] >= 0:
+                aligned += 1
+        # a free end stops where the alignment of the last char does
+        end = tb if tb != -1 else (self._after(b - 1) if b > a else ta)
+        return errors, (end - ta) - aligned
+
+    def _align(self, s: str, ta: int, tb: int) -> List[int]:
+        """
+        Banded global alignment of s against target[ta:tb] (or against a free-ended
+        prefix of target[ta:] when tb is -1). Returns the target position per char of s.
+        """
+        target = self.target
+        n = len(s)
+        if tb == -1:
+            m = min(len(target) - ta, n + self.BAND)
+        else:
+            m = tb - ta
+        t = target[ta:ta + m]
+        # a fixed end point has to stay inside the band; with a free one the typed text may
+        # run past the target (typing beyond the end), the band has to reach row n all the same
+        w = self.BAND + abs(n - m) if tb != -1 else self.BAND + max(0, n - m)
+        if (n + 1) * min(2 * w + 1, m + 1) > self.MAX_CELLS:
+            return self._diagonal(n, ta, tb)
+
+        # rows[i][j - lo(i)] = edit distance of s[:i] vs t[:j], only |i - j| <= w is stored
+        rows: List[List[int]] = []
+        los: List[int] = []
+        for i in range(n + 1):
+            lo, hi = max(0, i - w), min(m, i + w)
+            row = [INF] * (hi - lo + 1)
+            if i == 0:
+                for j in range(lo, hi + 1):
+                    row[j - lo] = j
+            else:
+                prev, plo = rows[i - 1], los[i - 1]
+                phi = plo + len(prev) - 1
+                c = s[i - 1]
+                for j in range(lo, hi + 1):
+                    best = INF
+                    if plo <= j <= phi:                  # s[i-1] is an extra char
+                        best = prev[j - plo] + 1
+                    if j > lo:                           # t[j-1] was skipped
+                        cost = row[j - 1 - lo] + 1
+                        if cost < best:
+                            best = cost
+                    if j > 0 and plo <= j - 1 <= phi:    # match / substitution
+                        cost = prev[j - 1 - plo] + (c != t[j - 1])
+                        if cost < best:
+                            best = cost
+                    row[j - lo] = best
+            rows.append(row)
+            los.append(lo)
+
+        # end point: fixed anchor, or the cheapest target prefix (closest to the diagonal on ties)
+        last, llo = rows[n], los[n]
+        if tb == -1:
+            j = min(range(llo, llo + len(last)), key=lambda jj: (last[jj - llo], abs(jj - n)))
+        else:
+            j = m
+
+        out = [-1] * n
+        i = n
+        while i > 0:
+            row, lo = rows[i], los[i]
+            prev, plo = rows[i - 1], los[i - 1]
+            cur = row[j - lo]
+            if j > 0 and plo <= j - 1 < plo + len(prev) and cur == prev[j - 1 - plo] + (s[i - 1] != t[j - 1]):
+                out[i - 1] = ta + j - 1
+                i, j = i - 1, j - 1
+            elif plo <= j < plo + len(prev) and cur == prev[j - plo] + 1:
+                out[i - 1] = -1 - (ta + j)
+                i -= 1
+            else:
+                j -= 1
+        if tb == -1:
+            # a free end stops right after the last aligned char (_region_stats counts
+            # nothing missing past it), so do the extras behind it
+            cut = ta
+            for k in range(n):
+                if out[k] >= 0:
+                    cut = out[k] + 1
+                else:
+                    out[k] = -1 - cut
+        return out
+
+    def _diagonal(self, n: int, ta: int, tb: int) -> List[int]:
+        """Char k of the region against target[ta + k], the rest extra (or missing)."""
+        end = tb if tb != -1 else len(self.target)
+        return [ta + k if ta + k < end else -1 - end for k in range(n)]
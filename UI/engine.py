@@ -1,7 +1,16 @@
+import struct
+import sys
 import time
-import random
-from typing import List, Dict, Tuple, Optional, Any
-from dataclasses import dataclass
+from array import array
+from typing import Callable, List, Dict, NamedTuple, Tuple, Optional, Any
+from dataclasses import dataclass, field
+
+import implicit_treap
+from metrics import words_per_minute
+from passages import PassageStore, PassageKey
+
+# native-endian utf-32: one 4 byte element per code point, readable by implicittreap32 in place
+UTF32: str = "utf-32-le" if sys.byteorder == "little" else "utf-32-be"
 
 @dataclass
 class GameResult:
@@ -12,6 +21,110 @@ class GameResult:
     difficulty: str
     wpm: int
     time_seconds: float
+    # EditLog of the run (replay.py), used to verify the score / reproduce the run
+    edit_log: Optional[Any] = field(default=None, repr=False)
+
+class Score(NamedTuple):
+    """
+    Typed text scored against the target in one native pass (implicit_treap.score32 or
+    implicittreap32.score). Positions are code points, same as the buffer and Tk.
+    """
+    correct: int                  # positions matching the target
+    first_error: int              # first mismatching position, -1 if none
+    mismatches: Optional[bytes]   # bit i (LSB first) set = position i is wrong
+
+    def is_correct(self, i: int) -> bool:
+        if self.mismatches is None:
+            raise ValueError("Score was computed without a bitmap")
+        return not (self.mismatches[i >> 3] >> (i & 7)) & 1
+
+@dataclass(frozen=True)
+class PassageTarget:
+    """
+    Everything the per-keystroke path needs to know about the target passage.
+    Built once per passage (see GameEngine.start_game) so nothing here is
+    recomputed while the player types.
+    """
+    text: str                 # normalized passage text
+    encoded32: bytes          # utf-32 of text, handed to implicittreap32 without copying
+    length: int
+    prefix_hashes: array      # prefix_hashes[i] = hash(text[:i]), polynomial mod HASH_MOD
+    line_breaks: array        # offsets of every "\n" in text
+
+    HASH_BASE = 911382323
+    HASH_MOD = (1 << 61) - 1
+
+    @classmethod
+    def build(cls, raw_text: str) -> "PassageTarget":
+        text = GameEngine._normalize(raw_text)
+        base, mod = cls.HASH_BASE, cls.HASH_MOD
+
+        prefix = array("Q", [0])
+        h = 0
+        for ch in text:
+            h = (h * base + ord(ch)) % mod
+            prefix.append(h)
+
+        line_breaks = array("I", (i for i, ch in enumerate(text) if ch == "\n"))
+        return cls(text, text.encode(UTF32), len(text), prefix, line_breaks)
+
+    def substring_hash(self, start: int, end: int) -> int:
+        """Hash of text[start:end] in O(1), comparable with hash_string()."""
+        mod = self.HASH_MOD
+        return (self.prefix_hashes[end] - self.prefix_hashes[start] * pow(self.HASH_BASE, end - start, mod)) % mod
+
+    @classmethod
+    def hash_string(cls, s: str) -> int:
+        h = 0
+        for ch in s:
+            h = (h * cls.HASH_BASE + ord(ch)) % cls.HASH_MOD
+        return h
+
+
+class EngineState(NamedTuple):
+    """
+    Everything GameEngine needs to pick a run back up (see checkpoint.py). The passage
+    itself is not stored, only its key and hash: it is reloaded from the corpus and
+    refused when it changed in the meantime.
+    """
+    player_name: str
+    difficulty: str
+    passage_key: PassageKey
+    passage_hash: int          # PassageTarget.prefix_hashes[-1]
+    elapsed: float             # seconds on the clock so far
+    started: bool
+    completed: bool
+    wpm: int
+
+    MAGIC = b"PPGE"
+    VERSION = 1
+    # magic, version, passage index, passage hash, elapsed, started, completed, wpm
+    _HEADER = struct.Struct("<4sHIQdBBI")
+
+    def to_bytes(self) -> bytes:
+        strings = [s.encode("utf-8") for s in (self.player_name, self.difficulty, self.passage_key[0])]
+        parts = [self._HEADER.pack(self.MAGIC, self.VERSION, self.passage_key[1], self.passage_hash,
+                                   self.elapsed, self.started, self.completed, self.wpm)]
+        for raw in strings:
+            parts.append(struct.pack("<H", len(raw)))
+            parts.append(raw)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "EngineState":
+        magic, version, index, passage_hash, elapsed, started, completed, wpm = cls._HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Not an engine state")
+        pos = cls._HEADER.size
+        strings: List[str] = []
+        for _ in range(3):
+            (n,) = struct.unpack_from("<H", data, pos)
+            strings.append(bytes(data[pos + 2:pos + 2 + n]).decode("utf-8"))
+            pos += 2 + n
+        name, difficulty, passage_difficulty = strings
+        return cls(name, difficulty, (passage_difficulty, index), passage_hash,
+                   elapsed, bool(started), bool(completed), wpm)
+
 
 class GameEngine:
     """
@@ -19,57 +132,63 @@ class GameEngine:
     This module is designed to be easily replaced by a C++ extension in the future.
     """
 
-    PASSAGES: Dict[str, List[str]] = {
-    "Easy": [
-        "ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF ABC DEF",
-        "There's no place like home.",
-        "ThE QuIcK FoX ThE QuIcK FoX JuMpS OvEr ThE QuIcK FoX ThE QuIcK FoX JuMpS OvEr JuMpS OvEr JuMpS OvEr",
-        "I'm going to make him an offer he can't refuse.",
-    ],
-    "Medium": [
-        "Life moves pretty fast. If you don't stop and look around once in a while, you could miss it.",
-        "Mama always said life was like a box of chocolates. You never know what you're gonna get.",
-        "The first rule of Fight Club is: you do not talk about Fight Club.",
-    ],
-    "Hard": [
-        "The alphabet sequence flow appears naturally in this paragraph because the alphabet sequence is mentioned repeatedly and the sequence flow continues smoothly so anyone scanning the text will notice alphabet sequence flow again and again while alphabet sequence and sequence flow occur separately in different parts making alphabet sequence flow easy to reconstruct faster by copying instead of typing the alphabet sequence flow manually every time",
-        "The path of the righteous man is beset on all sides by the inequities of the selfish and the tyranny of evil men. Blessed is he who, in the name of charity and good will, shepherds the weak through the valley of the darkness.",
-        "It's like in the great stories, Mr. Frodo. The ones that really mattered. Full of darkness and danger they were. And sometimes you didn't want to know the end, because how could the end be happy? How could the world go back to the way it was when so much bad had happened?",
-        "L1ghtning St@rburst Sh1mmer Jumps! St@rburst Sh1mmer Jumps! St@rburst Sh1mmer Jumps! Sh1mmer Jumps! Ov3rflow Ov3rflow Ov3rflow Ov3rflow Ov3rflow",
-    ],
-    "Time-Trial": [
-        "Let me tell you something you already know. The world ain't all sunshine and rainbows. It's a very mean and nasty place and I don't care how tough you are it will beat you to your knees and keep you there permanently if you let it. You, me, or nobody is gonna hit as hard as life. But it ain't about how hard you hit. It's about how hard you can get hit and keep moving forward.",
-        "I don't have to tell you things are bad. Everybody knows things are bad. It's a depression. Everybody's out of work or scared of losing their job. The dollar buys a nickel's worth, banks are going bust, shopkeepers keep a gun under the counter. We know the air is unfit to breathe and our food is unfit to eat, and we sit watching our TVs while some local newscaster tells us that today we had fifteen homicides.",
-        "We think too much and feel too little. More than machinery we need humanity. More than cleverness we need kindness and gentleness. Without these qualities, life will be violent and all will be lost. The aeroplane and the radio have brought us closer together. The very nature of these inventions cries out for the goodness in men, cries out for universal brotherhood.",
-        "Good morning. In less than an hour, aircraft from here will join others from around the world. And you will be launching the largest aerial battle in the history of mankind. Mankind. That word should have new meaning for all of us today. We can't be consumed by our petty differences anymore. We will be united in our common interests.",
-        "Son, we live in a world that has walls, and those walls have to be guarded by men with guns. Who's gonna do it? You? You, Lt. Weinberg? I have a greater responsibility than you could possibly fathom. You weep for Santiago, and you curse the Marines. You have that luxury. You have the luxury of not knowing what I know."
-    ]
-    }
-
-    def __init__(self) -> None:
+    # how many precomputed PassageTargets are kept around between runs
+    TARGET_CACHE_SIZE: int = 32
+
+    def __init__(self, passages: Optional[PassageStore] = None,
+                 clock: Callable[[], float] = time.perf_counter) -> None:
+        # the clock is swappable so headless simulations can run on virtual time
+        self.clock: Callable[[], float] = clock
+        # passages are loaded lazily from the corpus on disk, see passages.py
+        self.passages: PassageStore = passages if passages is not None else PassageStore.open_default()
         self.player_name: str = ""
         self.difficulty: str = "Easy"
+        self.passage_key: Optional[PassageKey] = None
         self.target_text: str = ""
+        self.target: Optional[PassageTarget] = None
+        self._targets: Dict[PassageKey, PassageTarget] = {}
         self.start_time: Optional[float] = None
         self.end_time: Optional[float] = None
         self.wpm: int = 0
         self.is_running: bool = False
         self.completed: bool = False
 
-    def start_game(self, name: str, difficulty: str) -> None:
+    def start_game(self, name: str, difficulty: str, passage_key: Optional[PassageKey] = None) -> None:
+        """Starts a run on a random passage of the difficulty, or on passage_key (a race picks it)."""
         self.player_name = name
         self.difficulty = difficulty
-        self.target_text = random.choice(self.PASSAGES[difficulty])
+        self.passage_key = passage_key if passage_key is not None else self.passages.sample(difficulty)
+        self.target_text = self.passages.get(self.passage_key)
+        self.target = self._get_target(self.passage_key)
         self.start_time = None
         self.end_time = None
         self.wpm = 0
         self.is_running = False
         self.completed = False
 
+    def restart(self) -> None:
+        """Starts the current passage over (RETRY): same player and passage, fresh clock and result."""
+        if self.passage_key is None:
+            raise ValueError("Invalid restart: no run was started")
+        self.start_game(self.player_name, self.difficulty, self.passage_key)
+
+    def _get_target(self, key: PassageKey) -> PassageTarget:
+        """
+        Returns the precomputed target for a passage, memoized across runs.
+        """
+        target = self._targets.pop(key, None)
+        if target is None:
+            target = PassageTarget.build(self.passages.get(key))
+            if len(self._targets) >= self.TARGET_CACHE_SIZE:
+                # dicts keep insertion order, the first key is the least recently used one
+                del self._targets[next(iter(self._targets))]
+        self._targets[key] = target
+        return target
+
     def start_timer(self) -> None:
         if not self.is_running and not self.completed:
             self.is_running = True
-            self.start_time = time.perf_counter()
+            self.start_time = self.clock()
 
     def stop_timer(self) -> None:
         self.is_running = False
@@ -79,47 +198,50 @@ class GameEngine:
             return 0.0
         if self.end_time is not None:
             return self.end_time - self.start_time
-        return time.perf_counter() - self.start_time
+        return self.clock() - self.start_time
 
     @staticmethod
     def _normalize(s: str) -> str:
         s = s.replace("\r\n", "\n")
         return s.rstrip("\n")
 
-    def submit_text(self, current_text: str) -> Tuple[bool, bool, List[bool]]:
-        norm_target = self._normalize(self.target_text)
-        norm_typed = self._normalize(current_text)
+    def score_text(self, current_text: str, bitmap: bool = False) -> Score:
+        """Scores (normalized) typed text against the target, natively and in one pass."""
+        typed = self._normalize(current_text).encode(UTF32)
+        return Score(*implicit_treap.score32(typed, self.target.encoded32, bitmap))
 
-        char_correctness: List[bool] = []
-        for i, char in enumerate(norm_typed):
-            if i < len(norm_target) and char == norm_target[i]:
-                char_correctness.append(True)
-            else:
-                char_correctness.append(False)
+    def submit_text(self, current_text: str) -> Tuple[bool, bool, Score]:
+        """
+        Returns:
+            Tuple[bool, bool, Score]: (valid, complete, per-position score with mismatch bitmap)
+        """
+        norm_typed = self._normalize(current_text)
+        score = self.score_text(norm_typed, bitmap=True)
 
-        if norm_typed == norm_target:
+        if norm_typed == self.target.text:
             if self.is_running:
                 self._finish_game(norm_typed)
-            return True, True, char_correctness
+            return True, True, score
         
-        return True, False, char_correctness
+        return True, False, score
 
     def _finish_game(self, final_typed_text: str) -> None:
         self.stop_timer()
-        self.end_time = time.perf_counter()
         
         # Calculate correct characters for WPM to prevent mash-to-win
         # self.wpm = int(len(self.target_text) / 5.0)
-        _,_1,correct = self.submit_text(final_typed_text)
-        correct_chars = 0
-        for char in correct:
-            if char:
-                correct_chars += 1
-        elapsed = self.end_time - self.start_time
-        minutes = max(elapsed / 60.0, 1e-6)
-        self.wpm = int(((correct_chars / 5.0) / minutes) + 0.5)
-
-            
+        self.finish(self.score_text(final_typed_text).correct)
+
+    def finish(self, correct_chars: int) -> None:
+        """
+        Ends the run with an already known number of correct characters
+        (GameSession passes its live RunMetrics counter, no pass over the text).
+        """
+        if self.completed:
+            return
+        self.stop_timer()
+        self.end_time = self.clock()
+        self.wpm = words_per_minute(correct_chars, self.get_elapsed_time())
         self.completed = True
 
     def force_finish(self, current_text: str) -> None:
@@ -129,6 +251,38 @@ class GameEngine:
         if not self.completed:
             self._finish_game(current_text)
 
+    # -------------------------------------------------------------------------
+    # Save / resume
+    # -------------------------------------------------------------------------
+
+    def state(self) -> EngineState:
+        """Snapshot of the current run, see EngineState."""
+        if self.passage_key is None or self.target is None:
+            raise ValueError("Invalid state: no run was started")
+        return EngineState(self.player_name, self.difficulty, self.passage_key,
+                           self.target.prefix_hashes[-1], self.get_elapsed_time(),
+                           self.start_time is not None, self.completed, self.wpm)
+
+    def restore(self, state: EngineState) -> None:
+        """
+        Picks a saved run back up. The clock resumes from the saved elapsed time, the
+        time the run spent saved does not count.
+        """
+        target = self._get_target(state.passage_key)
+        if target.prefix_hashes[-1] != state.passage_hash:
+            raise ValueError(f"Invalid state: passage {state.passage_key} changed since it was saved")
+        self.player_name = state.player_name
+        self.difficulty = state.difficulty
+        self.passage_key = state.passage_key
+        self.target_text = self.passages.get(state.passage_key)
+        self.target = target
+        self.wpm = state.wpm
+        self.completed = state.completed
+        self.is_running = state.started and not state.completed
+        now = self.clock()
+        self.start_time = now - state.elapsed if state.started else None
+        self.end_time = now if state.completed else None
+
     def get_results(self) -> GameResult:
         """
         Get final results of the run strictly typed.
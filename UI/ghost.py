@@ -0,0 +1,262 @@
+import os
+import struct
+from array import array
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from passages import PassageKey
+
+_HERE: str = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GHOST_PATH: str = os.path.join(_HERE, "ghosts.bin")
+
+# samples kept per stored ghost (8 bytes each), whatever the length of the run
+MAX_SAMPLES: int = 256
+# ghosts kept per passage (the best run of each player, best players first) and passages kept
+MAX_GHOSTS_PER_PASSAGE: int = 8
+MAX_PASSAGES: int = 256
+
+
+class Ghost:
+    """
+    A finished run as a progress curve: correct-prefix length over elapsed time,
+    stored as two parallel arrays (milliseconds, offsets) sorted by time.
+
+    position_at() is a binary search plus a linear step between the two samples
+    around t, so the frame tick can ask for it every frame.
+    """
+
+    def __init__(self, player_name: str, wpm: int, times: array, positions: array) -> None:
+        self.player_name: str = player_name
+        self.wpm: int = wpm
+        self.times: array = times            # "I", ms since the run's first edit
+        self.positions: array = positions    # "I", correct chars at that time
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def duration(self) -> float:
+        return self.times[-1] / 1000.0 if self.times else 0.0
+
+    def position_at(self, t: float) -> int:
+        """Where the run was t seconds in."""
+        times = self.times
+        if not times:
+            return 0
+        ms = t * 1000.0
+        i = bisect_right(times, ms)
+        if i == 0:
+            return 0
+        if i == len(times):
+            return self.positions[-1]
+        t0, t1 = times[i - 1], times[i]
+        p0, p1 = self.positions[i - 1], self.positions[i]
+        if p1 <= p0 or t1 == t0:
+            return p0
+        return p0 + int((p1 - p0) * (ms - t0) / (t1 - t0))
+
+    def memory(self) -> int:
+        """Bytes held by the samples."""
+        return (len(self.times) + len(self.positions)) * 4
+
+
+class GhostRecorder:
+    """
+    Collects (time, correct chars) samples during a run, O(1) amortized per check.
+
+    Only changes of position count. Whenever 2 * max_samples have piled up every
+    other sample is dropped and from then on only every other change is kept (the
+    stride doubles), so the samples stay evenly spread over the run and a long run
+    costs as much memory as a short one. finish() downsamples to max_samples evenly
+    spaced in time.
+    """
+
+    def __init__(self, max_samples: int = MAX_SAMPLES) -> None:
+        self.max_samples: int = max(2, max_samples)
+        self.reset()
+
+    def reset(self) -> None:
+        self._times: array = array("I")
+        self._positions: array = array("I")
+        self._last: int = -1
+        self._stride: int = 1
+        self._skipped: int = 0
+
+    def add(self, t: float, position: int) -> None:
+        if position == self._last:
+            return
+        self._last = position
+        self._skipped += 1
+        if self._skipped < self._stride:
+            return
+        self._skipped = 0
+        self._times.append(int(t * 1000))
+        self._positions.append(position)
+        if len(self._positions) >= 2 * self.max_samples:
+            self._times = self._times[::2]
+            self._positions = self._positions[::2]
+            self._stride *= 2
+
+    def finish(self, player_name: str, wpm: int, t: float, position: int) -> Ghost:
+        self._times.append(int(t * 1000))
+        self._positions.append(position)
+        times, positions = _downsample(self._times, self._positions, self.max_samples)
+        self.reset()
+        return Ghost(player_name, wpm, times, positions)
+
+
+def _downsample(times: array, positions: array, n: int) -> Tuple[array, array]:
+    """At most n samples, evenly spaced over the run; the last sample is always kept."""
+    if len(times) <= n:
+        return array("I", times), array("I", positions)
+    end = times[-1]
+    out_t, out_p = array("I"), array("I")
+    for k in range(n - 1):
+        i = max(0, bisect_right(times, end * k // (n - 1)) - 1)
+        if out_t and out_t[-1] == times[i]:
+            continue
+        out_t.append(times[i])
+        out_p.append(positions[i])
+    out_t.append(times[-1])
+    out_p.append(positions[-1])
+    return out_t, out_p
+
+
+class GhostStore:
+    """
+    Best runs per passage, on disk in one small binary file.
+
+    Per passage the best run of each player is kept (fastest finish), at most
+    MAX_GHOSTS_PER_PASSAGE of them, for at most MAX_PASSAGES passages (the least
+    recently used one goes), so the store stays bounded: at most
+    MAX_PASSAGES * MAX_GHOSTS_PER_PASSAGE * MAX_SAMPLES samples. Every passage keeps
+    the hash of the text it was raced on; ghosts of a passage that changed are dropped.
+    """
+
+    MAGIC = b"PPGH"
+    VERSION = 1
+    # magic, version, passage count
+    _HEADER = struct.Struct("<4sHI")
+    # passage index, passage hash, ghost count
+    _PASSAGE = struct.Struct("<IQB")
+    # wpm, sample count
+    _GHOST = struct.Struct("<HH")
+
+    def __init__(self, path: Optional[str] = DEFAULT_GHOST_PATH) -> None:
+        self.path: Optional[str] = path
+        # key -> (passage hash, ghosts best first); dicts keep insertion order, first = least recently used
+        self._passages: Dict[PassageKey, Tuple[int, List[Ghost]]] = {}
+        if path is not None:
+            self.load()
+
+    def ghost_for(self, key: PassageKey, passage_hash: int, player_name: str) -> Optional[Ghost]:
+        """The player's best run of the passage, else the passage's best (the leader's)."""
+        entry = self._passages.pop(key, None)
+        if entry is None or entry[0] != passage_hash:
+            return None
+        self._passages[key] = entry
+        ghosts = entry[1]
+        for ghost in ghosts:
+            if ghost.player_name == player_name:
+                return ghost
+        return ghosts[0]
+
+    def submit(self, key: PassageKey, passage_hash: int, ghost: Ghost) -> bool:
+        """
+        Keeps ghost if it is the player's best run of the passage; saves the store then.
+
+        Returns:
+            bool: True if the ghost was kept.
+        """
+        entry = self._passages.pop(key, None)
+        ghosts = entry[1] if entry is not None and entry[0] == passage_hash else []
+        self._passages[key] = (passage_hash, ghosts)
+        old = next((g for g in ghosts if g.player_name == ghost.player_name), None)
+        if old is not None:
+            if old.duration <= ghost.duration:
+                return False
+            ghosts.remove(old)
+        ghosts.append(ghost)
+        ghosts.sort(key=lambda g: g.duration)
+        del ghosts[MAX_GHOSTS_PER_PASSAGE:]
+        if len(self._passages) > MAX_PASSAGES:
+            del self._passages[next(iter(self._passages))]
+        if ghost not in ghosts:
+            return False
+        if self.path is not None:
+            self.save()
+        return True
+
+    def memory(self) -> int:
+        return sum(g.memory() for _, ghosts in self._passages.values() for g in ghosts)
+
+    # -------------------------------------------------------------------------
+    # Serialization
+    # -------------------------------------------------------------------------
+    # header, then per passage: difficulty (u8 length + utf-8), index, hash and
+    # ghost count; per ghost: name (u8 length + utf-8), wpm, sample count, the
+    # time array and the position array
+    # -------------------------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        parts = [self._HEADER.pack(self.MAGIC, self.VERSION, len(self._passages))]
+        for (difficulty, index), (passage_hash, ghosts) in self._passages.items():
+            parts.append(_pack_str(difficulty))
+            parts.append(self._PASSAGE.pack(index, passage_hash, len(ghosts)))
+            for ghost in ghosts:
+                parts.append(_pack_str(ghost.player_name))
+                parts.append(self._GHOST.pack(min(ghost.wpm, 0xFFFF), len(ghost)))
+                parts.append(ghost.times.tobytes())
+                parts.append(ghost.positions.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "GhostStore":
+        magic, version, n_passages = cls._HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Not a ghost store")
+        store = cls(None)
+        pos = cls._HEADER.size
+        for _ in range(n_passages):
+            difficulty, pos = _unpack_str(data, pos)
+            index, passage_hash, n_ghosts = cls._PASSAGE.unpack_from(data, pos)
+            pos += cls._PASSAGE.size
+            ghosts: List[Ghost] = []
+            for _ in range(n_ghosts):
+                name, pos = _unpack_str(data, pos)
+                wpm, n = cls._GHOST.unpack_from(data, pos)
+                pos += cls._GHOST.size
+                times, positions = array("I"), array("I")
+                for arr in (times, positions):
+                    size = n * arr.itemsize
+                    if pos + size > len(data):
+                        raise ValueError("Invalid ghost store: truncated")
+                    arr.frombytes(data[pos:pos + size])
+                    pos += size
+                ghosts.append(Ghost(name, wpm, times, positions))
+            store._passages[(difficulty, index)] = (passage_hash, ghosts)
+        return store
+
+    def load(self) -> None:
+        """Reads the store from path; a missing or unreadable file is an empty store."""
+        try:
+            with open(self.path, "rb") as f:
+                self._passages = GhostStore.from_bytes(f.read())._passages
+        except (OSError, ValueError, struct.error, UnicodeDecodeError):
+            self._passages = {}
+
+    def save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(tmp, self.path)
+
+
+def _pack_str(s: str) -> bytes:
+    raw = s.encode("utf-8")[:255]
+    return bytes([len(raw)]) + raw
+
+
+def _unpack_str(data: bytes, pos: int) -> Tuple[str, int]:
+    n = data[pos]
+    return bytes(data[pos + 1:pos + 1 + n]).decode("utf-8"), pos + 1 + n
@@ -0,0 +1,347 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+import checkpoint
+import implicit_treap
+from checkpoint import Checkpoint, DEFAULT_CHECKPOINT_PATH
+from engine import EngineState
+from perf import KeystrokeProbe, LatencyHistogram
+from replay import EditLog
+from session import GameSession
+
+_HERE: str = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_JOURNAL_PATH: str = os.path.join(_HERE, "run.journal")
+
+# (seq, op, delta us, a, b, reg, text), exactly what EditLog.record stored
+JournalEntry = Tuple[int, int, int, int, int, int, str]
+
+MAGIC: bytes = b"PPJN"
+VERSION: int = 1
+# magic, version, length of the EngineState blob that follows
+_HEADER = struct.Struct("<4sHI")
+# crc32 of everything after it (text included), seq, op, delta, a, b, reg, text length
+_ENTRY = struct.Struct("<IIBIIIBI")
+# the writer lets records pile up this long after waking, so a key burst is one commit
+GROUP_COMMIT_SECONDS: float = 0.005
+
+
+class _Discard:
+    """Queue marker: the run ended, drop the journal and its checkpoint."""
+
+
+class EditJournal:
+    """
+    Crash journal of the live run: every EditLog record is appended to a file on disk
+    by a writer thread, so a crash loses at most the records of the commit in flight.
+
+    The Tk thread only puts the record on a queue (append(), a list append under a
+    lock). The writer takes everything queued since its last commit, encodes it, writes
+    it in one call and fsyncs once: a group commit, the fsync is paid per batch, not per
+    key.
+
+    The journal starts with the run's EngineState (begin()), so a crash before the
+    first checkpoint still recovers. compact() hands the writer a Checkpoint of the
+    session (checkpoint.py); the writer saves it and truncates the journal back to its
+    header, so recovery is "load the snapshot, replay the tail" and the tail stays
+    short. All file work of a run goes through the queue, in order: a discard queued
+    after a compaction can not be undone by it.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL_PATH, checkpoint_path: str = DEFAULT_CHECKPOINT_PATH,
+                 fsync: bool = True) -> None:
+        self.path: str = path
+        self.checkpoint_path: str = checkpoint_path
+        self.fsync: bool = fsync
+        # time append() takes on the calling thread is charged to the probe's "journal" stage
+        self.probe: Optional[KeystrokeProbe] = None
+        self._cond = threading.Condition()
+        self._queue: List[Any] = []
+        self._submitted: int = 0    # queue items ever handed over / fully written
+        self._done: int = 0
+        self._closed: bool = False
+        self._file = None
+        self._header: bytes = b""
+        # writer side stats
+        self.commits: int = 0
+        self.entries: int = 0
+        self.bytes: int = 0
+        self.compactions: int = 0
+        self.commit_latency: LatencyHistogram = LatencyHistogram(256)
+        self._thread = threading.Thread(target=self._run, name="edit-journal", daemon=True)
+        self._thread.start()
+
+    # -------------------------------------------------------------------------
+    # Tk thread side
+    # -------------------------------------------------------------------------
+
+    def begin(self, state: EngineState) -> None:
+        """Starts the journal of a new run; whatever an earlier run left is dropped."""
+        self._put(state)
+
+    def append(self, seq: int, op: int, delta: int, a: int, b: int, reg: int, text: str) -> None:
+        started = time.perf_counter_ns()
+        with self._cond:
+            self._queue.append((seq, op, delta, a, b, reg, text))
+            self._submitted += 1
+            if len(self._queue) == 1:
+                self._cond.notify()
+        if self.probe is not None:
+            self.probe.add("journal", time.perf_counter_ns() - started)
+
+    def compact(self, cp: Checkpoint) -> None:
+        """Saves cp as the new snapshot and empties the journal behind it."""
+        self._put(cp)
+
+    def discard(self) -> None:
+        """The run is over (finished or reset), nothing is left to recover."""
+        self._put(_Discard())
+
+    def sync(self) -> None:
+        """Blocks until everything queued so far is on disk (leaving a run, closing the app)."""
+        with self._cond:
+            target = self._submitted
+            while self._done < target and not self._closed:
+                self._cond.wait()
+
+    def mark(self) -> int:
+        """Ticket for everything queued so far: sync() without the wait, poll synced() with it."""
+        with self._cond:
+            return self._submitted
+
+    def synced(self, ticket: int) -> bool:
+        """True once everything queued before mark() handed out ticket is on disk."""
+        with self._cond:
+            return self._done >= ticket or self._closed
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def format(self) -> str:
+        p50, p99 = self.commit_latency.percentiles(50, 99)
+        return (f"JOURNAL {self.entries} ops in {self.commits} commits, {self.bytes / 1024:0.1f} KB, "
+                f"{self.compactions} compactions\n"
+                f"COMMIT p50 {p50:0.2f}ms p99 {p99:0.2f}ms")
+
+    def _put(self, item: Any) -> None:
+        with self._cond:
+            self._queue.append(item)
+            self._submitted += 1
+            self._cond.notify()
+
+    # -------------------------------------------------------------------------
+    # Writer thread
+    # -------------------------------------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._closed:
+                    self._cond.wait(GROUP_COMMIT_SECONDS)
+                batch, self._queue = self._queue, []
+                closing = self._closed
+
+            pending = bytearray()
+            count = 0
+            for item in batch:
+                # EngineState is a NamedTuple too, records are plain tuples
+                if type(item) is tuple:
+                    pending += _encode(item)
+                    count += 1
+                    continue
+                self._commit(pending, count)
+                pending = bytearray()
+                count = 0
+                if isinstance(item, EngineState):
+                    self._start(item)
+                elif isinstance(item, Checkpoint):
+                    self._snapshot(item)
+                else:
+                    self._drop()
+            self._commit(pending, count)
+
+            with self._cond:
+                self._done += len(batch)
+                self._cond.notify_all()
+            if closing and not batch:
+                if self._file is not None:
+                    self._file.close()
+                return
+
+    def _commit(self, data: bytearray, count: int) -> None:
+        if not data or self._file is None:
+            return
+        started = time.perf_counter_ns()
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.commit_latency.add(time.perf_counter_ns() - started)
+        self.commits += 1
+        self.entries += count
+        self.bytes += len(data)
+
+    def _start(self, state: EngineState) -> None:
+        blob = state.to_bytes()
+        self._header = _HEADER.pack(MAGIC, VERSION, len(blob)) + blob
+        self._remove(self.checkpoint_path)
+        self._truncate()
+
+    def _snapshot(self, cp: Checkpoint) -> None:
+        data = cp.to_bytes()
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+        # the snapshot holds every record queued before it, only newer ones go behind the header
+        self._truncate()
+        self.compactions += 1
+
+    def _drop(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._header = b""
+        self._remove(self.path)
+        self._remove(self.checkpoint_path)
+
+    def _truncate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self._header)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "ab")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _encode(entry: JournalEntry) -> bytes:
+    seq, op, delta, a, b, reg, text = entry
+    raw = text.encode("utf-8")
+    body = _ENTRY.pack(0, seq, op, delta, a, b, reg, len(raw))[4:] + raw
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+
+# -------------------------------------------------------------------------
+# Recovery
+# -------------------------------------------------------------------------
+
+@dataclass
+class Recovery:
+    """
+    What a crashed or quit run left on disk: the latest snapshot (if one was taken)
+    and the journal records behind it.
+    """
+    engine: EngineState
+    checkpoint: Optional[Checkpoint]
+    tail: List[JournalEntry] = field(default_factory=list)
+
+    @property
+    def difficulty(self) -> str:
+        return self.engine.difficulty
+
+    def restore(self, session: GameSession) -> str:
+        """
+        Loads the snapshot into the session, then replays the journal tail through the
+        session's hooks. The tail's time is added to the run's clock.
+
+        Returns:
+            str: the buffer text, for the widget
+        """
+        journal, session.journal = session.journal, None
+        try:
+            if self.checkpoint is not None:
+                text = self.checkpoint.restore(session)
+            else:
+                session.engine.restore(self.engine)
+                text = session.restore(implicit_treap.implicittreap32(), EditLog(session.engine.clock))
+            first = len(session.log)
+            for seq, op, delta, a, b, reg, payload in self.tail:
+                if seq < first:
+                    continue
+                if seq != len(session.log):
+                    break   # a gap, nothing after it can be trusted
+                session.apply_entry(op, a, b, payload, reg)
+                session.log.deltas[seq] = delta
+            tail_seconds = sum(session.log.deltas[first:]) / 1_000_000
+            engine = session.engine
+            if engine.start_time is not None and tail_seconds:
+                engine.start_time -= tail_seconds
+            if len(session.log) > first:
+                text = session.buffer.to_string()
+        finally:
+            session.journal = journal
+            session.log.journal = journal
+        return text
+
+
+def read(path: str = DEFAULT_JOURNAL_PATH, checkpoint_path: str = DEFAULT_CHECKPOINT_PATH) -> Optional[Recovery]:
+    """
+    Reads what is left of a run, None when there is nothing to recover. A torn or
+    corrupt record at the end of the journal (crash mid-write) ends the tail.
+    """
+    cp = checkpoint.read(checkpoint_path)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        data = b""
+
+    tail: List[JournalEntry] = []
+    engine: Optional[EngineState] = None
+    if len(data) >= _HEADER.size:
+        magic, version, n = _HEADER.unpack_from(data, 0)
+        if magic == MAGIC and version == VERSION:
+            try:
+                engine = EngineState.from_bytes(data[_HEADER.size:_HEADER.size + n])
+            except (ValueError, struct.error, UnicodeDecodeError):
+                engine = None
+            tail = _decode(data, _HEADER.size + n) if engine is not None else []
+
+    if cp is not None:
+        if engine is None or not _same_run(engine, cp.engine):
+            tail = []   # the journal belongs to another run
+        return Recovery(cp.engine, cp, tail)
+    if engine is not None and tail:
+        return Recovery(engine, None, tail)
+    return None
+
+
+def _same_run(a: EngineState, b: EngineState) -> bool:
+    # the clock fields move on, the run itself is the player and the passage
+    return (a.player_name, a.difficulty, a.passage_key, a.passage_hash) == \
+           (b.player_name, b.difficulty, b.passage_key, b.passage_hash)
+
+
+def _decode(data: bytes, pos: int) -> List[JournalEntry]:
+    entries: List[JournalEntry] = []
+    while pos + _ENTRY.size <= len(data):
+        crc, seq, op, delta, a, b, reg, length = _ENTRY.unpack_from(data, pos)
+        end = pos + _ENTRY.size + length
+        if end > len(data) or zlib.crc32(data[pos + 4:end]) != crc:
+            break
+        entries.append((seq, op, delta, a, b, reg, data[pos + _ENTRY.size:end].decode("utf-8")))
+        pos = end
+    return entries
@@ -23,13 +23,20 @@ class LeaderboardService:
     """
 
     def __init__(self) -> None:
-        """Initialize with dummy data."""
+        """Creates the (empty) treaps, the dummy data is seeded on first use."""
         # initialization of the treaps for each difficulty/category
         self.leaderboard_easy = leaderboard_treap.LeaderboardTreap()
         self.leaderboard_medium = leaderboard_treap.LeaderboardTreap()
         self.leaderboard_hard = leaderboard_treap.LeaderboardTreap()
         self.leaderboard_time_trial = leaderboard_treap.LeaderboardTreap()
-        
+        # seeding is left to the first read or insert, so it is not on the app's startup path
+        self._seeded: bool = False
+
+    def _seed(self) -> None:
+        """Loads the dummy data, once."""
+        if self._seeded:
+            return
+        self._seeded = True
         # initialization of the list for the leaderboard
         self.add_entry(LeaderboardEntry("NOVA",  "Hard",       52, 30.90))
         self.add_entry(LeaderboardEntry("BYTE",  "Medium",     66, 30.40))
@@ -121,6 +128,7 @@ class LeaderboardService:
         Returns:
              List of (Username, Score, Time, Difficulty) tuples.
         """
+        self._seed()
         match difficulty:
             case "Easy":
                 top10 = self.leaderboard_easy.getTop10()
@@ -149,6 +157,7 @@ class LeaderboardService:
         Internal: Add a new entry to the leaderboard.
         If an entry exists for the same player and difficulty, keep the best one.
         """
+        self._seed()
         # # separate entries into "same player+diff" vs "others"
         # existing_index = -1
         # for i, e in enumerate(self._entries):
@@ -1,9 +1,38 @@
-from ui import PanicPasteApp
+import argparse
+import time
+
+# startup clock for --profile-startup, read before anything heavy is imported
+_STARTED: float = time.perf_counter()
 
 
 def main() -> None:
     """Entry point of the application."""
-    app = PanicPasteApp()
+    parser = argparse.ArgumentParser(description="Panic Paste")
+    parser.add_argument("--async-check", action="store_true",
+                        help="check the input against the passage on a worker thread")
+    parser.add_argument("--race", metavar="HOST:PORT",
+                        help="race other players through a race server (python race.py serve)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print the time to the first frame by phase, then exit")
+    args = parser.parse_args()
+
+    race = None
+    if args.race:
+        host, _, port = args.race.rpartition(":")
+        if not host or not port.isdigit():
+            parser.error("--race expects HOST:PORT")
+        race = (host, int(port))
+
+    profile = None
+    if args.profile_startup:
+        from perf import StartupProfile
+        profile = StartupProfile(_STARTED)
+    # tkinter and the native modules come in with the UI, --help does not pay for them
+    from ui import PanicPasteApp
+    if profile is not None:
+        profile.mark("imports")
+
+    app = PanicPasteApp(async_check=args.async_check, race=race, profile=profile)
     app.mainloop()
 
 
@@ -0,0 +1,85 @@
+import time
+from collections import deque
+from typing import Callable, Deque, Tuple
+
+
+def words_per_minute(chars: int, seconds: float) -> int:
+    """Standard 5-characters-per-word WPM, rounded to the nearest integer."""
+    minutes = max(seconds / 60.0, 1e-6)
+    return int(((chars / 5.0) / minutes) + 0.5)
+
+
+class RunMetrics:
+    """
+    Live statistics of one run, updated in O(1) per edit.
+
+    correct_chars is the length of the correctly typed prefix (everything before the
+    first error, capped at the passage length), so mashing keys after a mistake does not
+    raise WPM. The same counter gives the live and the end-of-run WPM, no pass over the
+    text is needed at the end.
+
+    With the off-thread checker only the latest edit of a burst gets a check result, so
+    errors typed in the superseded edits of that burst are not counted.
+    """
+
+    # seconds of history behind the rolling WPM
+    WINDOW: float = 5.0
+    # the rolling WPM needs at least this much history before it means anything
+    MIN_SPAN: float = 1.0
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock: Callable[[], float] = clock
+        self.reset()
+
+    def reset(self) -> None:
+        self.keystrokes: int = 0        # edits (a coalesced burst or a paste counts once)
+        self.chars_typed: int = 0       # characters inserted, pasted ones included
+        self.errors: int = 0            # inserted characters that landed after the first error
+        self.correct_chars: int = 0
+        self._last_insert: Tuple[int, int] = (0, 0)     # (start, length) of the latest insert
+        self._samples: Deque[Tuple[float, int]] = deque()  # (time, correct_chars)
+
+    def record_edit(self, start: int, inserted: int) -> None:
+        if not self._samples:
+            # the window starts at the first edit, not at its check
+            self._samples.append((self.clock(), self.correct_chars))
+        self.keystrokes += 1
+        self.chars_typed += inserted
+        self._last_insert = (start, inserted)
+
+    def record_check(self, first_error: int, size: int, target_length: int) -> None:
+        """Takes the correctness check of the latest edit into account."""
+        start, inserted = self._last_insert
+        if first_error == -1:
+            self.correct_chars = min(size, target_length)
+        else:
+            self.correct_chars = first_error
+            # inserted chars at or after the first error are wrong
+            self.errors += min(inserted, max(0, start + inserted - max(start, first_error)))
+        self._last_insert = (0, 0)
+
+        now = self.clock()
+        samples = self._samples
+        samples.append((now, self.correct_chars))
+        # keep one sample at or before the window start so the window is always full
+        while len(samples) > 2 and samples[1][0] <= now - self.WINDOW:
+            samples.popleft()
+
+    @property
+    def accuracy(self) -> float:
+        """Share of inserted characters that were correct, 1.0 before anything was typed."""
+        if self.chars_typed == 0:
+            return 1.0
+        return max(0.0, (self.chars_typed - self.errors) / self.chars_typed)
+
+    def wpm(self, elapsed: float) -> int:
+        """WPM over the whole run."""
+        return words_per_minute(self.correct_chars, elapsed)
+
+    def live_wpm(self) -> int:
+        """WPM over the last WINDOW seconds."""
+        if not self._samples:
+            return 0
+        # span runs up to now, so the value decays while the player stops typing
+        t0, c0 = self._samples[0]
+        return words_per_minute(max(0, self.correct_chars - c0), max(self.clock() - t0, self.MIN_SPAN))
@@ -0,0 +1,290 @@
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from engine import PassageTarget
+from passages import PassageKey
+from replay import EditLog, OP_INSERT, OP_ERASE, OP_COPY, OP_CUT, OP_PASTE, TRANSFORM_OPS, OP_REPLACE
+
+# cost of one action, in "key presses"
+TYPE_COST: int = 1      # one typed character
+COPY_COST: int = 2      # select a range + Ctrl+C (cut costs the same)
+PASTE_COST: int = 1     # Ctrl+V
+ERASE_COST: int = 1     # backspace / delete, one per erase op
+TRANSFORM_COST: int = 2  # select a range + case / char map key
+
+
+class SuffixAutomaton:
+    """
+    Suffix automaton of a passage, built in O(n).
+
+    Every state is a set of substrings sharing their end positions; first_end[v] is
+    where the earliest occurrence of those substrings ends (exclusive), count[v] how
+    often they occur.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text: str = text
+        self.next: List[Dict[str, int]] = [{}]
+        self.link: List[int] = [-1]
+        self.length: List[int] = [0]
+        self.first_end: List[int] = [0]
+        self.count: List[int] = [0]
+
+        last = 0
+        for i, c in enumerate(text):
+            last = self._extend(last, c, i + 1)
+
+        # occurrence counts: every non-clone state is one end position, push them up the links
+        for v in sorted(range(1, len(self.length)), key=self.length.__getitem__, reverse=True):
+            if self.link[v] > 0:
+                self.count[self.link[v]] += self.count[v]
+
+    def _new_state(self, length: int, first_end: int, count: int) -> int:
+        self.next.append({})
+        self.link.append(-1)
+        self.length.append(length)
+        self.first_end.append(first_end)
+        self.count.append(count)
+        return len(self.length) - 1
+
+    def _extend(self, last: int, c: str, end: int) -> int:
+        nxt, link, length = self.next, self.link, self.length
+        cur = self._new_state(length[last] + 1, end, 1)
+        p = last
+        while p != -1 and c not in nxt[p]:
+            nxt[p][c] = cur
+            p = link[p]
+        if p == -1:
+            link[cur] = 0
+            return cur
+
+        q = nxt[p][c]
+        if length[p] + 1 == length[q]:
+            link[cur] = q
+            return cur
+
+        clone = self._new_state(length[p] + 1, self.first_end[q], 0)
+        nxt[clone] = dict(nxt[q])
+        link[clone] = link[q]
+        while p != -1 and nxt[p].get(c) == q:
+            nxt[p][c] = clone
+            p = link[p]
+        link[q] = link[cur] = clone
+        return cur
+
+    def copyable(self) -> Tuple[List[int], List[int]]:
+        """
+        For every prefix length i, the longest L such that text[i-L:i] already occurs
+        entirely inside text[:i-L] (so it could be copied instead of typed), and where
+        that earlier occurrence ends.
+
+        Returns:
+            Tuple[List[int], List[int]]: (longest[i], source_end[i]) for i in 0..n
+        """
+        n = len(self.text)
+        longest = [0] * (n + 1)
+        source_end = [0] * (n + 1)
+        v, L = 0, 0
+        for i, c in enumerate(self.text):
+            end = i + 1
+            v = self.next[v][c]
+            L += 1
+            # shrink until the earliest occurrence ends before this one starts
+            while L > 0 and self.first_end[v] > end - L:
+                L -= 1
+                if L <= self.length[self.link[v]]:
+                    v = self.link[v]
+            longest[end] = L
+            source_end[end] = self.first_end[v] if L else 0
+        return longest, source_end
+
+    def repeated_substrings(self, min_length: int = 4, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        Longest repeated substrings (one per automaton state), ranked by how many
+        characters pasting them would save.
+        """
+        found: List[Tuple[int, str, int]] = []
+        for v in range(1, len(self.length)):
+            L, count = self.length[v], self.count[v]
+            if L >= min_length and count >= 2:
+                end = self.first_end[v]
+                found.append((L * (count - 1), self.text[end - L:end], count))
+        found.sort(reverse=True)
+        return [(s, count) for _saving, s, count in found[:limit]]
+
+
+@dataclass
+class Par:
+    """
+    Cheapest way found to produce a passage: cost in key presses and the actions behind it.
+    It is an upper bound (see _solve), a run can come in under it.
+    """
+    cost: int
+    typed: int
+    copies: int
+    pastes: int
+
+
+# passages ParSolver keeps solved, least recently used first (same scheme as GameEngine._targets)
+PAR_CACHE_SIZE: int = 32
+
+
+def _solve(target: PassageTarget) -> Par:
+    """
+    Left-to-right DP over the passage: dp[i] = cheapest way to produce text[:i] with
+    the cursor at the end. Each step either types one char, copies an earlier repeat
+    and pastes it (fresh clipboard), or pastes the clipboard it already carries again.
+
+    Fresh copies ending at i can start anywhere in [i - longest[i], i - 1]; that window
+    only ever moves right (longest[i+1] <= longest[i] + 1), so its minimum comes from a
+    monotone deque in O(1) amortized. Re-pastes are pushed forward from every i and
+    compared by substring hash. The clipboard is tracked along the best path only, so
+    this is an upper bound on the true optimum, but a tight one for passages built
+    around a few repeated phrases.
+    """
+    text = target.text
+    n = len(text)
+    longest, source_end = SuffixAutomaton(text).copyable()
+
+    INF = float("inf")
+    dp: List[float] = [INF] * (n + 1)
+    dp[0] = 0
+    clip: List[Optional[Tuple[int, int]]] = [None] * (n + 1)        # clipboard (start, length)
+    step: List[Tuple[int, int]] = [(0, 0)] * (n + 1)                 # (previous i, action)
+    pushed: List[float] = [INF] * (n + 1)                            # best re-paste landing at i
+    pushed_from: List[int] = [0] * (n + 1)
+
+    TYPE, COPY, REPASTE = 0, 1, 2
+    window: Deque[int] = deque()
+    for i in range(1, n + 1):
+        # window of copy starts j for a paste ending at i
+        j_new = i - 1
+        while window and dp[window[-1]] > dp[j_new]:
+            window.pop()
+        window.append(j_new)
+        while window and window[0] < i - longest[i]:
+            window.popleft()
+
+        best, action, prev = dp[i - 1] + TYPE_COST, TYPE, i - 1
+        if longest[i] and window:
+            j = window[0]
+            cost = dp[j] + COPY_COST + PASTE_COST
+            if cost < best:
+                best, action, prev = cost, COPY, j
+        if pushed[i] < best:
+            best, action, prev = pushed[i], REPASTE, pushed_from[i]
+
+        dp[i] = best
+        step[i] = (prev, action)
+        if action == TYPE:
+            clip[i] = clip[i - 1]
+        elif action == COPY:
+            length = i - prev
+            clip[i] = (source_end[i] - length, length)
+        else:
+            clip[i] = clip[prev]
+
+        # the clipboard can be pasted again right here if the text continues with it
+        if clip[i] is not None:
+            start, length = clip[i]
+            if i + length <= n and dp[i] + PASTE_COST < pushed[i + length] and \
+                    target.substring_hash(i, i + length) == target.substring_hash(start, start + length):
+                pushed[i + length] = dp[i] + PASTE_COST
+                pushed_from[i + length] = i
+
+    typed = copies = pastes = 0
+    i = n
+    while i > 0:
+        prev, action = step[i]
+        if action == TYPE:
+            typed += 1
+        elif action == COPY:
+            copies += 1
+            pastes += 1
+        else:
+            pastes += 1
+        i = prev
+    return Par(int(dp[n]), typed, copies, pastes)
+
+
+class ParSolver:
+    """
+    Solves par on a worker thread, once per passage.
+
+    GamePage submits the passage as a run starts, so par is usually there by the time
+    the results show; ResultsPage polls get() until it is. Results are kept per
+    PassageKey (a retry or a later run of the same passage costs nothing), least
+    recently used first, at most cache_size of them. _solve is pure Python and holds the
+    GIL, but the interpreter switches threads every few milliseconds, so the Tk thread
+    keeps handling input while a long passage is being solved.
+    """
+
+    def __init__(self, cache_size: int = PAR_CACHE_SIZE) -> None:
+        self.cache_size: int = cache_size
+        self._cond = threading.Condition()
+        self._jobs: Deque[Tuple[PassageKey, PassageTarget]] = deque()
+        self._pars: Dict[PassageKey, Par] = {}
+        self._closed: bool = False
+        self._thread = threading.Thread(target=self._run, name="par-solver", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: PassageKey, target: PassageTarget) -> None:
+        """Queues the passage unless its par is known or already queued."""
+        with self._cond:
+            if key in self._pars or any(k == key for k, _ in self._jobs):
+                return
+            self._jobs.append((key, target))
+            self._cond.notify()
+
+    def get(self, key: PassageKey) -> Optional[Par]:
+        """Par of the passage, None while it is still being solved (or was never submitted)."""
+        with self._cond:
+            par = self._pars.pop(key, None)
+            if par is not None:
+                self._pars[key] = par
+            return par
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._jobs and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key, target = self._jobs[0]
+
+            par = _solve(target)
+
+            with self._cond:
+                self._jobs.popleft()
+                self._pars[key] = par
+                if len(self._pars) > self.cache_size:
+                    del self._pars[next(iter(self._pars))]
+
+
+_TRANSFORMS = frozenset(TRANSFORM_OPS.values()) | {OP_REPLACE}
+
+
+def run_cost(log: EditLog) -> int:
+    """Key presses a recorded run took, in the same units as Par.cost."""
+    cost = 0
+    for op, b in zip(log.ops, log.b):
+        if op == OP_INSERT:
+            cost += b * TYPE_COST
+        elif op == OP_ERASE:
+            cost += ERASE_COST
+        elif op in (OP_COPY, OP_CUT):
+            cost += COPY_COST
+        elif op == OP_PASTE:
+            cost += PASTE_COST
+        elif op in _TRANSFORMS:
+            cost += TRANSFORM_COST
+    return cost
@@ -0,0 +1,229 @@
+import mmap
+import os
+import random
+import struct
+import sys
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Optional
+
+# (difficulty, index inside that difficulty) -> identifies a passage without holding its text
+PassageKey = Tuple[str, int]
+
+_HERE: str = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS_DIR: str = os.path.join(_HERE, "passages")
+DEFAULT_CORPUS_PACK: str = os.path.join(_HERE, "passages.pack")
+
+
+class PassageStore:
+    """
+    Lazily loaded passage corpus.
+
+    Only an offset index is built when the store is opened; passage text is read
+    on demand and kept in a small LRU cache.
+
+    Two corpus layouts are supported:
+        - a directory with one sub-directory per difficulty, one passage per file
+          (e.g. passages/Hard/003.txt, source code files are fine too)
+        - a packed file produced by PassageStore.pack(), which is memory-mapped and
+          indexed by fixed-size (offset, length) records, so no per-passage Python
+          objects exist until a passage is actually requested.
+
+    Packed file layout (little endian):
+        header   : magic "PPAK", version u16, difficulty count u16
+        per diff : name length u16, name (utf-8), count u32, table offset u64
+        tables   : count * (offset u64, length u32) records
+        data     : concatenated utf-8 passages
+    """
+
+    PACK_MAGIC: bytes = b"PPAK"
+    PACK_VERSION: int = 1
+    _HEADER = struct.Struct("<4sHH")
+    _DIFF_ENTRY = struct.Struct("<IQ")
+    _RECORD = struct.Struct("<QI")
+
+    def __init__(self, source: str, cache_size: int = 64) -> None:
+        """
+        Args:
+            source (str): Corpus directory or packed corpus file.
+            cache_size (int): Maximum number of decoded passages kept in memory.
+        """
+        self.source: str = source
+        self.cache_size: int = max(1, cache_size)
+        self._cache: "OrderedDict[PassageKey, str]" = OrderedDict()
+
+        self._mm: Optional[mmap.mmap] = None
+        self._file = None
+        # pack mode: difficulty -> (count, table offset)
+        self._tables: Dict[str, Tuple[int, int]] = {}
+        # directory mode: difficulty -> file paths
+        self._paths: Dict[str, List[str]] = {}
+
+        if os.path.isdir(source):
+            self._index_directory(source)
+        else:
+            self._index_pack(source)
+
+    @classmethod
+    def open_default(cls, cache_size: int = 64) -> "PassageStore":
+        """Opens the packed corpus if one was built, otherwise the passages/ directory."""
+        if os.path.isfile(DEFAULT_CORPUS_PACK):
+            return cls(DEFAULT_CORPUS_PACK, cache_size)
+        return cls(DEFAULT_CORPUS_DIR, cache_size)
+
+    # -------------------------------------------------------------------------
+    # Index building
+    # -------------------------------------------------------------------------
+
+    def _index_directory(self, root: str) -> None:
+        # only directory entries are listed here, file contents are never touched
+        for entry in sorted(os.scandir(root), key=lambda e: e.name):
+            if not entry.is_dir():
+                continue
+            files = sorted(
+                f.path for f in os.scandir(entry.path)
+                if f.is_file() and not f.name.startswith(".")
+            )
+            if files:
+                self._paths[entry.name] = files
+
+    def _index_pack(self, path: str) -> None:
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_diffs = self._HEADER.unpack_from(self._mm, 0)
+        if magic != self.PACK_MAGIC or version != self.PACK_VERSION:
+            self.close()
+            raise ValueError(f"Not a passage pack: {path}")
+
+        pos = self._HEADER.size
+        for _ in range(n_diffs):
+            (name_len,) = struct.unpack_from("<H", self._mm, pos)
+            pos += 2
+            name = self._mm[pos:pos + name_len].decode("utf-8")
+            pos += name_len
+            count, table_offset = self._DIFF_ENTRY.unpack_from(self._mm, pos)
+            pos += self._DIFF_ENTRY.size
+            self._tables[name] = (count, table_offset)
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
+    def difficulties(self) -> List[str]:
+        return list(self._tables) if self._mm is not None else list(self._paths)
+
+    def count(self, difficulty: str) -> int:
+        if self._mm is not None:
+            return self._tables.get(difficulty, (0, 0))[0]
+        return len(self._paths.get(difficulty, ()))
+
+    def sample(self, difficulty: str, rng: Optional[random.Random] = None) -> PassageKey:
+        """
+        Picks a random passage of the given difficulty in O(1).
+        Only the key is returned, use get() to load the text.
+        """
+        n = self.count(difficulty)
+        if n == 0:
+            raise ValueError(f"Invalid difficulty: {difficulty}")
+        return difficulty, (rng or random).randrange(n)
+
+    def get(self, key: PassageKey) -> str:
+        """
+        Returns the passage text for a key, loading it from disk if it is not cached.
+        """
+        text = self._cache.get(key)
+        if text is not None:
+            self._cache.move_to_end(key)
+            return text
+
+        text = self._load(key)
+        self._cache[key] = text
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return text
+
+    def _load(self, key: PassageKey) -> str:
+        difficulty, index = key
+        if not 0 <= index < self.count(difficulty):
+            raise KeyError(key)
+
+        if self._mm is not None:
+            _, table_offset = self._tables[difficulty]
+            offset, length = self._RECORD.unpack_from(self._mm, table_offset + index * self._RECORD.size)
+            return self._mm[offset:offset + length].decode("utf-8")
+
+        with open(self._paths[difficulty][index], "r", encoding="utf-8", newline="") as f:
+            return self._strip_file_newline(f.read())
+
+    @staticmethod
+    def _strip_file_newline(text: str) -> str:
+        # editors end files with a newline, that is not part of the passage
+        if text.endswith("\r\n"):
+            return text[:-2]
+        if text.endswith("\n"):
+            return text[:-1]
+        return text
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # -------------------------------------------------------------------------
+    # Packing
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def pack(cls, directory: str, out_path: str) -> None:
+        """
+        Packs a corpus directory into a single memory-mappable file.
+
+        Args:
+            directory (str): Corpus directory (one sub-directory per difficulty).
+            out_path (str): Destination file.
+        """
+        store = cls(directory, cache_size=1)
+        diffs = store.difficulties()
+
+        header_size = cls._HEADER.size
+        for name in diffs:
+            header_size += 2 + len(name.encode("utf-8")) + cls._DIFF_ENTRY.size
+
+        table_offsets: List[int] = []
+        pos = header_size
+        for name in diffs:
+            table_offsets.append(pos)
+            pos += store.count(name) * cls._RECORD.size
+        data_offset = pos
+
+        with open(out_path, "wb") as out:
+            out.write(cls._HEADER.pack(cls.PACK_MAGIC, cls.PACK_VERSION, len(diffs)))
+            for name, table_offset in zip(diffs, table_offsets):
+                raw_name = name.encode("utf-8")
+                out.write(struct.pack("<H", len(raw_name)))
+                out.write(raw_name)
+                out.write(cls._DIFF_ENTRY.pack(store.count(name), table_offset))
+
+            # passages are streamed one at a time into the data area; only their
+            # (offset, length) records are kept, and written into the tables at the end
+            records = bytearray()
+            offset = data_offset
+            out.seek(data_offset)
+            for name in diffs:
+                for i in range(store.count(name)):
+                    blob = store._load((name, i)).encode("utf-8")
+                    out.write(blob)
+                    records += cls._RECORD.pack(offset, len(blob))
+                    offset += len(blob)
+            out.seek(header_size)
+            out.write(records)
+
+if __name__ == "__main__":
+    # usage: python passages.py [corpus_dir] [out_file]
+    src = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CORPUS_DIR
+    dst = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_CORPUS_PACK
+    PassageStore.pack(src, dst)
+    print(f"packed {src} -> {dst}")
@@ -0,0 +1,134 @@
+import sys
+import time
+from array import array
+from typing import Dict, List, Optional, TextIO, Tuple
+
+
+class LatencyHistogram:
+    """
+    Bounded ring buffer of latency samples (nanoseconds) for one stage.
+    Old samples are overwritten, so memory stays constant for any session length.
+    """
+
+    def __init__(self, capacity: int = 2048) -> None:
+        self.capacity: int = capacity
+        self.samples: array = array("q", bytes(8 * capacity))
+        self.count: int = 0          # total samples ever added
+        self._pos: int = 0
+
+    def add(self, ns: int) -> None:
+        self.samples[self._pos] = ns
+        self._pos = (self._pos + 1) % self.capacity
+        self.count += 1
+
+    def percentiles(self, *ps: float) -> List[float]:
+        """Requested percentiles (0-100) of the retained samples, in milliseconds."""
+        n = min(self.count, self.capacity)
+        if n == 0:
+            return [0.0 for _ in ps]
+        ordered = sorted(self.samples[:n])
+        return [ordered[min(n - 1, int(p / 100.0 * n))] / 1e6 for p in ps]
+
+    def reset(self) -> None:
+        self.count = 0
+        self._pos = 0
+
+
+class KeystrokeProbe:
+    """
+    Hot-path instrumentation for one keystroke, from the Tk event to finished highlighting.
+
+    Call begin() when the event arrives, mark(stage) after each stage finishes (the
+    time since the previous mark is charged to that stage) and end() when the key is
+    fully handled. Marks outside begin()/end() are ignored, so the session can mark
+    unconditionally even when it is driven headlessly.
+    """
+
+    # journal is the crash journal append, a share of editor (it happens while the log records)
+    STAGES: Tuple[str, ...] = ("widget", "treap", "editor", "journal", "check", "render", "highlight", "total")
+
+    def __init__(self, capacity: int = 2048) -> None:
+        self.stages: Dict[str, LatencyHistogram] = {s: LatencyHistogram(capacity) for s in self.STAGES}
+        self._start: int = 0
+        self._last: int = 0
+        self._active: bool = False
+
+    def begin(self) -> None:
+        self._start = self._last = time.perf_counter_ns()
+        self._active = True
+
+    def mark(self, stage: str) -> None:
+        if not self._active:
+            return
+        now = time.perf_counter_ns()
+        self.stages[stage].add(now - self._last)
+        self._last = now
+
+    def add(self, stage: str, ns: int) -> None:
+        """Records a stage that runs outside the key handler (e.g. deferred to the next frame)."""
+        self.stages[stage].add(ns)
+
+    def end(self) -> None:
+        if not self._active:
+            return
+        self.stages["total"].add(time.perf_counter_ns() - self._start)
+        self._active = False
+
+    def summary(self) -> Dict[str, Tuple[float, float, int]]:
+        """stage -> (p50 ms, p99 ms, samples)"""
+        out: Dict[str, Tuple[float, float, int]] = {}
+        for name, hist in self.stages.items():
+            p50, p99 = hist.percentiles(50, 99)
+            out[name] = (p50, p99, hist.count)
+        return out
+
+    def format(self) -> str:
+        lines = [f"{'STAGE':<10}{'P50':>8}{'P99':>8}"]
+        for name, (p50, p99, count) in self.summary().items():
+            if count:
+                lines.append(f"{name:<10}{p50:>6.2f}ms{p99:>6.2f}ms")
+        return "\n".join(lines)
+
+    def dump(self, label: str = "", out: Optional[TextIO] = None) -> None:
+        """Writes the per-stage p50/p99 table, e.g. at the end of a run."""
+        out = out or sys.stdout
+        total = self.stages["total"].count
+        out.write(f"--- keystroke latency {label} ({total} keys) ---\n{self.format()}\n")
+
+    def reset(self) -> None:
+        for hist in self.stages.values():
+            hist.reset()
+        self._active = False
+
+
+class StartupProfile:
+    """
+    Wall time of every startup phase up to the first drawn frame
+    (python main.py --profile-startup). mark(phase) charges the time since the
+    previous mark to that phase, like KeystrokeProbe but for one run only.
+    """
+
+    def __init__(self, started: Optional[float] = None) -> None:
+        self.started: float = started if started is not None else time.perf_counter()
+        self._last: float = self.started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self._last - self.started
+
+    def format(self) -> str:
+        lines = [f"{'PHASE':<14}{'MS':>9}"]
+        for phase, seconds in self.phases:
+            lines.append(f"{phase:<14}{seconds * 1000:>9.1f}")
+        lines.append(f"{'first frame':<14}{self.total * 1000:>9.1f}")
+        return "\n".join(lines)
+
+    def dump(self, out: Optional[TextIO] = None) -> None:
+        out = out or sys.stdout
+        out.write(f"--- startup ---\n{self.format()}\n")
@@ -0,0 +1,588 @@
+import argparse
+import asyncio
+import random
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from engine import GameEngine, PassageTarget
+from passages import PassageKey, PassageStore
+from perf import LatencyHistogram
+
+# -------------------------------------------------------------------------
+# Wire format
+# -------------------------------------------------------------------------
+# Every message is a frame: u16 payload length, then the payload, whose first
+# byte is the message type. Progress travels as deltas: a flags byte naming the
+# fields that changed, then one zigzag varint per changed field, relative to the
+# last progress the receiver saw for that racer. A typed key is 3-4 bytes on the
+# wire, whatever the size of the buffer.
+# -------------------------------------------------------------------------
+
+MSG_JOIN: int = 1       # c->s  name, difficulty
+MSG_WELCOME: int = 2    # s->c  player id
+MSG_START: int = 3      # s->c  passage key + hash, roster (id, name)*
+MSG_PROGRESS: int = 4   # c->s  progress delta
+MSG_BATCH: int = 5      # s->c  (id, progress delta)* of every racer that moved since the last tick
+MSG_FINISH: int = 6     # c->s  wpm, time
+MSG_RESULT: int = 7     # s->c  id, wpm, time
+
+FIELD_LENGTH: int = 1
+FIELD_ERROR: int = 2
+FIELD_OPS: int = 4
+
+_FRAME = struct.Struct("<H")
+_U16 = struct.Struct("<H")
+_FINISH = struct.Struct("<HI")          # wpm, time in ms
+_START = struct.Struct("<IQ")           # passage index, passage hash (low 64 bits)
+
+# seconds between two progress batches (server) / two progress reports (client)
+TICK_SECONDS: float = 0.05
+
+
+class Progress(NamedTuple):
+    """What a racer shows the others: buffer length, first error (-1 = none) and edit count."""
+    length: int = 0
+    first_error: int = -1
+    ops: int = 0
+
+    def correct(self, target_length: int) -> int:
+        """Correctly typed prefix, what the progress bars show."""
+        return min(self.length, target_length) if self.first_error == -1 else self.first_error
+
+
+class Racer(NamedTuple):
+    id: int
+    name: str
+    progress: Progress = Progress()
+    wpm: int = -1               # -1 until the racer finished
+    seconds: float = 0.0
+
+
+def _put_varint(out: bytearray, value: int) -> None:
+    # zigzag, so small negative deltas (backspace) stay one byte
+    v = (value << 1) ^ (value >> 63)
+    while v >= 0x80:
+        out.append((v & 0x7F) | 0x80)
+        v >>= 7
+    out.append(v)
+
+
+def _get_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    v = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        v |= (b & 0x7F) << shift
+        if b < 0x80:
+            break
+        shift += 7
+    return (v >> 1) ^ -(v & 1), pos
+
+
+def _put_str(out: bytearray, s: str) -> None:
+    raw = s.encode("utf-8")[:255]
+    out.append(len(raw))
+    out += raw
+
+
+def _get_str(data: bytes, pos: int) -> Tuple[str, int]:
+    n = data[pos]
+    return data[pos + 1:pos + 1 + n].decode("utf-8", "replace"), pos + 1 + n
+
+
+def encode_delta(out: bytearray, old: Progress, new: Progress) -> None:
+    """Appends the delta from old to new (flags + changed fields)."""
+    flags = 0
+    if new.length != old.length:
+        flags |= FIELD_LENGTH
+    if new.first_error != old.first_error:
+        flags |= FIELD_ERROR
+    if new.ops != old.ops:
+        flags |= FIELD_OPS
+    out.append(flags)
+    if flags & FIELD_LENGTH:
+        _put_varint(out, new.length - old.length)
+    if flags & FIELD_ERROR:
+        _put_varint(out, new.first_error - old.first_error)
+    if flags & FIELD_OPS:
+        _put_varint(out, new.ops - old.ops)
+
+
+def decode_delta(data: bytes, pos: int, old: Progress) -> Tuple[Progress, int]:
+    flags = data[pos]
+    pos += 1
+    length, first_error, ops = old
+    if flags & FIELD_LENGTH:
+        d, pos = _get_varint(data, pos)
+        length += d
+    if flags & FIELD_ERROR:
+        d, pos = _get_varint(data, pos)
+        first_error += d
+    if flags & FIELD_OPS:
+        d, pos = _get_varint(data, pos)
+        ops += d
+    return Progress(length, first_error, ops), pos
+
+
+def _frame(payload: bytearray) -> bytes:
+    return _FRAME.pack(len(payload)) + bytes(payload)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (n,) = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    return await reader.readexactly(n)
+
+
+def passage_hash(target: PassageTarget) -> int:
+    """Hash both ends compare before racing, so nobody types a different text."""
+    return target.prefix_hashes[-1] & 0xFFFFFFFFFFFFFFFF
+
+
+# -------------------------------------------------------------------------
+# Server
+# -------------------------------------------------------------------------
+
+@dataclass
+class _Room:
+    difficulty: str
+    writers: Dict[int, asyncio.StreamWriter] = field(default_factory=dict)
+    names: Dict[int, str] = field(default_factory=dict)
+    progress: Dict[int, Progress] = field(default_factory=dict)   # latest reported
+    sent: Dict[int, Progress] = field(default_factory=dict)       # as of the last batch
+    changed: Set[int] = field(default_factory=set)
+    started: bool = False
+    lobby_timer: Optional[asyncio.TimerHandle] = None
+
+
+class RaceServer:
+    """
+    Matches players into rooms per difficulty and relays progress between them.
+
+    A room starts when room_size players joined, or lobby_seconds after the first
+    one did. From then on every report only updates the room's table; once per
+    tick the racers that moved since the last tick go out to everyone as one batch
+    of deltas, so the outgoing traffic is bounded by the tick rate, not by how fast
+    anyone types.
+    """
+
+    def __init__(self, passages: PassageStore, room_size: int = 4, lobby_seconds: float = 10.0,
+                 tick: float = TICK_SECONDS) -> None:
+        self.passages: PassageStore = passages
+        self.room_size: int = room_size
+        self.lobby_seconds: float = lobby_seconds
+        self.tick: float = tick
+        self._lobbies: Dict[str, _Room] = {}
+        self._rooms: List[_Room] = []
+        self._next_id: int = 1
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._ticker: Optional[asyncio.Task] = None
+        # traffic counters
+        self.frames_in: int = 0
+        self.frames_out: int = 0
+        self.bytes_in: int = 0
+        self.bytes_out: int = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> int:
+        """Starts listening; returns the port (pass 0 for any free one)."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self._ticker = asyncio.ensure_future(self._tick_loop())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _send(self, writer: asyncio.StreamWriter, data: bytes) -> None:
+        if writer.is_closing():
+            return
+        writer.write(data)
+        self.frames_out += 1
+        self.bytes_out += len(data)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        player_id = 0
+        room: Optional[_Room] = None
+        try:
+            while True:
+                data = await _read_frame(reader)
+                self.frames_in += 1
+                self.bytes_in += _FRAME.size + len(data)
+                kind = data[0]
+                if kind == MSG_JOIN and room is None:
+                    name, pos = _get_str(data, 1)
+                    difficulty, _ = _get_str(data, pos)
+                    if not self.passages.count(difficulty):
+                        break
+                    player_id = self._next_id
+                    self._next_id += 1
+                    self._send(writer, _frame(bytearray([MSG_WELCOME]) + _U16.pack(player_id)))
+                    room = self._join(player_id, name, difficulty, writer)
+                elif kind == MSG_PROGRESS and room is not None and room.started:
+                    old = room.progress[player_id]
+                    room.progress[player_id], _ = decode_delta(data, 1, old)
+                    room.changed.add(player_id)
+                elif kind == MSG_FINISH and room is not None and room.started:
+                    out = bytearray([MSG_RESULT]) + _U16.pack(player_id) + data[1:1 + _FINISH.size]
+                    frame = _frame(out)
+                    for w in room.writers.values():
+                        self._send(w, frame)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if room is not None:
+                room.writers.pop(player_id, None)
+                if not room.started and room is self._lobbies.get(room.difficulty):
+                    room.names.pop(player_id, None)
+                    room.progress.pop(player_id, None)
+                    room.sent.pop(player_id, None)
+            writer.close()
+
+    def _join(self, player_id: int, name: str, difficulty: str, writer: asyncio.StreamWriter) -> _Room:
+        room = self._lobbies.get(difficulty)
+        if room is None:
+            room = self._lobbies[difficulty] = _Room(difficulty)
+            room.lobby_timer = asyncio.get_running_loop().call_later(self.lobby_seconds, self._start_room, room)
+        room.writers[player_id] = writer
+        room.names[player_id] = name
+        room.progress[player_id] = room.sent[player_id] = Progress()
+        if len(room.writers) >= self.room_size:
+            self._start_room(room)
+        return room
+
+    def _start_room(self, room: _Room) -> None:
+        if room.started:
+            return
+        room.started = True
+        if room.lobby_timer is not None:
+            room.lobby_timer.cancel()
+        if self._lobbies.get(room.difficulty) is room:
+            del self._lobbies[room.difficulty]
+        if not room.writers:
+            return
+        self._rooms.append(room)
+
+        key = self.passages.sample(room.difficulty)
+        target = PassageTarget.build(self.passages.get(key))
+        out = bytearray([MSG_START]) + _START.pack(key[1], passage_hash(target))
+        _put_str(out, key[0])
+        out.append(len(room.names))
+        for pid, name in room.names.items():
+            out += _U16.pack(pid)
+            _put_str(out, name)
+        frame = _frame(out)
+        for w in room.writers.values():
+            self._send(w, frame)
+
+    async def _tick_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            self._broadcast()
+
+    def _broadcast(self) -> None:
+        alive: List[_Room] = []
+        for room in self._rooms:
+            if not room.writers:
+                continue
+            alive.append(room)
+            if not room.changed:
+                continue
+            out = bytearray([MSG_BATCH])
+            out.append(len(room.changed))
+            for pid in room.changed:
+                new = room.progress[pid]
+                out += _U16.pack(pid)
+                encode_delta(out, room.sent[pid], new)
+                room.sent[pid] = new
+            room.changed.clear()
+            frame = _frame(out)
+            for w in room.writers.values():
+                self._send(w, frame)
+        self._rooms = alive
+
+
+# -------------------------------------------------------------------------
+# Client
+# -------------------------------------------------------------------------
+
+class RaceClient:
+    """
+    One racer's connection, driven by an asyncio loop.
+
+    report() only stores the latest progress (it may be called from another thread,
+    see RaceLink); the send loop turns it into at most one delta per tick. standings
+    is replaced as a whole tuple after every batch, so readers on other threads
+    always see a consistent table.
+    """
+
+    def __init__(self, name: str, difficulty: str, tick: float = TICK_SECONDS) -> None:
+        self.name: str = name
+        self.difficulty: str = difficulty
+        self.tick: float = tick
+        self.player_id: int = 0
+        self.passage_key: Optional[PassageKey] = None
+        self.passage_hash: int = 0
+        self.started: bool = False
+        self.standings: Tuple[Racer, ...] = ()
+        self._racers: Dict[int, Racer] = {}
+        self._latest: Progress = Progress()
+        self._sent: Progress = Progress()
+        self._sent_at: float = 0.0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._start_event: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Future] = []
+        # time from sending a delta to seeing it come back in a batch
+        self.echo_latency: LatencyHistogram = LatencyHistogram(256)
+        self.bytes_out: int = 0
+        self.bytes_in: int = 0
+        # what the same reports would have cost sending the whole buffer (load test)
+        self.buffer_bytes: int = 0
+
+    async def connect(self, host: str, port: int) -> None:
+        self._start_event = asyncio.Event()
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        out = bytearray([MSG_JOIN])
+        _put_str(out, self.name)
+        _put_str(out, self.difficulty)
+        self._write(_frame(out))
+        self._tasks = [asyncio.ensure_future(self._read_loop()), asyncio.ensure_future(self._send_loop())]
+
+    async def wait_started(self) -> None:
+        await self._start_event.wait()
+
+    def report(self, progress: Progress) -> None:
+        self._latest = progress
+
+    def finish(self, wpm: int, seconds: float) -> None:
+        """Must run on the client's loop (RaceLink.finish hops over to it)."""
+        self._flush()
+        self._write(_frame(bytearray([MSG_FINISH]) + _FINISH.pack(min(wpm, 0xFFFF), int(seconds * 1000))))
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+    def _write(self, data: bytes) -> None:
+        self._writer.write(data)
+        self.bytes_out += len(data)
+
+    def _flush(self) -> None:
+        latest = self._latest
+        if latest == self._sent or not self.started:
+            return
+        out = bytearray([MSG_PROGRESS])
+        encode_delta(out, self._sent, latest)
+        self._write(_frame(out))
+        self.buffer_bytes += _FRAME.size + 1 + latest.length
+        self._sent = latest
+        self._sent_at = time.perf_counter()
+
+    async def _send_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            self._flush()
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                data = await _read_frame(self._reader)
+                self.bytes_in += _FRAME.size + len(data)
+                self._dispatch(data)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    def _dispatch(self, data: bytes) -> None:
+        kind = data[0]
+        if kind == MSG_WELCOME:
+            (self.player_id,) = _U16.unpack_from(data, 1)
+        elif kind == MSG_START:
+            index, phash = _START.unpack_from(data, 1)
+            difficulty, pos = _get_str(data, 1 + _START.size)
+            self.passage_key = (difficulty, index)
+            self.passage_hash = phash
+            count = data[pos]
+            pos += 1
+            for _ in range(count):
+                (pid,) = _U16.unpack_from(data, pos)
+                name, pos = _get_str(data, pos + 2)
+                self._racers[pid] = Racer(pid, name)
+            self.started = True
+            self._publish()
+            self._start_event.set()
+        elif kind == MSG_BATCH:
+            count = data[1]
+            pos = 2
+            for _ in range(count):
+                (pid,) = _U16.unpack_from(data, pos)
+                racer = self._racers.get(pid) or Racer(pid, "?")
+                progress, pos = decode_delta(data, pos + 2, racer.progress)
+                self._racers[pid] = racer._replace(progress=progress)
+                if pid == self.player_id and progress == self._sent:
+                    self.echo_latency.add(int((time.perf_counter() - self._sent_at) * 1e9))
+            self._publish()
+        elif kind == MSG_RESULT:
+            pid, wpm, ms = struct.unpack_from("<HHI", data, 1)
+            racer = self._racers.get(pid) or Racer(pid, "?")
+            self._racers[pid] = racer._replace(wpm=wpm, seconds=ms / 1000.0)
+            self._publish()
+
+    def _publish(self) -> None:
+        self.standings = tuple(self._racers.values())
+
+
+class RaceLink:
+    """
+    Runs a RaceClient on its own asyncio loop thread for the Tk app. Everything here
+    is safe to call from the Tk thread; the page polls started / standings from a
+    scheduler ticker instead of being called back.
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.client: Optional[RaceClient] = None
+        self.error: str = ""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="race-client", daemon=True)
+        self._thread.start()
+
+    def join(self, name: str, difficulty: str) -> None:
+        """Connects and queues for a race; leaves any race joined before."""
+        self.leave()
+        self.error = ""
+        self.client = RaceClient(name, difficulty)
+        future = asyncio.run_coroutine_threadsafe(self.client.connect(self.host, self.port), self._loop)
+        future.add_done_callback(self._connected)
+
+    def _connected(self, future) -> None:
+        if future.exception() is not None:
+            self.error = f"CANNOT REACH RACE SERVER {self.host}:{self.port}"
+
+    @property
+    def started(self) -> bool:
+        return self.client is not None and self.client.started
+
+    def standings(self) -> Tuple[Racer, ...]:
+        return self.client.standings if self.client is not None else ()
+
+    def report(self, length: int, first_error: int, ops: int) -> None:
+        if self.client is not None:
+            self.client.report(Progress(length, first_error, ops))
+
+    def finish(self, wpm: int, seconds: float) -> None:
+        if self.client is not None:
+            self._loop.call_soon_threadsafe(self.client.finish, wpm, seconds)
+
+    def leave(self) -> None:
+        if self.client is not None:
+            asyncio.run_coroutine_threadsafe(self.client.close(), self._loop)
+            self.client = None
+
+
+# -------------------------------------------------------------------------
+# Load test
+# -------------------------------------------------------------------------
+
+async def _bot(index: int, port: int, difficulty: str, speed: float, rng: random.Random,
+               store: PassageStore) -> RaceClient:
+    # imported here so the server and the UI do not pull in the simulator
+    from session import GameSession
+    from simulator import apply_action, typist_script
+
+    client = RaceClient(f"BOT{index}", difficulty)
+    await client.connect("127.0.0.1", port)
+    await client.wait_started()
+
+    engine = GameEngine(store)
+    engine.start_game(client.name, difficulty, client.passage_key)
+    if passage_hash(engine.target) != client.passage_hash:
+        raise ValueError(f"Invalid race: passage {client.passage_key} differs from the server's")
+    session = GameSession(engine)
+    session.reset()
+    cursor = 0
+    for dt, action, args in typist_script(engine.target.text, rng, cps=rng.uniform(5.0, 12.0)):
+        await asyncio.sleep(dt / speed)
+        cursor = apply_action(session, cursor, action, args)
+        client.report(Progress(session.buffer.size(), session.first_error, len(session.log)))
+        if session.complete:
+            break
+    res = session.result()
+    client.finish(res.wpm, res.time_seconds)
+    # let the last batches arrive before hanging up
+    await asyncio.sleep(client.tick * 4)
+    await client.close()
+    return client
+
+
+async def load_test(racers: int, room_size: int, difficulty: str, speed: float, seed: int = 0) -> None:
+    """
+    Races `racers` scripted typists (simulator.typist_script) against each other through
+    a local RaceServer, all on one event loop, and reports traffic and echo latency.
+    """
+    store = PassageStore.open_default()
+    server = RaceServer(store, room_size=room_size, lobby_seconds=2.0)
+    port = await server.start("127.0.0.1", 0)
+    rng = random.Random(seed)
+
+    started = time.perf_counter()
+    clients = await asyncio.gather(*(_bot(i, port, difficulty, speed, random.Random(rng.random()), store)
+                                     for i in range(racers)))
+    wall = time.perf_counter() - started
+    await server.close()
+
+    echo = LatencyHistogram(256 * len(clients))
+    for c in clients:
+        n = min(c.echo_latency.count, c.echo_latency.capacity)
+        for ns in c.echo_latency.samples[:n]:
+            echo.add(ns)
+    p50, p99 = echo.percentiles(50, 99)
+    reports = server.frames_in - racers
+    sent = sum(c.bytes_out for c in clients)
+    full = sum(c.buffer_bytes for c in clients)
+    finished = sum(1 for c in clients for r in c.standings if r.id == c.player_id and r.wpm != -1)
+    print(f"racers {racers} in rooms of {room_size} ({finished} finished), {wall:0.1f}s wall")
+    print(f"in:  {server.frames_in} frames, {server.bytes_in / 1024:0.1f} KB "
+          f"({server.bytes_in / max(1, server.frames_in):0.1f} B/frame, {reports / wall:0.0f} reports/s)")
+    print(f"out: {server.frames_out} frames, {server.bytes_out / 1024:0.1f} KB "
+          f"({server.bytes_out / wall / 1024:0.1f} KB/s)")
+    print(f"deltas: {sent / 1024:0.1f} KB sent by the racers, {full / 1024:0.1f} KB as full buffers "
+          f"({full / max(1, sent):0.0f}x)")
+    print(f"echo latency p50 {p50:0.1f}ms p99 {p99:0.1f}ms (report -> own delta back in a batch)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Panic Paste race server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="run a race server")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--room-size", type=int, default=4)
+    serve.add_argument("--lobby", type=float, default=10.0, help="seconds a room waits for more players")
+    load = sub.add_parser("loadtest", help="race simulated players through a local server")
+    load.add_argument("--racers", type=int, default=200)
+    load.add_argument("--room-size", type=int, default=8)
+    load.add_argument("--difficulty", default="Easy")
+    load.add_argument("--speed", type=float, default=4.0, help="typing speed multiplier for the bots")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        async def serve_forever() -> None:
+            server = RaceServer(PassageStore.open_default(), args.room_size, args.lobby)
+            port = await server.start(args.host, args.port)
+            print(f"race server on {args.host}:{port}")
+            await asyncio.Event().wait()
+        asyncio.run(serve_forever())
+    else:
+        asyncio.run(load_test(args.racers, args.room_size, args.difficulty, args.speed))
+
+
+if __name__ == "__main__":
+    main()
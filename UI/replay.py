@@ -0,0 +1,276 @@
+import struct
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import implicit_treap
+from clipboard import ClipboardRegisters
+from engine import PassageTarget
+from metrics import words_per_minute
+
+# edit operation codes stored in EditLog.ops
+OP_INSERT: int = 0   # a = position, b = number of inserted chars (text in the payload)
+OP_ERASE: int = 1    # [a, b) removed
+OP_COPY: int = 2     # [a, b) copied to clipboard register reg
+OP_CUT: int = 3      # [a, b) moved to clipboard register reg
+OP_PASTE: int = 4    # clipboard register reg inserted at a
+OP_UPPER: int = 5    # [a, b) upper-cased
+OP_LOWER: int = 6    # [a, b) lower-cased
+OP_TOGGLE: int = 7   # case of [a, b) swapped
+OP_REPLACE: int = 8  # chars of [a, b) mapped src -> dst (src + dst in the payload, reg = len(src))
+
+OP_NAMES: Tuple[str, ...] = ("insert", "erase", "copy", "cut", "paste", "upper", "lower", "toggle", "replace")
+
+# range transforms by name, as GameSession.transform takes them
+TRANSFORM_OPS: Dict[str, int] = {"upper": OP_UPPER, "lower": OP_LOWER, "toggle": OP_TOGGLE}
+
+
+def apply_transform(buffer, op: int, start: int, end: int, src: str = "", dst: str = "") -> None:
+    """Applies a logged range transform to a treap (lazily, O(log N) natively)."""
+    if op == OP_UPPER:
+        buffer.upper(start, end)
+    elif op == OP_LOWER:
+        buffer.lower(start, end)
+    elif op == OP_TOGGLE:
+        buffer.toggle_case(start, end)
+    elif op == OP_REPLACE:
+        buffer.replace_chars(start, end, src, dst)
+    else:
+        raise ValueError(f"Invalid transform op: {op}")
+
+# (op, seconds since the first op, a, b, inserted text, clipboard register)
+LogEntry = Tuple[int, float, int, int, str, int]
+
+
+class EditLog:
+    """
+    Compact record of how a run happened.
+
+    Every edit applied to the text buffer is stored as one slot in a set of parallel
+    typed arrays (op code, delta time, two positions, clipboard register), no per-edit
+    Python objects.
+    Times are stored as microseconds since the previous edit, inserted text is
+    appended to a single payload string.
+    """
+
+    MAGIC: bytes = b"PPLG"
+    VERSION: int = 2
+    _HEADER = struct.Struct("<4sHI")   # magic, version, op count
+    _MAX_DELTA_US: int = 0xFFFFFFFF
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock: Callable[[], float] = clock
+        self.ops: array = array("B")
+        self.deltas: array = array("I")    # microseconds since the previous op
+        self.a: array = array("I")
+        self.b: array = array("I")
+        self.reg: array = array("B")       # clipboard register of copy / cut / paste, 0 otherwise
+        self._payload: List[str] = []
+        self._last_time: Optional[float] = None
+        # every record is mirrored to it when set (journal.EditJournal, crash recovery)
+        self.journal = None
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    # -------------------------------------------------------------------------
+    # Recording (called from the GamePage edit handlers)
+    # -------------------------------------------------------------------------
+
+    def record(self, op: int, a: int, b: int = 0, text: str = "", t: Optional[float] = None,
+               reg: int = 0) -> None:
+        now = self.clock() if t is None else t
+        if self._last_time is None:
+            delta = 0
+        else:
+            delta = min(max(0, int((now - self._last_time) * 1_000_000)), self._MAX_DELTA_US)
+        self._last_time = now
+
+        self.ops.append(op)
+        self.deltas.append(delta)
+        self.a.append(a)
+        self.b.append(b)
+        self.reg.append(reg)
+        if text:
+            self._payload.append(text)
+        if self.journal is not None:
+            self.journal.append(len(self.ops) - 1, op, delta, a, b, reg, text)
+
+    def insert(self, pos: int, text: str, t: Optional[float] = None) -> None:
+        self.record(OP_INSERT, pos, len(text), text, t)
+
+    def erase(self, start: int, end: int, t: Optional[float] = None) -> None:
+        self.record(OP_ERASE, start, end, t=t)
+
+    def copy(self, start: int, end: int, t: Optional[float] = None, reg: int = 0) -> None:
+        self.record(OP_COPY, start, end, t=t, reg=reg)
+
+    def cut(self, start: int, end: int, t: Optional[float] = None, reg: int = 0) -> None:
+        self.record(OP_CUT, start, end, t=t, reg=reg)
+
+    def paste(self, pos: int, t: Optional[float] = None, reg: int = 0) -> None:
+        self.record(OP_PASTE, pos, t=t, reg=reg)
+
+    def transform(self, op: int, start: int, end: int, src: str = "", dst: str = "",
+                  t: Optional[float] = None) -> None:
+        # a char map keeps both sides in the payload, reg tells where src ends (so src and
+        # dst have the same length, at most 255); the other transforms carry no text
+        if op == OP_REPLACE:
+            if len(src) != len(dst) or len(src) > 255:
+                raise ValueError(f"Invalid char map: {src!r} -> {dst!r}")
+        elif src or dst:
+            raise ValueError(f"Invalid transform: {OP_NAMES[op]} takes no char map")
+        self.record(op, start, end, src + dst, t=t, reg=len(src))
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+
+    @property
+    def payload(self) -> str:
+        if len(self._payload) > 1:
+            self._payload = ["".join(self._payload)]
+        return self._payload[0] if self._payload else ""
+
+    @property
+    def duration(self) -> float:
+        """Seconds between the first and the last recorded op."""
+        return sum(self.deltas) / 1_000_000
+
+    def __iter__(self) -> Iterator[LogEntry]:
+        payload = self.payload
+        p = 0
+        t_us = 0
+        for op, delta, a, b, reg in zip(self.ops, self.deltas, self.a, self.b, self.reg):
+            t_us += delta
+            text = ""
+            if op == OP_INSERT:
+                text = payload[p:p + b]
+                p += b
+            elif op == OP_REPLACE:
+                text = payload[p:p + 2 * reg]
+                p += 2 * reg
+            yield op, t_us / 1_000_000, a, b, text, reg
+
+    def op_counts(self) -> List[int]:
+        """Number of recorded ops per op code."""
+        counts = [0] * len(OP_NAMES)
+        for op in self.ops:
+            counts[op] += 1
+        return counts
+
+    # -------------------------------------------------------------------------
+    # Serialization (for score submission / bug reports)
+    # -------------------------------------------------------------------------
+
+    def to_bytes(self) -> bytes:
+        parts = [self._HEADER.pack(self.MAGIC, self.VERSION, len(self.ops))]
+        for arr in (self.ops, self.deltas, self.a, self.b, self.reg):
+            parts.append(arr.tobytes())
+        parts.append(self.payload.encode("utf-8"))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "EditLog":
+        magic, version, n = cls._HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Not an edit log")
+
+        log = cls()
+        pos = cls._HEADER.size
+        for arr in (log.ops, log.deltas, log.a, log.b, log.reg):
+            size = n * arr.itemsize
+            arr.frombytes(data[pos:pos + size])
+            pos += size
+        payload = data[pos:].decode("utf-8")
+        if payload:
+            log._payload.append(payload)
+        return log
+
+
+@dataclass
+class ReplayResult:
+    """
+    Outcome of re-applying an EditLog to a fresh buffer.
+    """
+    text: str
+    first_error: int
+    complete: bool
+    elapsed: float
+    ops: int
+    # per-op wall time of the treap call, only filled when measuring
+    op_seconds: List[float] = field(default_factory=list)
+
+
+class ReplayEngine:
+    """
+    Re-applies an EditLog to an implicit treap headlessly, as fast as the buffer allows.
+    Used to verify submitted scores and to reproduce latency problems from the field.
+    """
+
+    @staticmethod
+    def replay(log: EditLog, target: Optional[PassageTarget] = None, measure: bool = False) -> ReplayResult:
+        """
+        Args:
+            log (EditLog): The recorded run.
+            target (Optional[PassageTarget]): Target passage to check the final buffer against.
+            measure (bool): Record how long every treap operation took.
+
+        Returns:
+            ReplayResult: Final buffer state and, if requested, per-op timings.
+        """
+        buffer = implicit_treap.implicittreap32()
+        clipboard = ClipboardRegisters()
+        op_seconds: List[float] = []
+        perf = time.perf_counter
+        last_t = 0.0
+
+        for op, t, a, b, text, reg in log:
+            last_t = t
+            started = perf() if measure else 0.0
+
+            if op == OP_INSERT:
+                buffer.insert_text(a, text)
+            elif op == OP_ERASE:
+                if b - a == 1:
+                    buffer.erase(a)
+                else:
+                    buffer.delete_range(a, b)
+            elif op == OP_COPY:
+                clipboard.store(reg, buffer.copy(a, b))
+            elif op == OP_CUT:
+                clipboard.store(reg, buffer.cut(a, b))
+            elif op == OP_PASTE:
+                clip = clipboard.get(reg)
+                if clip is not None:
+                    buffer.paste(a, clip.tree)
+            else:
+                apply_transform(buffer, op, a, b, text[:reg], text[reg:])
+
+            if measure:
+                op_seconds.append(perf() - started)
+
+        first_error, complete = -1, False
+        if target is not None:
+            first_error, complete = buffer.check_equal_so_far(target.encoded32)
+
+        return ReplayResult(
+            text=buffer.to_string(),
+            first_error=first_error,
+            complete=complete,
+            elapsed=last_t,
+            ops=len(log),
+            op_seconds=op_seconds,
+        )
+
+    @staticmethod
+    def verify(log: EditLog, target: PassageTarget, claimed_wpm: int, tolerance: int = 1) -> bool:
+        """
+        Checks that a log really produces the target and that the claimed WPM
+        matches the time the log took.
+        """
+        result = ReplayEngine.replay(log, target)
+        if not result.complete:
+            return False
+        return abs(words_per_minute(target.length, result.elapsed) - claimed_wpm) <= tolerance
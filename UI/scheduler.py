@@ -0,0 +1,97 @@
+import time
+import tkinter as tk
+from typing import Callable, Dict, Optional, Tuple
+
+Callback = Callable[[], None]
+
+
+class FrameScheduler:
+    """
+    One `after` loop for the whole app.
+
+    Pages mark pieces of UI state dirty (highlighting, passage marker, ...) instead of
+    redrawing on every event; each key is flushed at most once per frame, with the last
+    callback registered for it. Tickers (timer label, HUD) run on the same frame clock.
+
+    The frame interval adapts: FRAME_MS while there is input, IDLE_FRAME_MS once nothing
+    has been marked dirty for IDLE_AFTER seconds, and no `after` job at all when no
+    tickers are registered and nothing is dirty.
+    """
+
+    FRAME_MS: int = 33
+    IDLE_FRAME_MS: int = 100
+    IDLE_AFTER: float = 1.0
+
+    def __init__(self, widget: tk.Misc, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.widget: tk.Misc = widget
+        self.clock: Callable[[], float] = clock
+        self._dirty: Dict[str, Callback] = {}
+        # key -> (callback, interval in ms or 0 for every frame, time of the last run)
+        self._tickers: Dict[str, Tuple[Callback, int, float]] = {}
+        self._job: Optional[str] = None
+        self._job_due: float = 0.0
+        self._last_frame: float = 0.0
+        self._last_input: float = 0.0
+
+    # -------------------------------------------------------------------------
+    # Registration
+    # -------------------------------------------------------------------------
+
+    def mark_dirty(self, key: str, callback: Callback) -> None:
+        """Runs callback on the next frame; marking the same key again before that replaces it."""
+        self._dirty[key] = callback
+        self._last_input = self.clock()
+        self._wake()
+
+    def add_ticker(self, key: str, callback: Callback, interval_ms: int = 0) -> None:
+        """Calls callback every frame (or at most every interval_ms) until removed."""
+        self._tickers[key] = (callback, interval_ms, 0.0)
+        self._wake()
+
+    def remove_ticker(self, key: str) -> None:
+        self._tickers.pop(key, None)
+
+    def has_ticker(self, key: str) -> bool:
+        return key in self._tickers
+
+    def flush(self) -> None:
+        """Runs every pending dirty callback now (e.g. before leaving a page)."""
+        dirty, self._dirty = self._dirty, {}
+        for callback in dirty.values():
+            callback()
+
+    # -------------------------------------------------------------------------
+    # Frame loop
+    # -------------------------------------------------------------------------
+
+    def _interval(self) -> float:
+        if self.clock() - self._last_input > self.IDLE_AFTER:
+            return self.IDLE_FRAME_MS / 1000.0
+        return self.FRAME_MS / 1000.0
+
+    def _wake(self) -> None:
+        """Makes sure a frame is scheduled no later than one interval after the previous one."""
+        if not self._dirty and not self._tickers:
+            return
+        now = self.clock()
+        due = max(now, self._last_frame + (self.FRAME_MS / 1000.0 if self._dirty else self._interval()))
+        if self._job is not None:
+            if self._job_due <= due:
+                return
+            self.widget.after_cancel(self._job)
+        self._job_due = due
+        self._job = self.widget.after(int((due - now) * 1000), self._frame)
+
+    def _frame(self) -> None:
+        self._job = None
+        now = self._last_frame = self.clock()
+        self.flush()
+
+        for key, (callback, interval_ms, last) in list(self._tickers.items()):
+            if interval_ms and (now - last) * 1000 < interval_ms:
+                continue
+            if key in self._tickers:
+                self._tickers[key] = (callback, interval_ms, now)
+            callback()
+
+        self._wake()
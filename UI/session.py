@@ -0,0 +1,345 @@
+from typing import NamedTuple, Optional, Tuple
+
+import implicit_treap
+from checker import AsyncChecker, CheckResult
+from clipboard import ClipboardRegisters
+from diff import DiffEngine
+from engine import GameEngine, GameResult
+from leaderboard import LeaderboardService
+from metrics import RunMetrics
+from perf import KeystrokeProbe
+from replay import (EditLog, OP_INSERT, OP_ERASE, OP_COPY, OP_CUT, OP_PASTE, OP_REPLACE, TRANSFORM_OPS,
+                    apply_transform)
+
+# (start, end) of a selection, or None when nothing is selected
+Selection = Optional[Tuple[int, int]]
+
+
+class Edit(NamedTuple):
+    """
+    Delta produced by a buffer edit: [start, end) was replaced by text.
+    GamePage mirrors it into the Text widget, headless callers can ignore it.
+    """
+    start: int
+    end: int
+    text: str
+
+    @property
+    def cursor(self) -> int:
+        """Cursor position after the edit."""
+        return self.start + len(self.text)
+
+
+class GameSession:
+    """
+    Headless driver for a single run.
+
+    Owns the text buffer (a code point implicit treap, so its offsets are the widget's
+    character offsets for any text), the clipboard registers and the edit log, and
+    applies editing hooks exactly the way GamePage does, without any widgets.
+    GamePage is a thin view over this class; bots, the simulator and replays
+    drive it directly.
+    """
+
+    def __init__(self, engine: GameEngine, leaderboard: Optional[LeaderboardService] = None) -> None:
+        self.engine: GameEngine = engine
+        self.leaderboard: Optional[LeaderboardService] = leaderboard
+        self.buffer = implicit_treap.implicittreap32()
+        # registers share nodes with the buffer, so they survive resets at no real cost
+        self.clipboard: ClipboardRegisters = ClipboardRegisters()
+        self.log: EditLog = EditLog(engine.clock)
+        self.first_error: int = -1
+        self.complete: bool = False
+        self.metrics: RunMetrics = RunMetrics(engine.clock)
+        # per-character alignment against the passage, for highlighting every mistake
+        self.diff: Optional[DiffEngine] = None
+        # per-stage latency marks (treap / editor bookkeeping / check), see perf.py
+        self.probe: KeystrokeProbe = KeystrokeProbe()
+        # when set, edits only submit a snapshot and first_error/complete are updated
+        # later through apply_check() (see checker.py)
+        self.checker: Optional[AsyncChecker] = None
+        self._checked_seq: int = 0
+        # when set, every log record is also written to disk (journal.EditJournal)
+        self.journal = None
+
+    def start(self, name: str, difficulty: str) -> None:
+        """Picks a passage through the engine and starts from an empty buffer."""
+        self.engine.start_game(name, difficulty)
+        self.reset()
+
+    def reset(self) -> None:
+        """Clears the buffer and log for the passage already selected in the engine."""
+        self.buffer = implicit_treap.implicittreap32()
+        self.log = EditLog(self.engine.clock)
+        self.log.journal = self.journal
+        self.first_error = -1
+        self.complete = False
+        self.metrics.reset()
+        target = self.engine.target
+        self.diff = DiffEngine(target.text, self.buffer) if target is not None else None
+        self._drop_pending_check()
+
+    def restore(self, buffer, log: EditLog) -> str:
+        """
+        Continues a saved run (see checkpoint.py) of the passage already restored in the
+        engine: takes over its buffer and log, realigns the diff and checks once.
+
+        Returns:
+            str: the buffer text, for the widget
+        """
+        self.reset()
+        self.buffer = buffer
+        if self.diff is not None:
+            self.diff.buffer = buffer
+        log.clock = self.engine.clock
+        log.journal = self.journal
+        self.log = log
+        text = buffer.to_string()
+        if self.diff is not None and text:
+            self.diff.apply(0, 0, text)
+        self.settle()
+        return text
+
+    # -------------------------------------------------------------------------
+    # Editing hooks
+    # -------------------------------------------------------------------------
+    # All hooks take the cursor/selection as flat character offsets and return
+    # the resulting Edit (or None if nothing changed). The engine timer starts
+    # on the first edit, like in the UI.
+    # -------------------------------------------------------------------------
+
+    def type_char(self, cursor: int, char: str, selection: Selection = None) -> Edit:
+        return self.type_text(cursor, char, selection)
+
+    def type_text(self, cursor: int, text: str, selection: Selection = None) -> Edit:
+        """
+        Types a run of characters at once (a coalesced burst of key events). The result
+        is the same as typing them one by one: the first replaces the selection, the
+        rest follow it.
+        """
+        self.engine.start_timer()
+        start = end = cursor
+        if selection is not None:
+            start, end = selection
+            self.buffer.delete_range(start, end)
+        if len(text) == 1:
+            self.buffer.insert(start, text)
+        else:
+            self.buffer.insert_text(start, text)
+        self.probe.mark("treap")
+
+        if end > start:
+            self.log.erase(start, end)
+        self.log.insert(start, text)
+        return self._edited(Edit(start, end, text))
+
+    def backspace(self, cursor: int, selection: Selection = None) -> Optional[Edit]:
+        if selection is not None:
+            start, end = selection
+        elif cursor > 0:
+            start, end = cursor - 1, cursor
+        else:
+            return None
+        return self._erase(start, end)
+
+    def delete(self, cursor: int, selection: Selection = None) -> Optional[Edit]:
+        if selection is not None:
+            start, end = selection
+        elif cursor < self.buffer.size():
+            start, end = cursor, cursor + 1
+        else:
+            return None
+        return self._erase(start, end)
+
+    def copy(self, selection: Selection, register: int = 0) -> None:
+        if selection is None:
+            return
+        start, end = selection
+        # shares the selected subtree with the buffer, nothing is deep-copied
+        self.clipboard.store(register, self.buffer.copy(start, end))
+        self.probe.mark("treap")
+        self.log.copy(start, end, reg=register)
+        self.probe.mark("editor")
+
+    def cut(self, selection: Selection, register: int = 0) -> Optional[Edit]:
+        if selection is None:
+            return None
+        self.engine.start_timer()
+        start, end = selection
+        self.clipboard.store(register, self.buffer.cut(start, end))
+        self.probe.mark("treap")
+        self.log.cut(start, end, reg=register)
+        return self._edited(Edit(start, end, ""))
+
+    def paste(self, cursor: int, selection: Selection = None, register: int = 0) -> Optional[Edit]:
+        """Pastes a register (0-9) or a history slot (clipboard.HISTORY_BASE + k)."""
+        clip = self.clipboard.get(register)
+        if clip is None or clip.size() == 0:
+            return None
+        self.engine.start_timer()
+
+        # If selection exists, Paste acts as "Replace Selection"
+        start = end = cursor
+        if selection is not None:
+            start, end = selection
+            self.buffer.delete_range(start, end)
+        self.buffer.paste(start, clip.tree)
+        self.probe.mark("treap")
+
+        if end > start:
+            self.log.erase(start, end)
+        self.log.paste(start, reg=register)
+        # the text is only materialized once per clip, repeated pastes reuse it
+        return self._edited(Edit(start, end, clip.text))
+
+    def transform(self, selection: Selection, kind: str) -> Optional[Edit]:
+        """Upper-cases, lower-cases or toggles ("upper" / "lower" / "toggle") the selection."""
+        op = TRANSFORM_OPS.get(kind)
+        if op is None:
+            raise ValueError(f"Invalid transform: {kind}")
+        return self._transform(selection, op)
+
+    def replace_chars(self, selection: Selection, src: str, dst: str) -> Optional[Edit]:
+        """Maps every src[i] in the selection to dst[i] (like str.translate)."""
+        if len(src) != len(dst) or len(src) > 255 or any(ord(c) > 255 for c in src):
+            raise ValueError(f"Invalid char map: {src!r} -> {dst!r}")
+        return self._transform(selection, OP_REPLACE, src, dst)
+
+    def _transform(self, selection: Selection, op: int, src: str = "", dst: str = "") -> Optional[Edit]:
+        if selection is None:
+            return None
+        start, end = selection
+        # the treap only tags the range, O(log N); the widget still needs its new text.
+        # The clock starts once the map was accepted, a rejected one is no edit
+        apply_transform(self.buffer, op, start, end, src, dst)
+        self.engine.start_timer()
+        self.probe.mark("treap")
+        self.log.transform(op, start, end, src, dst)
+        return self._edited(Edit(start, end, self.buffer.substr(start, end)))
+
+    def _erase(self, start: int, end: int) -> Edit:
+        self.engine.start_timer()
+        if end - start == 1:
+            self.buffer.erase(start)
+        else:
+            self.buffer.delete_range(start, end)
+        self.probe.mark("treap")
+        self.log.erase(start, end)
+        return self._edited(Edit(start, end, ""))
+
+    def _edited(self, edit: Edit) -> Edit:
+        self.metrics.record_edit(edit.start, len(edit.text))
+        self.probe.mark("editor")
+        if self.diff is not None:
+            self.diff.apply(edit.start, edit.end, edit.text)
+        if self.checker is None:
+            self.check()
+            self._record_check()
+        else:
+            self.checker.submit(self.buffer, self.engine.target.encoded32)
+            self.complete = False
+        self.probe.mark("check")
+        return edit
+
+    def apply_entry(self, op: int, a: int, b: int, text: str = "", reg: int = 0) -> Optional[Edit]:
+        """Re-applies one logged op through the hooks above (replaying a crash journal tail)."""
+        if op == OP_INSERT:
+            return self.type_text(a, text)
+        if op == OP_ERASE:
+            return self._erase(a, b)
+        if op == OP_COPY:
+            self.copy((a, b), reg)
+            return None
+        if op == OP_CUT:
+            return self.cut((a, b), reg)
+        if op == OP_PASTE:
+            return self.paste(a, register=reg)
+        if op == OP_REPLACE:
+            return self.replace_chars((a, b), text[:reg], text[reg:])
+        return self._transform((a, b), op)
+
+    # -------------------------------------------------------------------------
+    # Search
+    # -------------------------------------------------------------------------
+
+    def find(self, pattern: str, start: int = 0) -> Selection:
+        """
+        Next occurrence of pattern at or after start, wrapping around to the top.
+        Searched natively in the treap, the buffer is never turned into a string.
+
+        Returns:
+            Selection: (start, end) of the match, None if the pattern does not occur
+        """
+        if not pattern:
+            return None
+        pos = self.buffer.find(pattern, start)
+        if pos == -1 and start > 0:
+            pos = self.buffer.find(pattern, 0)
+        return (pos, pos + len(pattern)) if pos != -1 else None
+
+    def count(self, pattern: str) -> int:
+        """Number of occurrences of pattern in the buffer (overlapping ones included)."""
+        return len(self.buffer.find_all(pattern)) if pattern else 0
+
+    # -------------------------------------------------------------------------
+    # Correctness & results
+    # -------------------------------------------------------------------------
+
+    def check(self) -> Tuple[int, bool]:
+        """
+        Compares the buffer against the target.
+
+        Returns:
+            Tuple[int, bool]: (first error position or -1, buffer equals the target)
+        """
+        self.first_error, self.complete = self.buffer.check_equal_so_far(self.engine.target.encoded32)
+        return self.first_error, self.complete
+
+    def settle(self) -> Tuple[int, bool]:
+        """Checks synchronously, dropping any off-thread check still in flight."""
+        self._drop_pending_check()
+        self.check()
+        self._record_check()
+        return self.first_error, self.complete
+
+    def _drop_pending_check(self) -> None:
+        if self.checker is not None:
+            self.checker.invalidate()
+            self._checked_seq = self.checker.seq
+
+    @property
+    def checking(self) -> bool:
+        """True while an off-thread check of the latest edit has not been applied yet."""
+        return self.checker is not None and self._checked_seq != self.checker.seq
+
+    def apply_check(self, res: CheckResult) -> None:
+        """Takes over the result of an off-thread check (only ever the latest one, see AsyncChecker.poll)."""
+        self.first_error, self.complete = res.first_error, res.complete
+        self._checked_seq = res.seq
+        self._record_check()
+
+    def _record_check(self) -> None:
+        self.metrics.record_check(self.first_error, self.buffer.size(), self.engine.target.length)
+
+    def result(self) -> GameResult:
+        """
+        Ends the run in the engine and returns its result. WPM comes from the live
+        correct-prefix counter (RunMetrics), the same number the timer panel shows.
+        """
+        self.engine.finish(self.metrics.correct_chars)
+        return GameResult(self.engine.player_name,
+                          self.engine.difficulty,
+                          self.engine.wpm,
+                          self.engine.get_elapsed_time(),
+                          edit_log=self.log)
+
+    def submit(self, res: GameResult) -> None:
+        """Inserts the result into the leaderboard, if the session has one."""
+        if self.leaderboard is None:
+            return
+        self.leaderboard.insert_player(
+            username=res.player_name,
+            difficulty=res.difficulty,
+            score=res.wpm,
+            time_seconds=res.time_seconds
+        )
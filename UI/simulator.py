@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+from engine import GameEngine
+from journal import EditJournal
+from leaderboard import LeaderboardService
+from passages import PassageStore, PassageKey
+from session import GameSession
+
+# scripted action: (seconds since the previous action, action name, arguments)
+Action = Tuple[float, str, Tuple[int, ...]]
+
+PATTERNS: Tuple[str, ...] = ("typist", "sloppy", "clipboard")
+
+
+class SimClock:
+    """
+    Virtual clock for headless runs: time only moves when the script says so,
+    so a 60 second game takes as long as its edits take to apply.
+    """
+
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+# -------------------------------------------------------------------------
+# Edit stream generators
+# -------------------------------------------------------------------------
+
+def typist_script(text: str, rng: random.Random, cps: float = 8.0, error_rate: float = 0.03) -> List[Action]:
+    """
+    Types the passage character by character, occasionally hitting a wrong key
+    and fixing it with backspace.
+    """
+    dt = 1.0 / cps
+    script: List[Action] = []
+    for ch in text:
+        if rng.random() < error_rate:
+            script.append((dt, "type", (ord(rng.choice("asdfjkl;")),)))
+            script.append((dt, "backspace", ()))
+        script.append((dt, "type", (ord(ch),)))
+    return script
+
+
+def clipboard_script(text: str, rng: random.Random, cps: float = 8.0, min_repeat: int = 8) -> List[Action]:
+    """
+    Types the passage but copies and pastes any chunk of at least min_repeat
+    characters that already appears earlier in the text.
+    """
+    dt = 1.0 / cps
+    script: List[Action] = []
+    i = 0
+    while i < len(text):
+        # longest chunk starting at i that was already typed
+        length, source = 0, -1
+        while i + length < len(text):
+            found = text.find(text[i:i + length + 1], 0, i)
+            if found == -1:
+                break
+            length, source = length + 1, found
+        if length >= min_repeat:
+            script.append((dt * 3, "copy", (source, source + length)))
+            script.append((dt, "paste", ()))
+            i += length
+        else:
+            script.append((dt, "type", (ord(text[i]),)))
+            i += 1
+    return script
+
+
+def make_script(pattern: str, text: str, rng: random.Random) -> List[Action]:
+    if pattern == "typist":
+        return typist_script(text, rng)
+    if pattern == "sloppy":
+        return typist_script(text, rng, error_rate=0.15)
+    if pattern == "clipboard":
+        return clipboard_script(text, rng)
+    raise ValueError(f"Invalid pattern: {pattern}")
+
+
+def apply_action(session: GameSession, cursor: int, action: str, args: Tuple[int, ...]) -> int:
+    """Applies one scripted action at the cursor and returns where the cursor ends up."""
+    if action == "type":
+        edit = session.type_char(cursor, chr(args[0]))
+    elif action == "backspace":
+        edit = session.backspace(cursor)
+    elif action == "copy":
+        session.copy((args[0], args[1]))
+        edit = None
+    elif action == "paste":
+        edit = session.paste(cursor)
+    else:
+        raise ValueError(f"Invalid action: {action}")
+    return edit.cursor if edit is not None else cursor
+
+
+def play_script(session: GameSession, clock: SimClock, script: List[Action]) -> int:
+    """
+    Feeds a script into a session, the cursor always follows the last edit.
+
+    Returns:
+        int: Number of actions applied before the run completed.
+    """
+    cursor = 0
+    for n, (dt, action, args) in enumerate(script, start=1):
+        clock.advance(dt)
+        cursor = apply_action(session, cursor, action, args)
+        if session.complete:
+            return n
+    return len(script)
+
+
+# -------------------------------------------------------------------------
+# Batch runner
+# -------------------------------------------------------------------------
+
+def _play_games(job: Tuple[str, str, str, int, int, bool]) -> Dict[str, float]:
+    """Worker: plays `games` games of one difficulty/pattern and reports totals."""
+    corpus, difficulty, pattern, games, seed, journaled = job
+    rng = random.Random(seed)
+    clock = SimClock()
+    engine = GameEngine(PassageStore(corpus), clock=clock)
+    session = GameSession(engine, LeaderboardService())
+    scripts: Dict[PassageKey, List[Action]] = {}
+    # same crash journal as GamePage, its writer thread doing real (fsynced) I/O
+    scratch = tempfile.TemporaryDirectory() if journaled else None
+    if scratch is not None:
+        session.journal = EditJournal(os.path.join(scratch.name, "run.journal"),
+                                      os.path.join(scratch.name, "run.ckpt"))
+
+    actions = completed = 0
+    started = time.perf_counter()
+    for g in range(games):
+        session.start(f"BOT{seed % 1000}-{g % 100}", difficulty)
+        if session.journal is not None:
+            session.journal.begin(engine.state())
+        key = engine.passage_key
+        if key not in scripts:
+            scripts[key] = make_script(pattern, engine.target.text, rng)
+        actions += play_script(session, clock, scripts[key])
+        if session.complete:
+            completed += 1
+            session.submit(session.result())
+    if scratch is not None:
+        session.journal.close()
+        scratch.cleanup()
+    return {
+        "games": games,
+        "completed": completed,
+        "actions": actions,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def run_batch(corpus: str, difficulty: str, pattern: str, games: int,
+              processes: Optional[int] = None, journaled: bool = False) -> Dict[str, float]:
+    """
+    Plays `games` simulated games across a process pool.
+
+    Returns:
+        Dict[str, float]: totals plus games/s and actions/s measured on the wall clock.
+    """
+    processes = processes or os.cpu_count() or 1
+    per_worker = [games // processes + (1 if i < games % processes else 0) for i in range(processes)]
+    jobs = [(corpus, difficulty, pattern, n, seed, journaled) for seed, n in enumerate(per_worker) if n]
+
+    started = time.perf_counter()
+    with Pool(len(jobs)) as pool:
+        parts = pool.map(_play_games, jobs)
+    wall = time.perf_counter() - started
+
+    total = {k: sum(p[k] for p in parts) for k in ("games", "completed", "actions")}
+    total["wall_seconds"] = wall
+    total["games_per_second"] = total["games"] / wall
+    total["actions_per_second"] = total["actions"] / wall
+    return total
+
+
+def build_synthetic_corpus(root: str, lengths: List[int], difficulty: str = "Hard", seed: int = 0) -> None:
+    """
+    Writes one corpus per requested passage length (root/len-<n>/<difficulty>/)
+    assembled from words of the shipped corpus.
+    """
+    store = PassageStore.open_default()
+    words: List[str] = []
+    for diff in store.difficulties():
+        for i in range(store.count(diff)):
+            words.extend(store.get((diff, i)).split())
+
+    rng = random.Random(seed)
+    for n in lengths:
+        folder = os.path.join(root, f"len-{n}", difficulty)
+        os.makedirs(folder, exist_ok=True)
+        parts: List[str] = []
+        size = 0
+        while size < n:
+            w = rng.choice(words)
+            parts.append(w)
+            size += len(w) + 1
+        with open(os.path.join(folder, "001.txt"), "w", encoding="utf-8") as f:
+            f.write(" ".join(parts)[:n])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless Panic Paste load generator")
+    parser.add_argument("--games", type=int, default=2000, help="games per (length, pattern) cell")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--patterns", nargs="+", default=list(PATTERNS), choices=PATTERNS)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per cell")
+    parser.add_argument("--journal", action="store_true",
+                        help="journal every edit to disk like GamePage does, to measure its overhead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus:
+        build_synthetic_corpus(corpus, args.lengths)
+        if not args.json:
+            print(f"{'LENGTH':>8} {'PATTERN':>10} {'GAMES/S':>10} {'ACTIONS/S':>12} {'DONE':>6}")
+        for n in args.lengths:
+            for pattern in args.patterns:
+                total = run_batch(os.path.join(corpus, f"len-{n}"), "Hard", pattern, args.games, args.processes,
+                                  args.journal)
+                if args.json:
+                    print(json.dumps({"length": n, "pattern": pattern, **total}))
+                else:
+                    print(f"{n:>8} {pattern:>10} {total['games_per_second']:>10.0f} "
+                          f"{total['actions_per_second']:>12.0f} {total['completed']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# the UI modules import each other as top-level modules (python main.py runs from UI/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ManualClock:
+    """Virtual time for engines and logs, advanced by hand."""
+
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> ManualClock:
+    return ManualClock()
@@ -0,0 +1,87 @@
+import pytest
+
+# the buffers are native treaps: skip, do not fail, when the extensions are not built
+pytest.importorskip("implicit_treap")
+pytest.importorskip("leaderboard_treap")
+
+from clipboard import HISTORY_BASE, HISTORY_SIZE, REGISTER_COUNT, ClipboardRegisters
+from engine import GameEngine
+from passages import PassageStore
+from replay import EditLog, ReplayEngine
+from session import GameSession
+
+
+def _session(clock) -> GameSession:
+    engine = GameEngine(PassageStore.open_default(), clock=clock)
+    engine.start_game("ANN", "Easy")
+    session = GameSession(engine)
+    session.reset()
+    return session
+
+
+def test_registers_hold_their_own_clips(clock):
+    session = _session(clock)
+    session.type_text(0, "alpha beta gamma")
+    session.copy((0, 5))
+    session.copy((6, 10), register=2)
+    session.paste(16, register=2)
+    session.paste(20)
+    assert session.buffer.to_string() == "alpha beta gammabetaalpha"
+    assert session.clipboard.get(1) is None
+
+
+def test_history_ring_keeps_the_latest_clips(clock):
+    session = _session(clock)
+    session.type_text(0, "0123456789abcdefghij")
+    for i in range(HISTORY_SIZE + 3):
+        session.copy((i, i + 1), register=i % REGISTER_COUNT)
+    history = session.clipboard.history
+    assert len(history) == HISTORY_SIZE
+    # newest first, the oldest fell off
+    assert session.clipboard.get(HISTORY_BASE).text == "0123456789abcdefghij"[HISTORY_SIZE + 2]
+    assert session.clipboard.get(HISTORY_BASE + HISTORY_SIZE - 1).text == "3"
+    # a clip in a register and in the ring is the same object
+    assert session.clipboard.get(HISTORY_BASE) is session.clipboard.get((HISTORY_SIZE + 2) % REGISTER_COUNT)
+
+
+def test_paste_from_a_history_slot_replays(clock):
+    session = _session(clock)
+    session.type_text(0, "abc")
+    session.copy((0, 1))
+    session.copy((1, 2))
+    session.paste(3, register=HISTORY_BASE + 1)
+    assert session.buffer.to_string() == "abca"
+    log = EditLog.from_bytes(session.log.to_bytes())
+    assert ReplayEngine.replay(log).text == "abca"
+
+
+def test_clips_survive_edits_to_the_buffer(clock):
+    session = _session(clock)
+    session.type_text(0, "hello world")
+    session.copy((0, 5))
+    session.cut((5, 11), register=1)
+    session.type_text(5, " there")
+    assert session.clipboard.get(0).tree.to_string() == "hello"
+    assert session.clipboard.get(1).tree.to_string() == " world"
+    assert session.buffer.to_string() == "hello there"
+
+
+def test_invalid_registers_are_refused(clock):
+    clipboard = ClipboardRegisters()
+    with pytest.raises(ValueError):
+        clipboard.get(HISTORY_BASE + HISTORY_SIZE)
+    with pytest.raises(ValueError):
+        clipboard.get(-1)
+    with pytest.raises(ValueError):
+        clipboard.store(HISTORY_BASE, None)
+    assert clipboard.get(HISTORY_BASE) is None
+    assert clipboard.format() == "CLIPBOARD EMPTY"
+
+
+def test_memory_lists_filled_slots(clock):
+    session = _session(clock)
+    session.type_text(0, "x" * 500)
+    session.copy((0, 400), register=4)
+    rows = session.clipboard.memory()
+    assert [(name, chars) for name, chars, _, _ in rows] == [("R4", 400), ("H0", 400)]
+    assert "R4" in session.clipboard.format()
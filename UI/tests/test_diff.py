@@ -0,0 +1,141 @@
+import random
+
+import pytest
+
+# the buffers are native treaps: skip, do not fail, when the extensions are not built
+pytest.importorskip("implicit_treap")
+pytest.importorskip("leaderboard_treap")
+
+from diff import DiffEngine
+from engine import GameEngine
+from passages import PassageStore
+from session import GameSession
+
+
+def _errors(d: DiffEngine, n: int):
+    return [i for i in range(n) if d.is_error(i)]
+
+
+def test_exact_typing_has_no_errors():
+    d = DiffEngine("hello world")
+    for i, ch in enumerate("hello world"):
+        d.apply(i, i, ch)
+    assert (d.errors, d.missing) == (0, 0)
+    assert d.buffer.to_string() == "hello world"
+
+
+def test_typo_counts_once():
+    d = DiffEngine("abcdefgh")
+    d.apply(0, 0, "abXdefgh")
+    assert _errors(d, 8) == [2]
+    assert d.errors == 1
+
+
+def test_skipped_char_is_missing_not_a_cascade():
+    d = DiffEngine("abcdefgh")
+    d.apply(0, 0, "abdefgh")
+    assert d.errors == 0
+    assert d.missing == 1
+
+
+def test_typing_past_the_end_of_the_target():
+    # used to leave the last DP row empty (min() of an empty sequence)
+    d = DiffEngine("abc")
+    d.apply(0, 0, "abc")
+    d.apply(3, 3, "x" * 10)
+    assert d.errors == 10
+    assert _errors(d, 13) == list(range(3, 13))
+
+
+def test_backspace_past_the_end_restores_a_clean_run():
+    d = DiffEngine("abc")
+    d.apply(0, 0, "abc" + "x" * 20)
+    d.apply(3, 23, "")
+    assert (d.errors, d.missing, len(d)) == (0, 0, 3)
+
+
+def test_session_keeps_typing_after_the_passage(clock):
+    engine = GameEngine(PassageStore.open_default(), clock=clock)
+    engine.start_game("T", "Easy")
+    session = GameSession(engine)
+    session.reset()
+    text = engine.target.text
+    cursor = 0
+    for ch in text[:-1] + "#" * (len(text) // 2):
+        clock.advance(0.1)
+        session.type_char(cursor, ch)
+        cursor += 1
+    assert session.buffer.size() == cursor
+    # the first "#" stands in for the last passage char, the rest are extra
+    assert session.diff.errors == len(text) // 2
+
+
+def test_random_edits_stay_consistent_with_the_buffer():
+    rng = random.Random(7)
+    for _ in range(100):
+        target = "".join(rng.choice("ab c\n") for _ in range(rng.randint(1, 60)))
+        d = DiffEngine(target)
+        text = ""
+        for _ in range(40):
+            start = rng.randint(0, len(text))
+            end = rng.randint(start, min(len(text), start + 3))
+            ins = "".join(rng.choice("abcx") for _ in range(rng.randint(0, 12)))
+            text = text[:start] + ins + text[end:]
+            d.apply(start, end, ins)
+            assert len(d) == len(text) == d.buffer.size()
+            # a char flagged correct really matches the target char it is aligned to
+            for i, t in enumerate(d.tpos):
+                if not d.is_error(i):
+                    assert text[i] == target[t]
+
+
+def _recount(d: DiffEngine, text: str):
+    """errors and missing straight from tpos, as a full alignment would count them."""
+    errors = sum(t < 0 or text[i] != d.target[t] for i, t in enumerate(d.tpos))
+    aligned = sum(t >= 0 for t in d.tpos)
+    return errors, (d._after(len(d) - 1) if len(d) else 0) - aligned
+
+
+def test_large_paste_over_a_selection_takes_the_diagonal():
+    target = "the quick brown fox jumps over the lazy dog " * 200
+    d = DiffEngine(target)
+    d.apply(0, 0, target[:4000])
+    calls = []
+    d._diagonal = lambda *args: calls.append(args) or DiffEngine._diagonal(d, *args)
+    paste = target[100:3000]
+    d.apply(100, 2000, paste)
+    assert calls
+    text = target[:100] + paste + target[2000:4000]
+    assert len(d) == len(text)
+    assert (d.errors, d.missing) == _recount(d, text)
+
+
+def test_mashed_keys_realign_a_bounded_region():
+    d = DiffEngine("abcdefgh" * 50)
+    d.apply(0, 0, "abcdefgh")
+    regions = []
+    align = d._align
+    d._align = lambda s, ta, tb: regions.append(len(s)) or align(s, ta, tb)
+    text = "abcdefgh"
+    for _ in range(500):
+        d.apply(len(text), len(text), "#")
+        text += "#"
+    assert max(regions) <= 2 * (d.BAND + d.MAX_SCAN)
+    assert d.errors == 500
+    assert (d.errors, d.missing) == _recount(d, text)
+
+
+def test_random_edits_keep_the_counters_exact():
+    rng = random.Random(11)
+    for _ in range(60):
+        target = "".join(rng.choice("ab c") for _ in range(rng.randint(1, 200)))
+        d = DiffEngine(target)
+        d.MAX_SCAN, d.MAX_CELLS = 3, 200       # force the short cuts often
+        text = ""
+        for _ in range(60):
+            start = rng.randint(0, len(text))
+            end = rng.randint(start, min(len(text), start + rng.choice((3, 40))))
+            ins = "".join(rng.choice("abcx") for _ in range(rng.randint(0, rng.choice((4, 60)))))
+            text = text[:start] + ins + text[end:]
+            d.apply(start, end, ins)
+            assert (d.errors, d.missing) == _recount(d, text), (target, text)
@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+# the buffers are native treaps: skip, do not fail, when the extensions are not built
+pytest.importorskip("implicit_treap")
+pytest.importorskip("leaderboard_treap")
+
+from engine import GameEngine
+from ghost import Ghost, GhostRecorder, GhostStore, MAX_GHOSTS_PER_PASSAGE
+from passages import PassageStore
+from session import GameSession
+
+
+def _play(session: GameSession, clock, seconds_per_char: float, recorder: GhostRecorder = None):
+    engine = session.engine
+    for i, ch in enumerate(engine.target.text):
+        clock.advance(seconds_per_char)
+        session.type_char(i, ch)
+        if recorder is not None:
+            recorder.add(engine.get_elapsed_time(), session.metrics.correct_chars)
+    assert session.complete
+    return session.result()
+
+
+def test_retry_gives_a_fresh_result(clock):
+    engine = GameEngine(PassageStore.open_default(), clock=clock)
+    engine.start_game("ANN", "Easy")
+    session = GameSession(engine)
+    session.reset()
+    first = _play(session, clock, 0.1)
+
+    # what RETRY does: same passage, new engine run, then GamePage.on_show resets the session
+    key = engine.passage_key
+    engine.restart()
+    session.reset()
+    assert engine.passage_key == key and not engine.completed
+    second = _play(session, clock, 0.5)
+
+    assert second.time_seconds > first.time_seconds * 4
+    assert second.wpm < first.wpm
+
+
+def test_restart_needs_a_run():
+    with pytest.raises(ValueError):
+        GameEngine(PassageStore.open_default()).restart()
+
+
+def test_position_at_interpolates_and_clamps():
+    rec = GhostRecorder()
+    rec.add(1.0, 10)
+    ghost = rec.finish("ANN", 60, 3.0, 30)
+    assert ghost.position_at(0.5) == 0
+    assert ghost.position_at(1.0) == 10
+    assert ghost.position_at(2.0) == 20
+    assert ghost.position_at(99.0) == 30
+    assert ghost.duration == 3.0
+
+
+def test_recorder_memory_is_bounded_and_spread_over_the_run():
+    rec = GhostRecorder(max_samples=64)
+    rng = random.Random(3)
+    t = 0.0
+    for pos in range(1, 50_000):
+        t += rng.uniform(0.01, 0.1)
+        rec.add(t, pos)
+        assert len(rec._times) < 128
+    ghost = rec.finish("ANN", 60, t, 50_000)
+    assert len(ghost) <= 64
+    assert list(ghost.times) == sorted(ghost.times)
+    # samples cover the whole run, not only its end
+    assert ghost.times[1] < ghost.times[-1] / 10
+    assert abs(ghost.position_at(t / 2) - 25_000) < 1_000
+
+
+def _ghost(name: str, seconds: float) -> Ghost:
+    rec = GhostRecorder()
+    return rec.finish(name, int(600 / seconds), seconds, 100)
+
+
+def test_store_keeps_each_players_best_and_round_trips(tmp_path):
+    path = str(tmp_path / "ghosts.bin")
+    store = GhostStore(path)
+    key = ("Easy", 1)
+    assert store.submit(key, 42, _ghost("ANN", 20.0))
+    assert not store.submit(key, 42, _ghost("ANN", 25.0))
+    assert store.submit(key, 42, _ghost("ANN", 15.0))
+    assert store.submit(key, 42, _ghost("BOB", 10.0))
+
+    loaded = GhostStore(path)
+    assert loaded.ghost_for(key, 42, "ANN").duration == 15.0
+    # no run of their own: the passage's best
+    assert loaded.ghost_for(key, 42, "ZED").player_name == "BOB"
+    # the passage changed since: its ghosts are gone
+    assert loaded.ghost_for(key, 7, "ANN") is None
+    assert loaded.ghost_for(key, 42, "ANN") is None
+
+
+def test_store_is_bounded_per_passage():
+    store = GhostStore(None)
+    key = ("Hard", 0)
+    for i in range(MAX_GHOSTS_PER_PASSAGE + 4):
+        store.submit(key, 1, _ghost(f"P{i}", 10.0 + i))
+    assert len(store._passages[key][1]) == MAX_GHOSTS_PER_PASSAGE
+    # the slowest runs went
+    assert store.ghost_for(key, 1, f"P{MAX_GHOSTS_PER_PASSAGE + 3}").player_name == "P0"
+
+
+def test_unreadable_store_is_empty(tmp_path):
+    path = tmp_path / "ghosts.bin"
+    path.write_bytes(b"PPGH\x01\x00\xff\xff")
+    assert GhostStore(str(path)).memory() == 0
@@ -0,0 +1,163 @@
+import os
+import time
+
+import pytest
+
+# the buffers are native treaps: skip, do not fail, when the extensions are not built
+pytest.importorskip("implicit_treap")
+pytest.importorskip("leaderboard_treap")
+
+import journal
+from checkpoint import Checkpoint
+from engine import GameEngine
+from journal import EditJournal
+from passages import PassageStore
+from session import GameSession
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "run.journal"), str(tmp_path / "run.checkpoint")
+
+
+def _session(clock, edit_journal=None) -> GameSession:
+    engine = GameEngine(PassageStore.open_default(), clock=clock)
+    engine.start_game("ANN", "Easy")
+    session = GameSession(engine)
+    session.journal = edit_journal
+    session.reset()
+    return session
+
+
+def _edit(session: GameSession, clock, text: str) -> None:
+    """Some typing, a typo and its fix, a copy and a paste."""
+    cursor = len(session.buffer.to_string())
+    for ch in text:
+        clock.advance(0.05)
+        session.type_char(cursor, ch)
+        cursor += 1
+    session.type_char(cursor, "#")
+    session.backspace(cursor + 1)
+    session.copy((0, 3))
+    session.paste(cursor)
+
+
+def _state(session: GameSession):
+    return (session.buffer.to_string(), session.log.to_bytes(), session.metrics.keystrokes,
+            [c.tree.to_string() if c else None for c in session.clipboard.registers])
+
+
+def _recover(clock, paths):
+    rec = journal.read(*paths)
+    assert rec is not None
+    session = _session(clock)
+    text = rec.restore(session)
+    assert text == session.buffer.to_string()
+    return session
+
+
+def test_journal_alone_recovers_the_run(clock, paths):
+    ej = EditJournal(*paths, fsync=False)
+    try:
+        session = _session(clock, ej)
+        ej.begin(session.engine.state())
+        _edit(session, clock, "hello")
+        ej.sync()
+        assert journal.read(*paths).checkpoint is None
+        recovered = _recover(clock, paths)
+        assert recovered.buffer.to_string() == session.buffer.to_string()
+        assert recovered.log.to_bytes() == session.log.to_bytes()
+    finally:
+        ej.close()
+
+
+def test_checkpoint_plus_tail_recovers_the_run(clock, paths):
+    ej = EditJournal(*paths, fsync=False)
+    try:
+        session = _session(clock, ej)
+        ej.begin(session.engine.state())
+        _edit(session, clock, "hello")
+        ej.compact(Checkpoint.capture(session))
+        _edit(session, clock, " world")
+        ej.sync()
+        rec = journal.read(*paths)
+        assert rec.checkpoint is not None and rec.tail
+        recovered = _recover(clock, paths)
+        assert recovered.buffer.to_string() == session.buffer.to_string()
+        assert recovered.log.to_bytes() == session.log.to_bytes()
+    finally:
+        ej.close()
+
+
+def test_torn_tail_drops_only_the_last_record(clock, paths):
+    ej = EditJournal(*paths, fsync=False)
+    try:
+        session = _session(clock, ej)
+        ej.begin(session.engine.state())
+        _edit(session, clock, "hello")
+        ej.sync()
+    finally:
+        ej.close()
+    whole = len(journal.read(*paths).tail)
+    with open(paths[0], "r+b") as f:
+        f.truncate(os.path.getsize(paths[0]) - 3)
+    assert len(journal.read(*paths).tail) == whole - 1
+
+
+def test_discard_leaves_nothing(clock, paths):
+    ej = EditJournal(*paths, fsync=False)
+    try:
+        session = _session(clock, ej)
+        ej.begin(session.engine.state())
+        _edit(session, clock, "hello")
+        ej.compact(Checkpoint.capture(session))
+        ej.discard()
+        ej.sync()
+    finally:
+        ej.close()
+    assert journal.read(*paths) is None
+    assert not os.path.exists(paths[1])
+
+
+def test_synced_does_not_block(clock, paths):
+    ej = EditJournal(*paths, fsync=False)
+    session = _session(clock, ej)
+    ej.begin(session.engine.state())
+    _edit(session, clock, "hello")
+    ticket = ej.mark()
+    deadline = time.monotonic() + 10
+    while not ej.synced(ticket) and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert ej.synced(ticket)
+    assert journal.read(*paths) is not None
+    ej.close()
+    assert ej.synced(ej.mark() + 1)
+
+
+def test_checkpoint_round_trip(clock):
+    session = _session(clock)
+    _edit(session, clock, "hello")
+    cp = Checkpoint.from_bytes(Checkpoint.capture(session).to_bytes())
+    restored = _session(clock)
+    assert cp.restore(restored) == session.buffer.to_string()
+    assert _state(restored) == _state(session)
+
+
+def test_checkpoint_rejects_garbage():
+    with pytest.raises(ValueError):
+        Checkpoint.from_bytes(b"XXXX" + bytes(40))
+
+
+def test_checkpoint_rejects_bad_clip_indices(clock):
+    session = _session(clock)
+    session.type_text(0, "hello")
+    session.copy((0, 3))
+    cp = Checkpoint.capture(session)
+    assert cp.registers[0] == 0 and -1 in cp.registers
+    Checkpoint.from_bytes(cp.to_bytes())
+    for registers, history in [([-2] + cp.registers[1:], cp.history),
+                               ([1] + cp.registers[1:], cp.history),
+                               (cp.registers, [-1])]:
+        bad = Checkpoint(cp.engine, cp.buffer, cp.log, clips=cp.clips, registers=registers, history=history)
+        with pytest.raises(ValueError):
+            Checkpoint.from_bytes(bad.to_bytes())
@@ -0,0 +1,96 @@
+import random
+import time
+from collections import deque
+
+import pytest
+
+# the buffers are native treaps: skip, do not fail, when the extensions are not built
+pytest.importorskip("implicit_treap")
+
+from engine import PassageTarget
+from par import COPY_COST, PASTE_COST, TYPE_COST, ParSolver, SuffixAutomaton, run_cost, _solve
+from replay import EditLog
+
+
+def exact_par(text: str) -> int:
+    """Cheapest cost by brute force over (produced prefix, clipboard) states, for tiny texts."""
+    n = len(text)
+    best = {(0, ""): 0}
+    queue = deque([(0, "")])
+    while queue:
+        i, clip = queue.popleft()
+        cost = best[(i, clip)]
+        moves = [(i + 1, clip, TYPE_COST)] if i < n else []
+        if clip and text.startswith(clip, i):
+            moves.append((i + len(clip), clip, PASTE_COST))
+        for j in range(i):
+            for k in range(j + 1, i + 1):
+                s = text[j:k]
+                if text.startswith(s, i):
+                    moves.append((i + len(s), s, COPY_COST + PASTE_COST))
+        for state_i, state_clip, step in moves:
+            key = (state_i, state_clip)
+            if cost + step < best.get(key, 1 << 30):
+                best[key] = cost + step
+                queue.append(key)
+    return min(c for (i, _), c in best.items() if i == n)
+
+
+def test_no_repeats_is_typing_only():
+    par = _solve(PassageTarget.build("abcdefg"))
+    assert (par.cost, par.typed, par.copies, par.pastes) == (7, 7, 0, 0)
+
+
+def test_repeated_phrase_is_pasted():
+    text = "the quick fox " * 6
+    par = _solve(PassageTarget.build(text))
+    assert par.copies >= 1
+    assert par.cost < len(text)
+    assert par.cost == par.typed * TYPE_COST + par.copies * COPY_COST + par.pastes * PASTE_COST
+
+
+def test_par_is_an_upper_bound_of_the_exact_optimum():
+    rng = random.Random(3)
+    for _ in range(150):
+        text = "".join(rng.choice("ab") for _ in range(rng.randint(1, 11)))
+        assert _solve(PassageTarget.build(text)).cost >= exact_par(text), text
+
+
+def test_copyable_matches_brute_force():
+    rng = random.Random(5)
+    for _ in range(100):
+        text = "".join(rng.choice("abc") for _ in range(rng.randint(1, 30)))
+        longest, source_end = SuffixAutomaton(text).copyable()
+        for i in range(len(text) + 1):
+            expected = max((L for L in range(1, i + 1) if text[i - L:i] in text[:i - L]), default=0)
+            assert longest[i] == expected, (text, i)
+            if expected:
+                end = source_end[i]
+                assert text[end - expected:end] == text[i - expected:i]
+
+
+def test_run_cost_counts_keys():
+    log = EditLog(clock=lambda: 0.0)
+    log.insert(0, "abc")
+    log.erase(2, 3)
+    log.copy(0, 2)
+    log.paste(2)
+    assert run_cost(log) == 3 * TYPE_COST + 1 + COPY_COST + PASTE_COST
+
+
+def test_solver_caches_per_passage():
+    solver = ParSolver(cache_size=2)
+    try:
+        targets = {("Easy", i): PassageTarget.build(f"passage {i} " * 20) for i in range(3)}
+        for key, target in targets.items():
+            solver.submit(key, target)
+        deadline = time.monotonic() + 10
+        while solver.get(("Easy", 2)) is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert solver.get(("Easy", 2)) == _solve(targets[("Easy", 2)])
+        # least recently used passage went
+        assert solver.get(("Easy", 0)) is None
+        assert solver.get(("Easy", 1)) is not None
+        assert solver.get(("Hard", 0)) is None
+    finally:
+        solver.close()
@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+import passages
+from passages import DEFAULT_CORPUS_DIR, PassageStore
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Small loose-file corpus with the awkward cases: non-ASCII, CRLF and bare endings."""
+    root = tmp_path / "corpus"
+    texts = {
+        "Easy": ["the cat sat\n", "naïve café — 日本語\n", "two\nlines\r\n"],
+        "Hard": ["def f(x):\n    return x * 2\n", "no trailing newline"],
+    }
+    for difficulty, files in texts.items():
+        (root / difficulty).mkdir(parents=True)
+        for i, text in enumerate(files):
+            (root / difficulty / f"{i:03}.txt").write_bytes(text.encode("utf-8"))
+    (root / "Empty").mkdir()
+    (root / "Easy" / ".hidden").write_text("skipped")
+    return str(root)
+
+
+def test_packed_corpus_matches_loose_files(corpus, tmp_path):
+    pack = str(tmp_path / "corpus.pack")
+    PassageStore.pack(corpus, pack)
+    loose, packed = PassageStore(corpus), PassageStore(pack)
+    try:
+        assert packed.difficulties() == loose.difficulties() == ["Easy", "Hard"]
+        for difficulty in loose.difficulties():
+            assert packed.count(difficulty) == loose.count(difficulty)
+            for i in range(loose.count(difficulty)):
+                assert packed.get((difficulty, i)) == loose.get((difficulty, i))
+        assert packed.get(("Easy", 1)) == "naïve café — 日本語"
+        assert packed.get(("Easy", 2)) == "two\nlines"
+    finally:
+        packed.close()
+
+
+def test_default_corpus_packs_losslessly(tmp_path):
+    pack = str(tmp_path / "default.pack")
+    PassageStore.pack(DEFAULT_CORPUS_DIR, pack)
+    loose, packed = PassageStore(DEFAULT_CORPUS_DIR), PassageStore(pack)
+    try:
+        for difficulty in loose.difficulties():
+            assert [packed.get((difficulty, i)) for i in range(packed.count(difficulty))] == \
+                   [loose.get((difficulty, i)) for i in range(loose.count(difficulty))]
+    finally:
+        packed.close()
+
+
+def test_index_lookup(corpus, tmp_path):
+    pack = str(tmp_path / "corpus.pack")
+    PassageStore.pack(corpus, pack)
+    for store in (PassageStore(corpus), PassageStore(pack)):
+        assert store.count("Hard") == 2 and store.count("Nope") == 0
+        assert store.get(("Hard", 1)) == "no trailing newline"
+        with pytest.raises(KeyError):
+            store.get(("Hard", 2))
+        with pytest.raises(KeyError):
+            store.get(("Nope", 0))
+        with pytest.raises(ValueError):
+            store.sample("Nope")
+        difficulty, index = store.sample("Easy", random.Random(1))
+        assert difficulty == "Easy" and 0 <= index < 3
+        store.close()
+
+
+def test_cache_evicts_least_recently_used(corpus, monkeypatch):
+    store = PassageStore(corpus, cache_size=2)
+    loads = []
+    load = store._load
+    monkeypatch.setattr(store, "_load", lambda key: loads.append(key) or load(key))
+    store.get(("Easy", 0))
+    store.get(("Easy", 1))
+    store.get(("Easy", 0))                  # now the most recently used
+    store.get(("Hard", 0))                  # evicts ("Easy", 1)
+    assert list(store._cache) == [("Easy", 0), ("Hard", 0)]
+    store.get(("Easy", 0))
+    store.get(("Easy", 1))
+    assert loads == [("Easy", 0), ("Easy", 1), ("Hard", 0), ("Easy", 1)]
+
+
+def test_open_default_falls_back_to_loose_files(corpus, tmp_path, monkeypatch):
+    pack = str(tmp_path / "corpus.pack")
+    monkeypatch.setattr(passages, "DEFAULT_CORPUS_DIR", corpus)
+    monkeypatch.setattr(passages, "DEFAULT_CORPUS_PACK", pack)
+    store = PassageStore.open_default()
+    assert store._mm is None and store.get(("Easy", 0)) == "the cat sat"
+
+    PassageStore.pack(corpus, pack)
+    store = PassageStore.open_default()
+    try:
+        assert store._mm is not None and store.get(("Easy", 0)) == "the cat sat"
+    finally:
+        store.close()
+
+
+def test_rejects_a_file_that_is_not_a_pack(tmp_path):
+    path = tmp_path / "junk.pack"
+    path.write_bytes(b"XXXX" + bytes(16))
+    with pytest.raises(ValueError):
+        PassageStore(str(path))
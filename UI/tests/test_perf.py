@@ -0,0 +1,50 @@
+import io
+
+import perf
+from perf import KeystrokeProbe, LatencyHistogram
+
+
+def test_histogram_keeps_the_latest_samples():
+    hist = LatencyHistogram(capacity=4)
+    assert hist.percentiles(50, 99) == [0.0, 0.0]
+    for ms in (100, 100, 1, 2, 3, 4):
+        hist.add(ms * 1_000_000)
+    # the two 100 ms samples were overwritten
+    assert hist.count == 6
+    assert hist.percentiles(0, 50, 100) == [1.0, 3.0, 4.0]
+    hist.reset()
+    assert hist.percentiles(50) == [0.0]
+
+
+def test_probe_charges_each_stage_the_time_since_the_last_mark(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(perf.time, "perf_counter_ns", lambda: now[0])
+    probe = KeystrokeProbe()
+    for _ in range(3):
+        probe.begin()
+        for stage, ms in (("widget", 1), ("treap", 2), ("render", 5)):
+            now[0] += ms * 1_000_000
+            probe.mark(stage)
+        probe.end()
+    summary = probe.summary()
+    assert summary["treap"] == (2.0, 2.0, 3)
+    assert summary["total"] == (8.0, 8.0, 3)
+    assert summary["check"][2] == 0
+    # marks outside begin()/end() (a headless session) are dropped
+    probe.mark("treap")
+    probe.end()
+    assert probe.summary()["treap"][2] == 3 and probe.summary()["total"][2] == 3
+
+
+def test_deferred_stages_and_the_report():
+    probe = KeystrokeProbe()
+    probe.add("highlight", 4_000_000)
+    assert probe.summary()["highlight"] == (4.0, 4.0, 1)
+    lines = probe.format().splitlines()
+    assert lines[0].split() == ["STAGE", "P50", "P99"]
+    assert [line.split()[0] for line in lines[1:]] == ["highlight"]    # empty stages are left out
+    out = io.StringIO()
+    probe.dump("easy", out)
+    assert out.getvalue().startswith("--- keystroke latency easy (0 keys) ---")
+    probe.reset()
+    assert all(count == 0 for _, _, count in probe.summary().values())
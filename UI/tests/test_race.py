@@ -0,0 +1,99 @@
+import asyncio
+import random
+
+import pytest
+
+# the buffers are native treaps: skip, do not fail, when the extensions are not built
+pytest.importorskip("implicit_treap")
+
+from passages import PassageStore
+from race import (FIELD_LENGTH, Progress, RaceClient, RaceServer, decode_delta, encode_delta,
+                  _get_varint, _put_varint)
+
+
+def test_varint_round_trip():
+    out = bytearray()
+    values = [0, 1, -1, 63, -64, 64, -65, 1 << 20, -(1 << 31), (1 << 40) + 3]
+    for v in values:
+        _put_varint(out, v)
+    pos = 0
+    for v in values:
+        got, pos = _get_varint(out, pos)
+        assert got == v
+    assert pos == len(out)
+    # zigzag: small deltas either way are one byte
+    one = bytearray()
+    _put_varint(one, -1)
+    assert len(one) == 1
+
+
+def test_deltas_round_trip_in_sequence():
+    rng = random.Random(7)
+    out = bytearray()
+    sent = [Progress()]
+    for _ in range(500):
+        old = sent[-1]
+        new = Progress(max(0, old.length + rng.randint(-3, 5)),
+                       rng.choice([-1, old.first_error, rng.randint(0, 1000)]),
+                       old.ops + rng.randint(0, 2))
+        encode_delta(out, old, new)
+        sent.append(new)
+    pos = 0
+    seen = Progress()
+    for expected in sent[1:]:
+        seen, pos = decode_delta(out, pos, seen)
+        assert seen == expected
+    assert pos == len(out)
+
+
+def test_a_keystroke_is_a_few_bytes_whatever_the_buffer():
+    old = Progress(50_000, -1, 80_000)
+    out = bytearray()
+    encode_delta(out, old, Progress(50_001, -1, 80_001))
+    assert len(out) == 3
+    out = bytearray()
+    encode_delta(out, old, old)
+    assert out == bytearray([0])
+    out = bytearray()
+    encode_delta(out, old, old._replace(length=49_999))
+    assert out == bytearray([FIELD_LENGTH, 1])
+
+
+def test_two_racers_see_each_other():
+    async def race():
+        server = RaceServer(PassageStore.open_default(), room_size=2, lobby_seconds=5.0, tick=0.01)
+        port = await server.start(port=0)
+        a, b = RaceClient("ANN", "Easy", tick=0.01), RaceClient("BOB", "Easy", tick=0.01)
+        try:
+            await a.connect("127.0.0.1", port)
+            await b.connect("127.0.0.1", port)
+            await asyncio.wait_for(asyncio.gather(a.wait_started(), b.wait_started()), 5)
+            assert a.passage_key == b.passage_key and a.passage_hash == b.passage_hash
+
+            a.report(Progress(12, -1, 12))
+            b.report(Progress(7, 5, 9))
+            a_finish_seen = False
+            for _ in range(200):
+                await asyncio.sleep(0.01)
+                theirs = {r.name: r.progress for r in a.standings}
+                mine = {r.name: r.progress for r in b.standings}
+                if theirs.get("BOB") == Progress(7, 5, 9) and mine.get("ANN") == Progress(12, -1, 12):
+                    break
+            else:
+                raise AssertionError("progress never arrived")
+
+            a.finish(88, 12.5)
+            for _ in range(200):
+                await asyncio.sleep(0.01)
+                ann = next(r for r in b.standings if r.name == "ANN")
+                if ann.wpm != -1:
+                    a_finish_seen = True
+                    assert (ann.wpm, ann.seconds) == (88, 12.5)
+                    break
+            assert a_finish_seen
+        finally:
+            await a.close()
+            await b.close()
+            await server.close()
+
+    asyncio.run(race())
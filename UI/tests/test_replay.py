@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+# the buffers are native treaps: skip, do not fail, when the extensions are not built
+pytest.importorskip("implicit_treap")
+pytest.importorskip("leaderboard_treap")
+
+from engine import GameEngine
+from passages import PassageStore
+from replay import EditLog, ReplayEngine, OP_REPLACE, OP_UPPER
+from session import GameSession
+from simulator import make_script, play_script
+
+
+def _session(clock) -> GameSession:
+    engine = GameEngine(PassageStore.open_default(), clock=clock)
+    engine.start_game("ANN", "Easy")
+    session = GameSession(engine)
+    session.reset()
+    return session
+
+
+@pytest.mark.parametrize("pattern", ["typist", "sloppy", "clipboard"])
+def test_replay_reproduces_a_simulated_run(clock, pattern):
+    session = _session(clock)
+    target = session.engine.target
+    play_script(session, clock, make_script(pattern, target.text, random.Random(1)))
+    assert session.complete
+
+    log = EditLog.from_bytes(session.log.to_bytes())
+    result = ReplayEngine.replay(log, target)
+    assert result.complete and result.text == target.text
+    assert result.ops == len(session.log)
+    assert abs(result.elapsed - session.log.duration) < 1e-6
+    res = session.result()
+    assert ReplayEngine.verify(log, target, res.wpm)
+    assert not ReplayEngine.verify(log, target, res.wpm + 50)
+
+
+def test_transforms_and_registers_round_trip(clock):
+    session = _session(clock)
+    session.type_text(0, "hello world")
+    session.copy((0, 5), register=3)
+    session.paste(11, register=3)
+    session.transform((0, 5), "upper")
+    session.replace_chars((6, 16), "ol", "0L")
+    log = EditLog.from_bytes(session.log.to_bytes())
+    assert list(log) == list(session.log)
+    assert ReplayEngine.replay(log).text == session.buffer.to_string() == "HELLO w0rLdheLL0"
+
+
+def test_char_map_is_validated_before_it_is_recorded():
+    log = EditLog(clock=lambda: 0.0)
+    with pytest.raises(ValueError):
+        log.transform(OP_REPLACE, 0, 1, "a" * 256, "b" * 256)
+    with pytest.raises(ValueError):
+        log.transform(OP_REPLACE, 0, 1, "ab", "c")
+    with pytest.raises(ValueError):
+        log.transform(OP_UPPER, 0, 1, "a", "b")
+    assert len(log) == 0
+
+    log.transform(OP_REPLACE, 0, 1, "a" * 255, "b" * 255)
+    (entry,) = list(EditLog.from_bytes(log.to_bytes()))
+    assert entry[4] == "a" * 255 + "b" * 255 and entry[5] == 255
+
+
+def test_session_rejects_long_char_maps_untouched(clock):
+    session = _session(clock)
+    session.type_text(0, "abc")
+    with pytest.raises(ValueError):
+        session.replace_chars((0, 3), "a" * 300, "b" * 300)
+    assert session.buffer.to_string() == "abc" and len(session.log) == 1
+
+
+def test_rejects_garbage():
+    with pytest.raises(ValueError):
+        EditLog.from_bytes(b"XXXX" + bytes(10))
+
+
+def test_deltas_are_clamped_microseconds():
+    t = [0.0]
+    log = EditLog(clock=lambda: t[0])
+    log.insert(0, "a")
+    t[0] = 0.25
+    log.insert(1, "b")
+    t[0] = 0.1                      # clock went backwards
+    log.erase(1, 2)
+    t[0] = 1e6                      # more than a u32 of microseconds later
+    log.insert(1, "c")
+    assert list(log.deltas) == [0, 250_000, 0, EditLog._MAX_DELTA_US]
+    assert [e[1] for e in log][:2] == [0.0, 0.25]
+
+
+def test_rejected_char_map_does_not_start_the_clock(clock):
+    session = _session(clock)
+    with pytest.raises(ValueError):
+        session.replace_chars((0, 0), "ł", "x")
+    assert not session.engine.is_running and len(session.log) == 0
+    session.type_text(0, "ab")
+    with pytest.raises(ValueError):
+        session.replace_chars((0, 2), "a\n", "bc")   # newlines are refused by the treap
+    assert session.buffer.to_string() == "ab" and len(session.log) == 1
@@ -0,0 +1,105 @@
+import pytest
+
+pytest.importorskip("tkinter")
+
+from scheduler import FrameScheduler
+
+
+class FakeWidget:
+    """Tk's after()/after_cancel() on the test clock; run() fires the jobs that are due."""
+
+    def __init__(self, clock) -> None:
+        self.clock = clock
+        self.jobs = {}
+        self._next = 0
+
+    def after(self, ms, callback):
+        self._next += 1
+        job = f"after#{self._next}"
+        self.jobs[job] = (self.clock() + ms / 1000.0, callback)
+        return job
+
+    def after_cancel(self, job) -> None:
+        del self.jobs[job]
+
+    def run(self, seconds: float) -> None:
+        end = self.clock() + seconds
+        while self.jobs:
+            job, (due, callback) = min(self.jobs.items(), key=lambda item: item[1][0])
+            if due > end:
+                break
+            del self.jobs[job]
+            self.clock.advance(max(0.0, due - self.clock()))
+            callback()
+        self.clock.advance(end - self.clock())
+
+
+@pytest.fixture
+def tk(clock):
+    widget = FakeWidget(clock)
+    return widget, FrameScheduler(widget, clock=clock)
+
+
+def test_dirty_keys_flush_once_per_frame_with_the_last_callback(tk):
+    widget, scheduler = tk
+    calls = []
+    for i in range(5):
+        scheduler.mark_dirty("highlight", lambda i=i: calls.append(("highlight", i)))
+    scheduler.mark_dirty("marker", lambda: calls.append(("marker", 0)))
+    assert len(widget.jobs) == 1
+    widget.run(0.1)
+    assert calls == [("highlight", 4), ("marker", 0)]
+    # nothing dirty and no tickers: the loop stops instead of polling
+    assert widget.jobs == {}
+
+
+def test_tickers_respect_their_interval(tk, clock):
+    widget, scheduler = tk
+    fast, slow = [], []
+    scheduler.add_ticker("timer", lambda: fast.append(clock()))
+    scheduler.add_ticker("hud", lambda: slow.append(clock()), interval_ms=250)
+    widget.run(1.0)
+    assert len(slow) >= 3
+    assert min(b - a for a, b in zip(slow, slow[1:])) >= 0.25
+    assert len(fast) > len(slow)
+    scheduler.remove_ticker("timer")
+    scheduler.remove_ticker("hud")
+    assert not scheduler.has_ticker("timer")
+    widget.run(1.0)
+    assert widget.jobs == {}
+
+
+def test_frames_slow_down_when_idle(tk, clock):
+    widget, scheduler = tk
+    frames = []
+    scheduler.add_ticker("timer", lambda: frames.append(clock()))
+    scheduler.mark_dirty("highlight", lambda: None)
+    widget.run(3.0)
+    gaps = [b - a for a, b in zip(frames, frames[1:])]
+    busy = [g for t, g in zip(frames[1:], gaps) if t < FrameScheduler.IDLE_AFTER]
+    idle = [g for t, g in zip(frames[1:], gaps) if t > FrameScheduler.IDLE_AFTER + 0.2]
+    assert max(busy) == pytest.approx(FrameScheduler.FRAME_MS / 1000.0)
+    assert min(idle) == pytest.approx(FrameScheduler.IDLE_FRAME_MS / 1000.0)
+
+
+def test_input_pulls_an_idle_frame_forward(tk, clock):
+    widget, scheduler = tk
+    frames = []
+    scheduler.add_ticker("timer", lambda: frames.append(clock()))
+    widget.run(2.0)                                    # idle now, frames every IDLE_FRAME_MS
+    (idle_due, _), = widget.jobs.values()
+    assert idle_due == pytest.approx(frames[-1] + FrameScheduler.IDLE_FRAME_MS / 1000.0)
+    scheduler.mark_dirty("highlight", lambda: None)
+    (due, _), = widget.jobs.values()
+    assert due < idle_due
+    assert due == pytest.approx(max(clock(), frames[-1] + FrameScheduler.FRAME_MS / 1000.0))
+
+
+def test_flush_runs_pending_work_now(tk):
+    widget, scheduler = tk
+    calls = []
+    scheduler.mark_dirty("highlight", lambda: calls.append(1))
+    scheduler.flush()
+    assert calls == [1]
+    widget.run(0.1)
+    assert calls == [1]
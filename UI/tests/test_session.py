@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+# the buffers are native treaps: skip, do not fail, when the extensions are not built
+pytest.importorskip("implicit_treap")
+pytest.importorskip("leaderboard_treap")
+
+from engine import GameEngine
+from passages import PassageStore
+from session import GameSession
+from simulator import _play_games, build_synthetic_corpus
+
+
+def _session(clock) -> GameSession:
+    engine = GameEngine(PassageStore.open_default(), clock=clock)
+    engine.start_game("ANN", "Easy")
+    session = GameSession(engine)
+    session.reset()
+    return session
+
+
+def test_hooks_edit_the_buffer_like_the_widget(clock):
+    session = _session(clock)
+    assert session.backspace(0) is None
+    assert session.delete(0) is None
+    assert session.paste(0) is None            # empty clipboard
+
+    session.type_text(0, "hello world")
+    edit = session.type_char(5, "!", selection=(0, 5))
+    assert session.buffer.to_string() == "! world" and edit.cursor == 1
+    session.copy((2, 7))
+    edit = session.paste(1, selection=(0, 1))
+    assert session.buffer.to_string() == "world world" and edit.cursor == 5
+    session.cut((5, 11))
+    assert session.buffer.to_string() == "world"
+    session.delete(0)
+    session.backspace(4)
+    assert session.buffer.to_string() == "orl"
+    # the first edit started the clock
+    assert session.engine.is_running
+
+
+def test_find_wraps_and_count_overlaps(clock):
+    session = _session(clock)
+    session.type_text(0, "abababa")
+    assert session.find("aba", 3) == (4, 7)
+    assert session.find("bab", 6) == (1, 4)   # wraps to the top
+    assert session.find("zz") is None and session.find("") is None
+    assert session.count("aba") == 3
+
+
+def test_result_after_a_perfect_run(clock):
+    session = _session(clock)
+    text = session.engine.target.text
+    for i, ch in enumerate(text):
+        clock.advance(0.1)
+        session.type_char(i, ch)
+    assert session.complete and session.first_error == -1
+    res = session.result()
+    # timed from the first key to the last
+    assert abs(res.time_seconds - 0.1 * (len(text) - 1)) < 1e-6
+    assert abs(res.wpm - len(text) / 5 / (res.time_seconds / 60)) <= 1
+    assert res.edit_log is session.log
+
+
+def test_simulator_plays_synthetic_passages(tmp_path):
+    build_synthetic_corpus(str(tmp_path), [300])
+    corpus = os.path.join(str(tmp_path), "len-300")
+    for pattern in ("typist", "sloppy", "clipboard"):
+        totals = _play_games((corpus, "Hard", pattern, 3, 0, False))
+        assert totals["games"] == totals["completed"] == 3
+        assert totals["actions"] >= 3 * 50
+
+
+def test_find_wraps_around_to_the_top(clock):
+    session = _session(clock)
+    session.type_text(0, "one two one two")
+    assert session.find("two") == (4, 7)
+    assert session.find("two", 5) == (12, 15)
+    assert session.find("one", 5) == (8, 11)
+    assert session.find("one", 9) == (0, 3)          # past the last one, back to the top
+    assert session.find("three") is None and session.find("") is None
+    assert session.count("o") == 4 and session.count("") == 0
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# the buffers are native treaps: skip, do not fail, when the extensions are not built
+pytest.importorskip("implicit_treap")
+pytest.importorskip("leaderboard_treap")
+
+import perf
+from leaderboard import LeaderboardService
+from perf import StartupProfile
+
+UI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_leaderboard_seeds_on_first_use():
+    service = LeaderboardService()
+    # (not getTop10(), the native treap does not handle an empty read)
+    assert not service._seeded and service.leaderboard_hard.stats()["time"]["live_nodes"] == 0
+    top = service.get_top_10("Hard")
+    assert top and service._seeded
+    assert service.get_top_10("Hard") == top         # seeded once
+
+
+def test_insert_before_the_first_read_keeps_the_seed():
+    service = LeaderboardService()
+    service.insert_player("ZED", "Easy", 999, 1.0)
+    names = [name for name, _, _, _ in service.get_top_10("Easy")]
+    assert names[0] == "ZED" and len(names) > 1
+
+
+def test_startup_profile_charges_each_phase(monkeypatch):
+    now = [10.0]
+    monkeypatch.setattr(perf.time, "perf_counter", lambda: now[0])
+    profile = StartupProfile(started=9.5)
+    for phase, seconds in (("imports", 0.0), ("tk", 0.25), ("font", 0.05)):
+        now[0] += seconds
+        profile.mark(phase)
+    assert profile.phases == [("imports", 0.5), ("tk", 0.25), ("font", pytest.approx(0.05))]
+    assert profile.total == pytest.approx(0.8)
+    lines = profile.format().splitlines()
+    assert lines[1].split() == ["imports", "500.0"]
+    assert lines[-1].split() == ["first", "frame", "800.0"]
+
+
+def test_ui_import_leaves_the_heavy_modules_out():
+    pytest.importorskip("tkinter")
+    code = "import sys, ui; print(sorted({'pyglet', 'asyncio', 'race'} & set(sys.modules)))"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    out = subprocess.run([sys.executable, "-c", code], cwd=UI_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,149 @@
+import pickle
+import random
+
+import pytest
+
+implicit_treap = pytest.importorskip("implicit_treap")
+leaderboard_treap = pytest.importorskip("leaderboard_treap")
+
+
+def test_leaderboard_stats_are_per_instance():
+    a, b = leaderboard_treap.LeaderboardTreap(), leaderboard_treap.LeaderboardTreap()
+    for i in range(20):
+        a.registerTime(f"p{i}", 50 + i, 10.0 + i)
+    a.getTop10()
+    assert a.stats()["time"]["inserts"] == 20
+    assert b.stats()["time"] == leaderboard_treap.LeaderboardTreap().stats()["time"]
+    assert b.stats()["time"]["live_nodes"] == 0
+
+    a.reset_stats()
+    assert a.stats()["time"]["inserts"] == 0
+    assert a.stats()["time"]["live_nodes"] >= 20
+
+
+def test_shared_nodes_are_counted_once():
+    t = implicit_treap.implicittreap32()
+    t.insert_text(0, "x" * 1000)
+    clip = t.copy(0, 1000)
+    for _ in range(3):
+        t.paste(0, clip)
+    stats = t.stats()
+    assert stats["size"] == 4000
+    # the pasted copies share the clipboard's nodes, only the paths to them are new
+    assert 1000 <= stats["live_nodes"] < 2000
+    fresh = implicit_treap.implicittreap32()
+    fresh.insert_text(0, "x" * 4000)
+    assert stats["bytes"] < fresh.stats()["bytes"] // 2
+
+
+def test_byte_treap_only_maps_ascii():
+    t = implicit_treap.implicittreap()
+    t.insert_text(0, "héllo")
+    with pytest.raises(ValueError):
+        t.replace_chars(0, t.size(), "é", "ü")
+    t.replace_chars(0, t.size(), "lo", "LO")
+    assert t.to_string() == "héLLO"
+
+    t32 = implicit_treap.implicittreap32()
+    t32.insert_text(0, "héllo")
+    t32.replace_chars(0, t32.size(), "é", "ü")
+    assert t32.to_string() == "hüllo"
+
+
+def test_dumps_loads_round_trip():
+    rng = random.Random(11)
+    for cls in (implicit_treap.implicittreap32, implicit_treap.implicittreap):
+        t = cls()
+        t.insert_text(0, "héllo\nwörld " * 50)
+        t.paste(3, t.copy(0, 40))
+        t.upper(5, 90)
+        for _ in range(50):
+            i = rng.randrange(t.size())
+            t.delete_range(i, min(t.size(), i + rng.randint(1, 3)))
+        # random deletes may cut utf-8 sequences of the byte treap, compare the raw elements
+        loaded = cls.loads(t.dumps())
+        assert loaded.dumps() == t.dumps()
+        assert pickle.loads(pickle.dumps(t)).dumps() == t.dumps()
+        # a loaded treap is a fresh one, editing it leaves the original alone
+        loaded.insert_text(0, "x")
+        assert loaded.size() == t.size() + 1
+
+
+def test_loads_rejects_bad_dumps():
+    t = implicit_treap.implicittreap32()
+    t.insert_text(0, "hello")
+    dump = t.dumps()
+    for bad in (b"", b"junk", dump[:4], dump[:-1]):
+        with pytest.raises(ValueError):
+            implicit_treap.implicittreap32.loads(bad)
+    with pytest.raises(ValueError):
+        implicit_treap.implicittreap.loads(dump)
+
+
+def _edited_treap(cls, rng, alphabet):
+    """A treap built by inserts, pastes and deletes, so find walks a realistic shape."""
+    t, text = cls(), ""
+    for _ in range(60):
+        i = rng.randint(0, len(text))
+        if text and rng.random() < 0.3:
+            a = rng.randrange(len(text))
+            b = min(len(text), a + rng.randint(1, 20))
+            t.paste(i, t.copy(a, b))
+            text = text[:i] + text[a:b] + text[i:]
+        elif text and rng.random() < 0.2:
+            j = min(len(text), i + rng.randint(1, 5))
+            t.delete_range(i, j)
+            text = text[:i] + text[j:]
+        else:
+            s = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+            t.insert_text(i, s)
+            text = text[:i] + s + text[i:]
+    return t, text
+
+
+def test_find_matches_str_find():
+    rng = random.Random(41)
+    for cls, alphabet in ((implicit_treap.implicittreap, "ab \n"), (implicit_treap.implicittreap32, "aé日 ")):
+        for _ in range(30):
+            t, text = _edited_treap(cls, rng, alphabet)
+            for _ in range(20):
+                start = rng.randint(-1, len(text) + 1)
+                pattern = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+                expected = text.find(pattern, start) if 0 <= start < len(text) else -1
+                assert t.find(pattern, start) == expected, (text, pattern, start)
+                overlapping = [i for i in range(len(text)) if text.startswith(pattern, i)]
+                assert list(t.find_all(pattern)) == overlapping
+            assert t.find("") == -1 and list(t.find_all("")) == []
+
+
+def _linecol(text, offset):
+    offset = max(0, min(offset, len(text)))
+    head = text[:offset]
+    return head.count("\n") + 1, offset - (head.rfind("\n") + 1)
+
+
+def _offset(text, line, col):
+    """What Tk makes of "line.col": lines past the end clamp to the end, columns to the line end."""
+    if line < 1:
+        return 0
+    lines = text.split("\n")
+    if line > len(lines):
+        return len(text)
+    start = sum(len(s) + 1 for s in lines[:line - 1])
+    return start + max(0, min(col, len(lines[line - 1])))
+
+
+def test_linecol_conversions_match_the_text():
+    rng = random.Random(43)
+    for cls, alphabet in ((implicit_treap.implicittreap, "ab\n"), (implicit_treap.implicittreap32, "é\n日")):
+        for _ in range(30):
+            t, text = _edited_treap(cls, rng, alphabet)
+            # lazy case maps and shared clips must keep the newline counts right
+            t.upper(0, len(text) // 2)
+            text = t.to_string()
+            for offset in range(-1, len(text) + 2):
+                assert tuple(t.offset_to_linecol(offset)) == _linecol(text, offset)
+            n_lines = text.count("\n") + 1
+            for line in range(0, n_lines + 2):
+                for col in (-1, 0, 1, 3, 1000):
+                    assert t.linecol_to_offset(line, col) == _offset(text, line, col), (text, line, col)
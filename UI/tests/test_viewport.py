@@ -0,0 +1,58 @@
+import random
+
+from viewport import TextViewport, wrap_rows
+
+
+def _row_texts(text, rows):
+    ends = list(rows[1:]) + [len(text)]
+    return [text[a:b] for a, b in zip(rows, ends)]
+
+
+def test_wrap_rows_examples():
+    assert list(wrap_rows("", 10)) == [0]
+    assert _row_texts("the quick brown fox", list(wrap_rows("the quick brown fox", 10))) == ["the quick ", "brown fox"]
+    assert _row_texts("abcdefghij", list(wrap_rows("abcdefghij", 4))) == ["abcd", "efgh", "ij"]
+    assert _row_texts("ab\n\ncd", list(wrap_rows("ab\n\ncd", 10))) == ["ab\n", "\n", "cd"]
+    assert _row_texts("ab", list(wrap_rows("ab", 0))) == ["a", "b"]
+
+
+def test_wrap_rows_fit_the_columns():
+    rng = random.Random(28)
+    for _ in range(300):
+        text = "".join(rng.choice("aaaa  \n") for _ in range(rng.randint(1, 120)))
+        columns = rng.randint(1, 15)
+        rows = list(wrap_rows(text, columns))
+        assert rows[0] == 0 and rows == sorted(set(rows))
+        for row in _row_texts(text, rows):
+            assert row and "\n" not in row[:-1]
+            # only a trailing space (or the newline) may hang past the edge
+            body = row.rstrip("\n")
+            assert len(body) <= columns + 1 and (len(body) <= columns or body.endswith(" "))
+
+
+def test_row_of_and_bounds():
+    text = "one two three\nfour five six seven"
+    view = TextViewport(text, 8, visible_rows=2)
+    for offset in range(len(text)):
+        row = view.row_of(offset)
+        assert view.rows[row] <= offset
+        assert row + 1 == view.row_count or offset < view.rows[row + 1]
+    start, end = view.row_bounds(view.row_of(text.index("\n")))
+    assert text[start:end] == "three"          # the newline is not part of the row
+    assert [text[a:b] for a, b in view.visible()] == ["one two ", "three"]
+
+
+def test_scroll_clamps_and_follow_keeps_the_offset_on_screen():
+    rng = random.Random(5)
+    text = " ".join("word" * rng.randint(1, 3) for _ in range(200))
+    view = TextViewport(text, 20, visible_rows=6)
+    view.scroll(-5)
+    assert view.first_row == 0
+    view.scroll(10 ** 6)
+    assert view.first_row == view.row_count - 6
+    for _ in range(200):
+        offset = rng.randrange(len(text))
+        view.follow(offset)
+        row = view.row_of(offset)
+        assert view.first_row <= row < view.first_row + view.visible_rows
+        assert len(view.visible()) == 6
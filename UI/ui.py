@@ -1,18 +1,32 @@
 import tkinter as tk
 from tkinter import ttk
-from typing import List, Dict, Tuple, Optional, Any
+from tkinter import font as tkfont
+from typing import List, Dict, Tuple, Optional, Any, TYPE_CHECKING
 import re
-import pyglet 
-import implicit_treap
+import time
 
 from engine import GameEngine, GameResult
 from leaderboard import LeaderboardService, LeaderboardEntry
-from text_editor import TextEditor
+from viewport import TextViewport
+from session import GameSession, Edit
+from perf import KeystrokeProbe, StartupProfile
+from scheduler import FrameScheduler
+from checker import AsyncChecker
+from par import ParSolver, run_cost
+from clipboard import HISTORY_BASE
+import journal
+from checkpoint import Checkpoint
+from journal import EditJournal, Recovery
+from ghost import Ghost, GhostRecorder, GhostStore
+from passages import PassageKey
+
+if TYPE_CHECKING:
+    # race.py pulls in asyncio, it is only imported when a race server is given
+    from race import RaceLink
 
 FONT_FILE: str = "Public Pixel.ttf"
 PIXEL_FONT_NAME: str = "Public Pixel"
 
-pyglet.font.add_file(FONT_FILE)
 
 class Theme: # Theme class for storing colors and fonts (consider it a .css file, might be moved to a separate file in the future)
     # arcade style colors
@@ -35,6 +49,20 @@ class Theme: # Theme class for storing colors and fonts (consider it a .css file
     def font(size: int, weight: str = "normal") -> Tuple[str, int, str]:
         return (PIXEL_FONT_NAME, size, weight)
 
+    @staticmethod
+    def load_font(root: tk.Tk) -> None:
+        """
+        Registers the pixel font with the OS, before the first widget uses it.
+        pyglet is only imported when Tk does not know the font yet (e.g. it is
+        installed), and without its GL shadow window, only its font loader is used.
+        """
+        if PIXEL_FONT_NAME in tkfont.families(root):
+            return
+        import pyglet
+        pyglet.options["shadow_window"] = False
+        import pyglet.font
+        pyglet.font.add_file(FONT_FILE)
+
     @staticmethod # method to apply ttk styles to every root window.
     def apply_ttk_style(root: tk.Tk) -> None:
         style = ttk.Style(root)
@@ -89,18 +117,43 @@ class Theme: # Theme class for storing colors and fonts (consider it a .css file
 # App Root (Page manager)
 # -------------------------
 class PanicPasteApp(tk.Tk):    
-    def __init__(self) -> None:
+    def __init__(self, async_check: bool = False, race: Optional[Tuple[str, int]] = None,
+                 profile: Optional[StartupProfile] = None) -> None:
         super().__init__()
+        # compare buffer and passage on a worker thread instead of in the key handler
+        self.async_check: bool = async_check
+        # startup phases up to the first frame, only with --profile-startup
+        self.profile: Optional[StartupProfile] = profile
+        self._mark("tk")
 
         self.title("Panic Paste")
         self.geometry("1040x640")
         self.minsize(900, 560)
         self.configure(bg=Theme.BG)
 
+        Theme.load_font(self)
+        self._mark("font")
         Theme.apply_ttk_style(self)
+        self._mark("theme")
+
+        # single after() loop for timer ticks and deferred redraws, shared by all pages
+        self.scheduler = FrameScheduler(self)
 
         self.engine = GameEngine()
+        # seeds its dummy entries on first use (leaderboard page, first result)
         self.leaderboard_service = LeaderboardService()
+        # crash journal + snapshots of the run in progress, one writer thread for all pages
+        self.journal = EditJournal()
+        # connection to a race server (race.py), runs only join it when one is given
+        self.race: Optional["RaceLink"] = None
+        if race is not None:
+            from race import RaceLink
+            self.race = RaceLink(*race)
+        # best runs per passage, replayed as a ghost cursor on the passage panel
+        self.ghosts = GhostStore()
+        # par of the passage being run, solved off the Tk thread for the results page
+        self.par = ParSolver()
+        self._mark("services")
         
         # State: last run result for highlighting
         self.last_run_result = None
@@ -108,20 +161,66 @@ class PanicPasteApp(tk.Tk):
         self.container = tk.Frame(self, bg=Theme.BG)
         self.container.pack(fill="both", expand=True)
 
-        self.pages = {}
-        
-        for PageClass in (HomePage, SetupPage, GamePage, TimeTrialPage, ResultsPage, LeaderboardPage):
-            page = PageClass(parent=self.container, app=self)
-            self.pages[PageClass.__name__] = page
-            page.grid(row=0, column=0, sticky="NSEW")
+        # pages are built on their first show(), see page()
+        self.pages: Dict[str, NeonPage] = {}
 
         self.container.grid_rowconfigure(0, weight=1)
         self.container.grid_columnconfigure(0, weight=1)
 
         self.show("HomePage")
+        self._mark("home page")
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        if self.profile is not None:
+            self.after_idle(self._first_frame)
+
+    def _mark(self, phase: str) -> None:
+        if self.profile is not None:
+            self.profile.mark(phase)
+
+    def _first_frame(self) -> None:
+        # the idle queue holds the geometry and redraw work of the home page, flush it
+        self.update_idletasks()
+        self._mark("layout + draw")
+        self.profile.dump()
+        self._on_close()
+
+    def _on_close(self) -> None:
+        # a run still in progress is checkpointed, it can be resumed from the setup page
+        for page in self.pages.values():
+            if hasattr(page, "on_close"):
+                page.on_close()
+        self.journal.close()
+        self.par.close()
+        if self.race is not None:
+            self.race.leave()
+        self.destroy()
+
+    def page(self, page_name: str) -> "NeonPage":
+        """The page of that name, built now if it was never shown."""
+        page = self.pages.get(page_name)
+        if page is None:
+            classes = {cls.__name__: cls for cls in
+                       (HomePage, SetupPage, GamePage, TimeTrialPage, ResultsPage, LeaderboardPage)}
+            if page_name not in classes:
+                raise ValueError(f"Invalid page: {page_name}")
+            page = classes[page_name](parent=self.container, app=self)
+            page.grid(row=0, column=0, sticky="NSEW")
+            self.pages[page_name] = page
+        return page
+
+    def retry(self) -> None:
+        """
+        RETRY buttons: the last passage again, as a new engine run (a finished engine would
+        keep its stopped clock and old result). The page records a fresh ghost of it.
+        """
+        if self.engine.passage_key is None:
+            self.show("SetupPage")
+            return
+        self.engine.restart()
+        self.show("TimeTrialPage" if self.engine.difficulty == "Time-Trial" else "GamePage")
 
     def show(self, page_name: str) -> None:
-        page = self.pages[page_name]
+        page = self.page(page_name)
         page.tkraise()
         if hasattr(page, "on_show"):
             getattr(page, "on_show")()
@@ -396,9 +495,15 @@ class SetupPage(NeonPage):
         self.start_btn = ttk.Button(btns, text="START RUN", command=self._start)
         self.start_btn.grid(row=0, column=0, padx=10)
 
-        self.back_btn = ttk.Button(btns, text="BACK", command=lambda: self.app.show("HomePage"))
+        self.back_btn = ttk.Button(btns, text="BACK", command=self._back)
         self.back_btn.grid(row=0, column=1, padx=10)
 
+        # only shown while an unfinished run is saved (see journal.py)
+        self.resume_btn = ttk.Button(btns, text="RESUME RUN", command=self._resume)
+        self.resume_btn.grid(row=0, column=2, padx=10)
+        # journal.mark() of the last show, the saved run is looked at once it is on disk
+        self._sync_ticket: int = 0
+
         self.name_entry.bind("<Return>", lambda _e: self._start())
 
     def _cycle_diff(self, direction: int) -> None:
@@ -418,8 +523,37 @@ class SetupPage(NeonPage):
 
     def on_show(self) -> None:
         self.error.configure(text="")
+        # a run that was just left may still be on its way to disk: RESUME shows up once
+        # the writer is past it (no fsync wait on the Tk thread)
+        self.resume_btn.grid_remove()
+        self._sync_ticket = self.app.journal.mark()
+        self.app.scheduler.add_ticker("journal-sync", self._poll_saved_run, 20)
         self.name_entry.focus_set()
 
+    def _poll_saved_run(self) -> None:
+        if not self.app.journal.synced(self._sync_ticket):
+            return
+        self.app.scheduler.remove_ticker("journal-sync")
+        if journal.read() is not None:
+            self.resume_btn.grid()
+
+    def _resume(self) -> None:
+        rec = journal.read()
+        if rec is None:
+            self.error.configure(text="NO SAVED RUN TO RESUME.")
+            self.resume_btn.grid_remove()
+            return
+        try:
+            self.app.engine.restore(rec.engine)
+        except (ValueError, KeyError):
+            self.app.journal.discard()
+            self.error.configure(text="THE SAVED RUN'S PASSAGE IS GONE.")
+            self.resume_btn.grid_remove()
+            return
+        page_name = "TimeTrialPage" if rec.difficulty == "Time-Trial" else "GamePage"
+        self.app.page(page_name).pending_recovery = rec
+        self.app.show(page_name)
+
     def _start(self) -> None:
         name = self.name_var.get().strip()
         diff = self.diff_var.get().strip()
@@ -436,16 +570,174 @@ class SetupPage(NeonPage):
             self.name_entry.focus_set()
             return
 
+        # with a race server every run is a race (time trials stay solo)
+        if self.app.race is not None and diff != "Time-Trial":
+            self.app.race.join(name, diff)
+            self.error.configure(text="WAITING FOR RACERS…")
+            self.app.scheduler.add_ticker("race-lobby", self._poll_race, 100)
+            return
+
         self.app.engine.start_game(name, diff)
         if diff == "Time-Trial":
              self.app.show("TimeTrialPage")
         else:
              self.app.show("GamePage")
 
+    def _poll_race(self) -> None:
+        """Lobby ticker: starts the run once the server picked the passage for the room."""
+        race = self.app.race
+        if race.error:
+            self.app.scheduler.remove_ticker("race-lobby")
+            self.error.configure(text=race.error)
+            return
+        if not race.started:
+            return
+        self.app.scheduler.remove_ticker("race-lobby")
+        from race import passage_hash
+        client = race.client
+        engine = self.app.engine
+        try:
+            engine.start_game(client.name, client.difficulty, client.passage_key)
+            same = passage_hash(engine.target) == client.passage_hash
+        except (ValueError, KeyError, IndexError):
+            same = False
+        if not same:
+            # the server's corpus differs from ours, typing the race would be pointless
+            race.leave()
+            self.error.configure(text="THE RACE PASSAGE IS NOT IN YOUR CORPUS.")
+            return
+        self.app.show("GamePage")
+
+    def _back(self) -> None:
+        if self.app.scheduler.has_ticker("race-lobby"):
+            self.app.scheduler.remove_ticker("race-lobby")
+            self.app.race.leave()
+        self.app.show("HomePage")
+
 
 # ============================================================
 # 3) Game Page
 # ============================================================
+class PassageView(tk.Text):
+    """
+    Read-only, virtualized passage display.
+
+    Only the rows that fit on screen live in the widget. They are pulled from the
+    PassageTarget through a TextViewport whenever the view scrolls, resizes or the
+    progress marker moves to another row, so a long code passage costs the same to
+    draw as a one-liner.
+    """
+    def __init__(self, parent: tk.Widget) -> None:
+        super().__init__(
+            parent,
+            bg=Theme.PANEL,
+            fg=Theme.TEXT,
+            relief="flat",
+            wrap="none",
+            height=6,
+            cursor="arrow",
+            takefocus=0,
+            highlightthickness=0,
+            font=Theme.font(12, "normal"),
+        )
+        self.tag_configure("done", foreground=Theme.MUTED)
+        self.tag_configure("marker", background=Theme.NEON_PINK, foreground=Theme.BG)
+        self.tag_configure("ghost", background=Theme.NEON_PURPLE, foreground=Theme.BG)
+        # the player's own marker wins where both sit on the same char
+        self.tag_lower("ghost", "marker")
+
+        self._font = tkfont.Font(font=Theme.font(12, "normal"))
+        self._target = None
+        self._viewport: Optional[TextViewport] = None
+        self._progress: int = 0
+        self._ghost: int = -1
+
+        self.configure(state="disabled")
+        self.bind("<Configure>", lambda _e: self._relayout())
+        self.bind("<MouseWheel>", lambda e: self._scroll(-1 if e.delta > 0 else 1))
+        self.bind("<Button-4>", lambda _e: self._scroll(-1))
+        self.bind("<Button-5>", lambda _e: self._scroll(1))
+
+    def set_target(self, target) -> None:
+        self._target = target
+        self._progress = 0
+        self._ghost = -1
+        self._viewport = None
+        self._relayout()
+
+    def set_progress(self, offset: int) -> None:
+        """Moves the progress marker (first error / end of correct input) to offset."""
+        if offset == self._progress or self._viewport is None:
+            return
+        self._progress = offset
+        self._viewport.follow(offset)
+        self._render()
+
+    def set_ghost(self, offset: int) -> None:
+        """Moves the ghost cursor to offset (-1 hides it); only the tag moves, the rows stay."""
+        if offset == self._ghost or self._viewport is None:
+            return
+        self._ghost = offset
+        self._tag_ghost(self._viewport.visible())
+
+    def _grid_size(self) -> Tuple[int, int]:
+        char_w = max(1, self._font.measure("0"))
+        line_h = max(1, self._font.metrics("linespace"))
+        cols = max(10, (self.winfo_width() - 8) // char_w)
+        rows = max(1, self.winfo_height() // line_h)
+        return cols, rows
+
+    def _relayout(self) -> None:
+        if self._target is None:
+            return
+        cols, rows = self._grid_size()
+        vp = self._viewport
+        if vp is None or vp.columns != cols:
+            # wrapping is the only pass over the whole passage, done once per width
+            self._viewport = TextViewport(self._target.text, cols, rows)
+        else:
+            vp.visible_rows = rows
+        self._viewport.follow(self._progress)
+        self._render()
+
+    def _scroll(self, delta_rows: int) -> str:
+        if self._viewport is not None:
+            self._viewport.scroll(delta_rows)
+            self._render()
+        return "break"
+
+    def _render(self) -> None:
+        vp = self._viewport
+        rows = vp.visible()
+        text = vp.text
+
+        self.configure(state="normal")
+        self.delete("1.0", "end")
+        self.insert("1.0", "\n".join(text[a:b] for a, b in rows))
+
+        progress = self._progress
+        for line, (a, b) in enumerate(rows, start=1):
+            if progress > a:
+                self.tag_add("done", f"{line}.0", f"{line}.{min(progress, b) - a}")
+
+        marker_row = vp.row_of(progress)
+        if vp.first_row <= marker_row < vp.first_row + len(rows):
+            line = marker_row - vp.first_row + 1
+            self.tag_add("marker", f"{line}.{progress - vp.rows[marker_row]}")
+        self._tag_ghost(rows)
+        self.configure(state="disabled")
+
+    def _tag_ghost(self, rows: List[Tuple[int, int]]) -> None:
+        self.tag_remove("ghost", "1.0", "end")
+        vp = self._viewport
+        ghost = min(self._ghost, len(vp.text) - 1)
+        if ghost < 0:
+            return
+        row = vp.row_of(ghost)
+        if vp.first_row <= row < vp.first_row + len(rows):
+            self.tag_add("ghost", f"{row - vp.first_row + 1}.{ghost - vp.rows[row]}")
+
+
 class GamePage(NeonPage):
     """
     Core Gameplay Page.
@@ -455,8 +747,15 @@ class GamePage(NeonPage):
     def __init__(self, parent: tk.Widget, app: PanicPasteApp) -> None:
         super().__init__(parent, app)
         self.header_hint.configure(text="RUNNING…")
-        self._timer_job: Optional[str] = None
         self._completion_processed: bool = False
+        # buffer, clipboard and edit log live in the headless session, this page is only its view
+        self.session: GameSession = GameSession(app.engine, app.leaderboard_service)
+        # the session marks its own stages (treap / editor / check), this page marks the Tk ones
+        self.probe: KeystrokeProbe = self.session.probe
+        if app.async_check:
+            self.session.checker = AsyncChecker()
+        # every edit is also journaled to disk off the Tk thread (journal.py)
+        self.session.journal = app.journal
 
         top = tk.Frame(self.body, bg=Theme.PANEL2)
         top.pack(fill="both", expand=True, padx=18, pady=(18, 10))
@@ -472,24 +771,16 @@ class GamePage(NeonPage):
         )
         passage_frame.pack(side="left", fill="both", expand=True, padx=(0, 12))
 
-        passage_title = tk.Label(
+        self.passage_title = tk.Label(
             passage_frame,
             text="PASSAGE",
             bg=Theme.PANEL,
             fg=Theme.NEON_GREEN,
             font=Theme.font(12, "bold"),
         )
-        passage_title.pack(anchor="w", padx=12, pady=(10, 6))
+        self.passage_title.pack(anchor="w", padx=12, pady=(10, 6))
 
-        self.passage_text = tk.Label(
-            passage_frame,
-            text="",
-            bg=Theme.PANEL,
-            fg=Theme.TEXT,
-            justify="left",
-            wraplength=1280,
-            font=Theme.font(12, "normal"),
-        )
+        self.passage_text = PassageView(passage_frame)
         self.passage_text.pack(fill="both", expand=True, padx=12, pady=(0, 12))
 
         timer_frame = tk.Frame(
@@ -527,6 +818,39 @@ class GamePage(NeonPage):
         )
         self.status_label.pack(padx=14, pady=(0, 12))
 
+        # live stats from session.metrics, refreshed with the timer
+        self.wpm_label = tk.Label(
+            timer_frame,
+            text="WPM 0",
+            bg=Theme.PANEL,
+            fg=Theme.NEON_CYAN,
+            font=Theme.font(11, "bold"),
+        )
+        self.wpm_label.pack(padx=14, pady=(0, 6))
+
+        self.accuracy_label = tk.Label(
+            timer_frame,
+            text="ACC 100%  ERR 0",
+            bg=Theme.PANEL,
+            fg=Theme.NEON_GREEN,
+            font=Theme.font(11, "bold"),
+        )
+        self.accuracy_label.pack(padx=14, pady=(0, 12))
+
+        # one bar per racer (correct prefix / passage), only packed while racing
+        self.race_canvas = tk.Canvas(
+            timer_frame,
+            width=170,
+            height=0,
+            bg=Theme.PANEL,
+            highlightthickness=0,
+        )
+        self._racing: bool = False
+        # the best run of this passage replays as a ghost cursor, this run is recorded as one
+        self.ghost_recorder: GhostRecorder = GhostRecorder()
+        self._ghost: Optional[Ghost] = None
+        self._recording: bool = False
+
         editor_frame = tk.Frame(
             bottom,
             bg=Theme.PANEL,
@@ -554,6 +878,40 @@ class GamePage(NeonPage):
             font=Theme.font(9, "bold"),
         ).pack(side="right", padx=12)
 
+        # Ctrl+F: find bar, selects the next match in the input so it can be copied right away
+        self.find_bar = tk.Frame(editor_header, bg=Theme.PANEL)
+        tk.Label(
+            self.find_bar,
+            text="FIND",
+            bg=Theme.PANEL,
+            fg=Theme.NEON_YELLOW,
+            font=Theme.font(9, "bold"),
+        ).pack(side="left", padx=(0, 6))
+        self.find_entry = ttk.Entry(self.find_bar, width=18)
+        self.find_entry.pack(side="left")
+        # char map: Enter here maps every char of FIND to the char at the same place in MAP TO
+        tk.Label(
+            self.find_bar,
+            text="MAP TO",
+            bg=Theme.PANEL,
+            fg=Theme.NEON_YELLOW,
+            font=Theme.font(9, "bold"),
+        ).pack(side="left", padx=(10, 6))
+        self.map_entry = ttk.Entry(self.find_bar, width=12)
+        self.map_entry.pack(side="left")
+        self.find_status = tk.Label(
+            self.find_bar,
+            text="",
+            bg=Theme.PANEL,
+            fg=Theme.MUTED,
+            font=Theme.font(9, "bold"),
+        )
+        self.find_status.pack(side="left", padx=(6, 0))
+        self.find_entry.bind("<Return>", self._find_next)
+        self.find_entry.bind("<Escape>", self._close_find)
+        self.map_entry.bind("<Return>", self._apply_char_map)
+        self.map_entry.bind("<Escape>", self._close_find)
+
         self.text = tk.Text(
             editor_frame,
             bg=Theme.PANEL2,
@@ -569,6 +927,18 @@ class GamePage(NeonPage):
         self.text.tag_configure("correct", foreground=Theme.TEXT)
         self.text.tag_configure("error", foreground=Theme.DANGER)
         self.text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        # only the wrapped rows on screen are tagged, so retag whenever the view moves
+        self.text.configure(yscrollcommand=lambda *_args: self._schedule_highlighting())
+        self._first_error: int = -1
+        # key bursts (auto-repeat, queued events) are typed as one edit when Tk goes idle
+        self._pending_chars: List[str] = []
+        self._pending_at: Tuple[int, Optional[Tuple[int, int]]] = (0, None)
+        self._flush_job: Optional[str] = None
+        # set by SetupPage to continue a saved run instead of starting a fresh one
+        self.pending_recovery: Optional[Recovery] = None
+        # log length at the last snapshot, the autosave ticker skips unchanged runs
+        self._saved_ops: int = 0
+        self._live: bool = False
 
         controls = tk.Frame(self.body, bg=Theme.PANEL2)
         controls.pack(fill="x", padx=18, pady=(0, 16))
@@ -584,15 +954,65 @@ class GamePage(NeonPage):
         self.text.bind("<Control-v>", self._hook_paste)
         self.text.bind("<BackSpace>", self._handle_backspace)
         self.text.bind("<Delete>", self._handle_delete)
+        self.text.bind("<Control-f>", self._open_find)
+        # clipboard registers: Alt+N copies into register N, Ctrl+N pastes it (Ctrl+C/V use register 0),
+        # Ctrl+Shift+V walks back through the clipboard history
+        for n in range(1, 10):
+            self.text.bind(f"<Alt-Key-{n}>", lambda e, r=n: self._hook_copy(e, r))
+            self.text.bind(f"<Control-Key-{n}>", lambda e, r=n: self._hook_paste(e, r))
+        self.text.bind("<Control-V>", self._hook_paste_history)
+        # case transforms of the selection (lazy range tags in the treap, O(log N))
+        self.text.bind("<Control-u>", lambda e: self._hook_transform(e, "upper"))
+        self.text.bind("<Control-l>", lambda e: self._hook_transform(e, "lower"))
+        self.text.bind("<Control-t>", lambda e: self._hook_transform(e, "toggle"))
+        # (start, end, history slot) of the last Ctrl+Shift+V paste, while nothing else happened since
+        self._history_paste: Optional[Tuple[int, int, int]] = None
+        # clicks move the cursor, so whatever is still queued has to land first
+        self.text.bind("<Button-1>", lambda _e: self._flush_input(), add="+")
+
+        # F3: latency HUD (p50/p99 per keystroke stage), drawn over the top right corner
+        self.hud_label = tk.Label(
+            self,
+            text="",
+            bg=Theme.PANEL,
+            fg=Theme.NEON_GREEN,
+            font=("Courier", 9, "bold"),  # monospace so the p50/p99 columns line up
+            justify="left",
+        )
+        self.text.bind("<F3>", self._toggle_hud)
+
+    # -------------------------------------------------------------------------
+    # Index conversion
+    # -------------------------------------------------------------------------
+    # The widget always holds the same text as the session buffer, so Tk "line.col"
+    # indices are converted through the treap's per-node newline counts in O(log N).
+    # Tk's own count("1.0", ...) and "1.0+Nc" indices walk the text from the top.
+    #
+    # Unlike PassageView the input is not windowed: it is the editing surface, and
+    # cursor keys, mouse selection, wrapping and scrolling are Tk's own. A window of
+    # the buffer would have to re-implement all of them at its edges, and a prose
+    # passage is one logical line, so a window of lines would still hold all of it.
+    # What scales with the buffer is kept out of the key path instead: edits are
+    # deltas (_apply_edit), tags are redone for the visible lines only
+    # (_apply_highlighting), and Tk itself only lays out the display lines on screen.
+    # -------------------------------------------------------------------------
+
+    def _index(self, offset: int) -> str:
+        """Tk index of a flat character offset."""
+        line, col = self.session.buffer.offset_to_linecol(offset)
+        return f"{line}.{col}"
+
+    def _offset(self, index: Any) -> int:
+        """Flat character offset of a Tk index (a mark, tag range or "line.col" string)."""
+        line, col = str(self.text.index(index)).split(".")
+        return self.session.buffer.linecol_to_offset(int(line), int(col))
 
     def _get_cursor_index(self) -> int:
         """
         Robustly get the cursor index as a flat integer character offset.
         """
         try:
-            # count returns a tuple often, or None if ranges invalid
-            count = self.text.count("1.0", "insert", "chars") 
-            return count[0] if count else 0
+            return self._offset("insert")
         except tk.TclError:
             return 0
 
@@ -607,210 +1027,336 @@ class GamePage(NeonPage):
             if not ranges:
                 return -1, -1
             
-            start_idx = ranges[0]
-            end_idx = ranges[1]
-            
-            # Use 'count' to get precise char offset
-            count_start = self.text.count("1.0", start_idx, "chars")
-            count_end = self.text.count("1.0", end_idx, "chars")
-            
-            s = count_start[0] if count_start else 0
-            e = count_end[0] if count_end else 0
-            
-            return s, e
+            return self._offset(ranges[0]), self._offset(ranges[1])
         except tk.TclError:
             return -1, -1
 
-    def _update_text_and_cursor(self, new_text: str, new_cursor: int) -> None:
-        self.text.delete("1.0", "end")
-        self.text.insert("1.0", new_text)
-        
+    def _selection(self) -> Optional[Tuple[int, int]]:
+        start, end = self._get_selection_indices()
+        return (start, end) if start != -1 else None
+
+    def _read_cursor(self) -> Tuple[int, Optional[Tuple[int, int]]]:
+        """Starts timing a keystroke and reads (cursor, selection) from the widget."""
+        self.probe.begin()
+        cursor, selection = self._get_cursor_index(), self._selection()
+        self.probe.mark("widget")
+        return cursor, selection
+
+    def _apply_edit(self, edit: Optional[Edit]) -> None:
+        """
+        Mirrors a session edit into the Text widget as a delta: delete [start, end), then
+        insert at start. The widget is never rewritten as a whole, so Tk only re-lays out
+        the lines that actually changed.
+        """
+        self._history_paste = None
+        if edit is None:
+            self.probe.end()
+            return
+        start, end, inserted = edit
+        # the buffer already holds the edit; the text before start did not change, so its
+        # index is the same before and after, and the deleted range is counted from there
+        at = self._index(start)
+        if end > start:
+            self.text.delete(at, f"{at}+{end - start}c")
+        if inserted:
+            self.text.insert(at, inserted)
+
         # Restore cursor
-        self.text.mark_set("insert", f"1.0+{new_cursor}c")
+        self.text.mark_set("insert", self._index(edit.cursor))
         self.text.see("insert")
-        
+        self.probe.mark("render")
+
         # Trigger correctness check
-        self._check_correctness(new_text)
+        self._check_correctness()
+        self._start_timer_if_needed()
+        self.probe.end()
 
 
     #OK so imma break tradion and personal beliefs and actually explain this function
-    #I basically put the target and the current text ito variables and call the impilcit treap function we made to compare the string to thetreap content
-    #after returning where the error is i set it up to turn every letter red if it is after the error
+    #the session already compared the treap against the target (GameSession.check) when it applied the edit
+    #after returning where the error is everything from there on is marked red (only on the visible lines, see _apply_highlighting)
+    #the red/white tags and the passage marker are redrawn once per frame by the app scheduler, not once per key
     #I am mainly doing this to keep in mind what i change as i go though the code as i have the attention span of a butterfly
-    def _check_correctness(self, curr_text: str) -> None:
-        #what do
-        target_short = self.app.engine._normalize(self.app.engine.target_text)
-        typed_short = self.app.engine._normalize(curr_text)
-
-        first_error_pos, complete = self.WriteTreap.check_equal_so_far(target_short)
-        
-        char_correctness = []
-
-        for i in range(len(typed_short)):
-            if first_error_pos == -1:
-                char_correctness.append(True)
-            elif i < first_error_pos:
-                char_correctness.append(True)
-            else:
-                char_correctness.append(False)
-        
-        self._apply_highlighting(char_correctness, len(target_short))
-
-        if complete and not self._completion_processed:
+    def _check_correctness(self) -> None:
+        session = self.session
+        if session.checking:
+            # off-thread check in flight: keep the old highlighting until its result is in
+            self.app.scheduler.add_ticker("checker", self._poll_checker)
+            return
+        self._first_error = session.first_error
+        self._schedule_highlighting()
+        if self._racing:
+            self.app.race.report(session.buffer.size(), session.first_error, len(session.log))
+        engine = self.app.engine
+        if self._recording and engine.start_time is not None:
+            self.ghost_recorder.add(engine.get_elapsed_time(), session.metrics.correct_chars)
+
+        if session.complete and not self._completion_processed:
              self._handle_completion()
 
+    def _poll_checker(self) -> None:
+        res = self.session.checker.poll()
+        if res is None:
+            return
+        self.app.scheduler.remove_ticker("checker")
+        self.session.apply_check(res)
+        self._check_correctness()
+
+    def _render_progress(self) -> None:
+        """Frame callback: retags the visible input lines and moves the passage marker."""
+        started = time.perf_counter_ns()
+        self._apply_highlighting()
+        # progress marker sits on the first wrong character, or right after the typed text
+        session = self.session
+        typed_len = session.buffer.size()
+        self.passage_text.set_progress(
+            session.first_error if session.first_error != -1 else min(typed_len, self.app.engine.target.length)
+        )
+        self.probe.add("highlight", time.perf_counter_ns() - started)
+
     #i am not sure of this somthing feels off primarily that we are dealing with two different things being the treap and the text sulmontainously i know thats what we want but it feels wrong
+    #(it is less off now: the treap lives in GameSession and the widget only replays the deltas it returns)
     def _on_key(self, event: tk.Event) -> Optional[str]:
         # Allow navigation keys and shortcuts to pass through (handled by hooks or default)
-        if event.keysym in ("Left", "Right", "Up", "Down", "Home", "End", "Return", "Escape"):
+        if event.keysym in ("Left", "Right", "Up", "Down", "Home", "End", "Escape"):
+            self._flush_input()
             return None
         if event.state & 4: # Control key
+            self._flush_input()
             return None
 
-        if event.char and event.char.isprintable():
-            current_text = self.text.get("1.0", "end-1c") # -1c to exclude trailing newline
-            cursor = self._get_cursor_index()
-            
-            # Handle selection overwrite
-            start, end = self._get_selection_indices()
-            if start != -1:
-                current_text, cursor = TextEditor.range_delete(current_text, start, end)
-                self.WriteTreap.delete_range(start, end)
-                # After delete, cursor is at start
-            
-            new_text, new_cursor = TextEditor.type_char(current_text, cursor, event.char)
-            self.WriteTreap.insert(new_cursor -1, event.char) 
-            self._update_text_and_cursor(new_text, new_cursor)
-            
-            self._start_timer_if_needed()
+        # Return/Tab have to go through the treap too, otherwise code passages desync
+        char = {"Return": "\n", "KP_Enter": "\n", "Tab": "\t"}.get(event.keysym, event.char)
+
+        if char and (char.isprintable() or char in "\n\t"):
+            self._queue_char(char)
             return "break" # Stop default insertion
-        
+
         return None
-    
+
+    def _queue_char(self, char: str) -> None:
+        """
+        Holds typed characters until Tk has drained its event queue, then types them as
+        one edit. Cursor and selection are read at the first key of the burst (the first
+        char replaces the selection, the rest follow it, as with one-at-a-time typing).
+        """
+        if self._flush_job is None:
+            self._pending_at = self._read_cursor()
+            self._flush_job = self.after_idle(self._flush_input)
+        self._pending_chars.append(char)
+
+    def _flush_input(self) -> None:
+        """Applies the queued burst; every other handler calls this first."""
+        if self._flush_job is None:
+            return
+        self.after_cancel(self._flush_job)
+        self._flush_job = None
+        cursor, selection = self._pending_at
+        text = "".join(self._pending_chars)
+        self._pending_chars = []
+
+        # a burst that runs past the end of the passage completes it on the way: type up
+        # to that point first so the run finishes on the same key as without batching
+        start = selection[0] if selection else cursor
+        removed = selection[1] - selection[0] if selection else 0
+        k = self.app.engine.target.length - (self.session.buffer.size() - removed)
+        if 0 < k < len(text):
+            edit = self.session.type_text(cursor, text[:k], selection)
+            # only happens on the last key of a run, not worth waiting for the checker thread
+            self.session.settle()
+            self._apply_edit(edit)
+            if self._completion_processed:
+                return
+            cursor, selection, text = start + k, None, text[k:]
+            self.probe.begin()
+        self._apply_edit(self.session.type_text(cursor, text, selection))
+
+    def _discard_input(self) -> None:
+        if self._flush_job is not None:
+            self.after_cancel(self._flush_job)
+            self._flush_job = None
+        self._pending_chars = []
+
     # special note: the selection IS already exclusive so when using any implicit treaps use the end selection normally
     # our treaps are made with exclusive end in mind so no need to adjust for that
     def _handle_backspace(self, event: tk.Event) -> Optional[str]:
-        current_text = self.text.get("1.0", "end-1c")
-        start, end = self._get_selection_indices()
-        
-        if start != -1:
-            # Selection delete
-            new_text, new_cursor = TextEditor.range_delete(current_text, start, end)
-            self.WriteTreap.delete_range(start, end)
-        else:
-            # Single char delete
-            cursor = self._get_cursor_index()
-            if cursor > 0:
-                new_text, new_cursor = TextEditor.range_delete(current_text, cursor - 1, cursor)
-                self.WriteTreap.erase(cursor - 1);
-            else:
-                return "break"
-                
-        self._update_text_and_cursor(new_text, new_cursor)
-        self._start_timer_if_needed()
+        self._flush_input()
+        cursor, selection = self._read_cursor()
+        self._apply_edit(self.session.backspace(cursor, selection))
         return "break"
 
     #clairification the blinking cursor position is the char after it so if the word is hel|lo the cursor index is 3
     #by deleting whats after the cursor we mean deleting the l in hello or rather the position itself
     def _handle_delete(self, event: tk.Event) -> Optional[str]:
-        current_text = self.text.get("1.0", "end-1c")
-        start, end = self._get_selection_indices()
-        
-        if start != -1:
-            # Selection delete
-            new_text, new_cursor = TextEditor.range_delete(current_text, start, end)
-            self.WriteTreap.delete_range(start, end)
-        else:
-            # Single char delete forward
-            cursor = self._get_cursor_index()
-            if cursor < len(current_text):
-                new_text, new_cursor = TextEditor.range_delete(current_text, cursor, cursor + 1)
-                self.WriteTreap.erase(cursor);
-            else:
-                return "break"
-                
-        self._update_text_and_cursor(new_text, new_cursor)
-        self._start_timer_if_needed()
+        self._flush_input()
+        cursor, selection = self._read_cursor()
+        self._apply_edit(self.session.delete(cursor, selection))
         return "break"
 
-    def _apply_highlighting(self, char_correctness, target_len: int) -> None:
-        self.text.tag_remove("error", "1.0", "end")
-        self.text.tag_remove("correct", "1.0", "end")
-        
-        for i, is_correct in enumerate(char_correctness):
-            index_start = f"1.0+{i}c"
-            index_end = f"1.0+{i+1}c"
-
-            if i >= target_len:
-                self.text.tag_add("error", index_start, index_end)
-            elif is_correct:
-                self.text.tag_add("correct", index_start, index_end)
-            else:
-                self.text.tag_add("error", index_start, index_end)
+    def _schedule_highlighting(self) -> None:
+        # keys and scroll events arrive in bursts, retag once per frame
+        self.app.scheduler.mark_dirty("highlight", self._render_progress)
+
+    def _apply_highlighting(self) -> None:
+        """
+        Tags the visible lines of the input: every character the diff engine considers
+        wrong is an error, the rest is correct. Lines off screen keep whatever tags they
+        had and are retagged when they scroll into view.
+        """
+        # display lines, i.e. the wrapped rows on screen: a prose passage is one logical
+        # line, "linestart"/"lineend" alone would span (and retag) the whole buffer
+        view_start = self.text.index("@0,0 display linestart")
+        view_end = self.text.index(f"@0,{self.text.winfo_height()} display lineend")
+        self.text.tag_remove("error", view_start, view_end)
+        self.text.tag_remove("correct", view_start, view_end)
+
+        if self._first_error == -1:
+            self.text.tag_add("correct", view_start, view_end)
+            return
+
+        diff = self.session.diff
+        if diff is not None:
+            self.text.tag_add("correct", view_start, view_end)
+            for start, end in diff.error_ranges(self._offset(view_start), self._offset(view_end)):
+                self.text.tag_add("error", self._index(start), self._index(end))
+            return
+
+        # no diff engine: everything from the first mismatch on is an error
+
+        error_start = self._index(self._first_error)
+        if self.text.compare(error_start, "<", view_start):
+            error_start = view_start
+        elif self.text.compare(error_start, ">", view_end):
+            error_start = view_end
+
+        self.text.tag_add("correct", view_start, error_start)
+        self.text.tag_add("error", error_start, view_end)
 
     #initialize the treap here and delete previous instances before starting a new run
     def on_show(self) -> None:
         name = self.app.engine.player_name
         diff = self.app.engine.difficulty
-        passage = self.app.engine.target_text
 
         self.header_title.configure(text=f"PANIC PASTE — {name}")
         self.header_hint.configure(text=f"DIFFICULTY: {diff}  •  RUNNING…")
 
-        self.passage_text.configure(text=passage)
+        self.passage_text.set_target(self.app.engine.target)
+        # solved while the run goes on, ResultsPage shows it
+        if diff != "Time-Trial":
+            self.app.par.submit(self.app.engine.passage_key, self.app.engine.target)
 
+        self._discard_input()
+        self.app.scheduler.remove_ticker("checker")
+        self._close_find()
         self.text.delete("1.0", "end")
         self.text.edit_reset()
         self.text.focus_set()
 
         
-        self.WriteTreap = implicit_treap.implicittreap() 
+        self.session.reset()
 
         self._reset_timer_label()
+        self._update_live_stats()
         self.status_label.configure(text="TYPE TO START")
 
         self.timer_header.configure(fg=Theme.NEON_PINK) # Default
         
-        if self._timer_job is not None:
-            self.after_cancel(self._timer_job)
-            self._timer_job = None
+        self._stop_timer()
 
         self.text.edit_modified(False)
         self._completion_processed = False
+        self._first_error = -1
+        if self.hud_label.winfo_ismapped():
+            self.app.scheduler.add_ticker("hud", self._refresh_hud, 250)
+
+        self._saved_ops = 0
+        self._live = True
+        rec, self.pending_recovery = self.pending_recovery, None
+        if rec is not None:
+            self._resume(rec)
+        else:
+            self.app.journal.begin(self.app.engine.state())
+        self.app.journal.probe = self.probe
+        self.app.scheduler.add_ticker("checkpoint", self._autosave, self.AUTOSAVE_MS)
+
+        race = self.app.race
+        self._racing = (rec is None and race is not None and race.started
+                        and race.client.passage_key == self.app.engine.passage_key)
+        if self._racing:
+            self.race_canvas.pack(padx=14, pady=(0, 12))
+            self.app.scheduler.add_ticker("race", self._draw_race, self.RACE_MS)
+        else:
+            self.race_canvas.pack_forget()
+
+        # a resumed run lost the samples before the crash, it is not recorded
+        self._recording = rec is None
+        self.ghost_recorder.reset()
+        engine = self.app.engine
+        self._ghost = self.app.ghosts.ghost_for(engine.passage_key, engine.target.prefix_hashes[-1], name)
+        if self._ghost is not None:
+            self.passage_title.configure(text=f"PASSAGE  •  GHOST {self._ghost.player_name} {self._ghost.wpm} WPM")
+            self.passage_text.set_ghost(self._ghost.position_at(engine.get_elapsed_time()))
+        else:
+            self.passage_title.configure(text="PASSAGE")
 
     def _reset_timer_label(self) -> None:
          self.timer_label.configure(text="0.00s")
 
+    def _update_live_stats(self) -> None:
+        metrics = self.session.metrics
+        self.wpm_label.configure(text=f"WPM {metrics.live_wpm()}")
+        diff = self.session.diff
+        errors = diff.errors + diff.missing if diff is not None else metrics.errors
+        self.accuracy_label.configure(text=f"ACC {metrics.accuracy * 100:0.0f}%  ERR {errors}")
+
     def _reset_run(self) -> None:
+        self._end_checkpoints(save=False)
+        self._end_race()
         self.app.engine.start_game(self.app.engine.player_name, self.app.engine.difficulty)
         self.on_show()
 
     def _quit_to_home(self) -> None:
+        self._discard_input()
         self._stop_timer()
+        self._end_checkpoints(save=True)
+        self._end_race()
         self.app.engine.stop_timer()
+        self._dump_latency("quit")
         self.app.show("HomePage")
 
     def _start_timer_if_needed(self) -> None:
-        if self.app.engine.is_running:
+        # the engine timer itself is started by the session on the first edit, this starts the UI tick
+        if self.app.scheduler.has_ticker("timer") or self._completion_processed:
             return
-        
+
         self.app.engine.start_timer()
         self.status_label.configure(text="GO! GO! GO!")
+        # ticks on the app frame clock (every frame while typing, slower when idle)
+        self.app.scheduler.add_ticker("timer", self._tick)
         self._tick()
+        if self._ghost is not None:
+            self.app.scheduler.add_ticker("ghost", self._move_ghost)
 
     def _stop_timer(self) -> None:
-        if self._timer_job is not None:
-            self.after_cancel(self._timer_job)
-            self._timer_job = None
+        self.app.scheduler.remove_ticker("timer")
+        self.app.scheduler.remove_ticker("ghost")
+
+    def _move_ghost(self) -> None:
+        """Frame tick: puts the ghost where its run was at the current elapsed time (binary search)."""
+        if not self.app.engine.is_running:
+            self.app.scheduler.remove_ticker("ghost")
+            return
+        self.passage_text.set_ghost(self._ghost.position_at(self.app.engine.get_elapsed_time()))
 
     def _tick(self) -> None:
         """Standard Timer: Count Up"""
         if not self.app.engine.is_running:
+            self._stop_timer()
             return
 
         elapsed = self.app.engine.get_elapsed_time()
         self.timer_label.configure(text=f"{elapsed:0.2f}s")
-        self._timer_job = self.after(33, self._tick)
+        self._update_live_stats()
 
     def _on_modified(self, _event: Optional[tk.Event] = None) -> None:
         if self.text.edit_modified():
@@ -822,22 +1368,30 @@ class GamePage(NeonPage):
         # Stop UI timer visual
         self._stop_timer()
         
-        # Get result from engine
+        # Get result from the session (live correct-prefix counter / elapsed time)
         # res: GameResult = self.app.engine.get_results()
-        res = GameResult(self.app.engine.player_name, 
-                         self.app.engine.difficulty,
-                         int(self.WriteTreap.size() / 5 / self.app.engine.get_elapsed_time() * 60),
-                         self.app.engine.get_elapsed_time())
+        res = self.session.result()
+        self._save_ghost(res)
         self._save_and_show_results(res)
 
+    def _save_ghost(self, res: GameResult) -> None:
+        """Keeps the finished run as the passage's ghost if it beats the player's best."""
+        if not self._recording:
+            return
+        self._recording = False
+        engine = self.app.engine
+        ghost = self.ghost_recorder.finish(res.player_name, res.wpm, res.time_seconds, engine.target.length)
+        self.app.ghosts.submit(engine.passage_key, engine.target.prefix_hashes[-1], ghost)
+
     def _save_and_show_results(self, res: GameResult) -> None:
-        # Use modular insert_player interface
-        self.app.leaderboard_service.insert_player(
-            username=res.player_name,
-            difficulty=res.difficulty,
-            score=res.wpm,
-            time_seconds=res.time_seconds 
-        )
+        # the run is over, nothing left to resume
+        self._end_checkpoints(save=False)
+        if self._racing:
+            self.app.race.finish(res.wpm, res.time_seconds)
+        self._end_race()
+        # Use modular insert_player interface (through the session)
+        self.session.submit(res)
+        self._dump_latency(f"{res.difficulty} {res.wpm}wpm")
         
         
         # Note: insert_player in the requested C++ interface might be strict (username, diff, score).
@@ -851,75 +1405,258 @@ class GamePage(NeonPage):
         self.app.show("ResultsPage")
 
     # -------------------------------------------------------------------------
-    # Text Editing Hooks
+    # Checkpoints
     # -------------------------------------------------------------------------
-    # These methods intercept system events to route text manipulation through
-    # the modular TextEditor class. This decoupling is critical for the 
-    # planned migration to a C++ backend.
+    # Every edit goes to the app's crash journal as it happens (the session's log
+    # mirrors its records there). Every few seconds while the run changes, when the
+    # page is left and when the window is closed, the journal is compacted into a
+    # snapshot (checkpoint.py). SetupPage offers to resume what is on disk. The
+    # writer thread does all file I/O; here it costs one native dump per treap.
     # -------------------------------------------------------------------------
 
-    def _hook_copy(self, _event: tk.Event) -> Optional[str]:
+    AUTOSAVE_MS: int = 5000
 
-        current_text = self.text.get("1.0", "end-1c")
-        start, end = self._get_selection_indices()
-   
+    def _autosave(self) -> None:
+        if len(self.session.log) == self._saved_ops:
+            return
+        self.app.journal.compact(Checkpoint.capture(self.session))
+        self._saved_ops = len(self.session.log)
 
-        if start != -1:
-            self.clipboard_content = self.WriteTreap.copy(start, end)  
-            
-            
-        return "break" # Prevent default Tkinter handling
+    def _end_checkpoints(self, save: bool) -> None:
+        if not self._live:
+            return
+        self._live = False
+        self.app.scheduler.remove_ticker("checkpoint")
+        if save:
+            self._autosave()
+        else:
+            self.app.journal.discard()
 
-    def _hook_cut(self, _event: tk.Event) -> Optional[str]:
-   
-        current_text = self.text.get("1.0", "end-1c") # getting text via tkinter
-        start, end = self._get_selection_indices()
+    def on_close(self) -> None:
+        if self._live:
+            self._flush_input()
+            self._end_checkpoints(save=True)
 
+    # -------------------------------------------------------------------------
+    # Race
+    # -------------------------------------------------------------------------
+    # Progress is handed to the race client after every check (a tuple store, the
+    # client's loop sends at most one delta per tick); the bars are redrawn from
+    # its standings on a slower ticker.
+    # -------------------------------------------------------------------------
 
-        if start != -1:
-            # Atomic cut operation via TextEditor
-            
-            self.clipboard_content = self.WriteTreap.cut(start, end) 
+    RACE_MS: int = 100
+    RACE_ROW: int = 16
+
+    def _draw_race(self) -> None:
+        race = self.app.race
+        canvas = self.race_canvas
+        standings = sorted(race.standings(), key=lambda r: r.id)
+        width = int(canvas.cget("width"))
+        height = self.RACE_ROW * len(standings)
+        if int(canvas.cget("height")) != height:
+            canvas.configure(height=height)
+        canvas.delete("all")
+        length = max(1, self.app.engine.target.length)
+        me = race.client.player_id if race.client is not None else 0
+        for row, racer in enumerate(standings):
+            y = row * self.RACE_ROW
+            done = racer.progress.correct(length) / length
+            color = Theme.NEON_GREEN if racer.wpm != -1 else (Theme.NEON_CYAN if racer.id == me else Theme.NEON_PINK)
+            canvas.create_rectangle(0, y + 2, int(width * done), y + self.RACE_ROW - 2, fill=color, width=0)
+            label = f"{racer.name} {racer.wpm}WPM" if racer.wpm != -1 else racer.name
+            canvas.create_text(2, y + self.RACE_ROW // 2, text=label, anchor="w",
+                               fill=Theme.TEXT, font=Theme.font(7, "bold"))
+
+    def _end_race(self) -> None:
+        if not self._racing:
+            return
+        self._racing = False
+        self.app.scheduler.remove_ticker("race")
+        self.app.race.leave()
 
-            new_text, new_cursor, _ = TextEditor.range_delete(current_text, start, end)
-            
-            # Update Editor State
-            self._update_text_and_cursor(new_text, new_cursor)
+    def _resume(self, rec: Recovery) -> None:
+        """
+        Continues a saved run in the freshly reset page: restores the session (snapshot
+        plus journal tail), refills the widget and compacts right away, so the journal
+        starts over behind the restored state.
+        """
+        text = rec.restore(self.session)
+        self.app.journal.begin(self.app.engine.state())
+        self.app.journal.compact(Checkpoint.capture(self.session))
+        self._saved_ops = len(self.session.log)
+        if text:
+            self.text.insert("1.0", text)
+            self.text.mark_set("insert", self._index(len(text)))
+            self.text.see("insert")
+        self.text.edit_modified(False)
+        self._update_live_stats()
+        self._check_correctness()
+        if self.app.engine.is_running:
             self._start_timer_if_needed()
-            
+        self.status_label.configure(text="RESUMED")
+
+    # -------------------------------------------------------------------------
+    # Text Editing Hooks
+    # -------------------------------------------------------------------------
+    # These methods intercept system events to route text manipulation through
+    # the C++ implicit treap owned by GameSession, the backend TextEditor was a
+    # prototype for. The widget only receives the resulting delta via _apply_edit.
+    # -------------------------------------------------------------------------
+
+    def _hook_copy(self, _event: tk.Event, register: int = 0) -> Optional[str]:
+        self._flush_input()
+        _cursor, selection = self._read_cursor()
+        self.session.copy(selection, register)
+        self.probe.end()
+        return "break" # Prevent default Tkinter handling
+
+    def _hook_cut(self, _event: tk.Event) -> Optional[str]:
+        self._flush_input()
+        _cursor, selection = self._read_cursor()
+        self._apply_edit(self.session.cut(selection))
         return "break"
 
-    def _hook_paste(self, _event: tk.Event) -> Optional[str]:
+    def _hook_paste(self, _event: tk.Event, register: int = 0) -> Optional[str]:
         """
         Intercepts Paste event.
-        Retrieves system clipboard, normalizes, and injects via TextEditor.
+        Pastes the internal clipboard treap into the buffer and mirrors it into the widget.
         """
-        try:
-            content = self.clipboard_content.to_string() 
-        except tk.TclError:
-            return "break" # Clipboard empty or unavailable
-            
-        if not content:
+        self._flush_input()
+        cursor, selection = self._read_cursor()
+        self._apply_edit(self.session.paste(cursor, selection, register))
+        return "break"
+
+    def _hook_transform(self, _event: tk.Event, kind: str) -> Optional[str]:
+        """Ctrl+U / Ctrl+L / Ctrl+T: upper-, lower- or toggle-cases the selection."""
+        self._flush_input()
+        _cursor, selection = self._read_cursor()
+        self._apply_edit(self.session.transform(selection, kind))
+        self._reselect(selection)
+        return "break"
+
+    def _reselect(self, selection: Optional[Tuple[int, int]]) -> None:
+        # a transform rewrites the selected text in the widget, keep it selected for the next one
+        if selection is not None and not self._completion_processed:
+            self.text.tag_add("sel", self._index(selection[0]), self._index(selection[1]))
+
+    def _hook_paste_history(self, _event: tk.Event) -> Optional[str]:
+        """
+        Ctrl+Shift+V: pastes the clip before the newest one; pressed again right away it
+        swaps the text it just pasted for the next older clip in the history ring.
+        """
+        self._flush_input()
+        cursor, selection = self._read_cursor()
+        count = len(self.session.clipboard.history)
+        if count == 0:
+            self.probe.end()
             return "break"
-            
-        current_text = self.text.get("1.0", "end-1c")
-        cursor = self._get_cursor_index()
-        
-        # If selection exists, Paste acts as "Replace Selection"
-        start, end = self._get_selection_indices()
-        if start != -1:
-             current_text, cursor = TextEditor.range_delete(current_text, start, end)
-             self.WriteTreap.delete_range(start, end)
 
-        # Insert content
-        new_text, new_cursor = TextEditor.paste(current_text, cursor, content)
-        self.WriteTreap.paste(cursor, self.clipboard_content)
-        
-        self._update_text_and_cursor(new_text, new_cursor)
-        self._start_timer_if_needed()
-        
+        last = self._history_paste
+        if last is not None and selection is None and cursor == last[1]:
+            selection, k = (last[0], last[1]), last[2] + 1
+        else:
+            k = 1 if count > 1 else 0
+        k %= count
+        edit = self.session.paste(cursor, selection, HISTORY_BASE + k)
+        self._apply_edit(edit)
+        if edit is not None:
+            self._history_paste = (edit.start, edit.cursor, k)
         return "break"
 
+    # -------------------------------------------------------------------------
+    # Find Bar
+    # -------------------------------------------------------------------------
+    # The search runs natively over the treap (GameSession.find), the widget text
+    # is never read. Enter jumps to the next match and selects it, Escape goes
+    # back to the input with the match still selected, ready for Ctrl+C. Enter in
+    # MAP TO applies FIND -> MAP TO as a char map (a lazy range tag in the treap).
+    # -------------------------------------------------------------------------
+
+    def _open_find(self, _event: Optional[tk.Event] = None) -> str:
+        self._flush_input()
+        if not self.find_bar.winfo_ismapped():
+            self.find_bar.pack(side="left", padx=12)
+        self.find_entry.select_range(0, "end")
+        self.find_entry.focus_set()
+        return "break"
+
+    def _close_find(self, _event: Optional[tk.Event] = None) -> str:
+        if self.find_bar.winfo_ismapped():
+            self.find_bar.pack_forget()
+            self.find_status.configure(text="")
+            self.text.focus_set()
+        return "break"
+
+    def _apply_char_map(self, _event: Optional[tk.Event] = None) -> str:
+        """Maps FIND chars to MAP TO chars over the selection, or the whole input without one."""
+        src, dst = self.find_entry.get(), self.map_entry.get()
+        if not src or len(src) != len(dst):
+            self.find_status.configure(text="FIND / MAP TO LENGTHS DIFFER", fg=Theme.DANGER)
+            return "break"
+        # the treap's char map is a 256 entry table without newlines
+        if "\n" in src + dst or len(src) > 255 or any(ord(c) > 255 for c in src + dst):
+            self.find_status.configure(text="INVALID MAP", fg=Theme.DANGER)
+            return "break"
+
+        _cursor, selection = self._read_cursor()
+        size = self.session.buffer.size()
+        if selection is None:
+            if size == 0:
+                self.probe.end()
+                return "break"
+            selection = (0, size)
+        self._apply_edit(self.session.replace_chars(selection, src, dst))
+        self._reselect(selection)
+        self.find_status.configure(text="MAPPED", fg=Theme.MUTED)
+        return "break"
+
+    def _find_next(self, _event: Optional[tk.Event] = None) -> str:
+        pattern = self.find_entry.get()
+        cursor, selection = self._get_cursor_index(), self._selection()
+        # search after the current selection, so Enter steps from match to match
+        match = self.session.find(pattern, selection[1] if selection else cursor)
+        if match is None:
+            self.find_status.configure(text="NO MATCH" if pattern else "", fg=Theme.DANGER)
+            return "break"
+
+        start, end = match
+        self.text.tag_remove("sel", "1.0", "end")
+        self.text.tag_add("sel", self._index(start), self._index(end))
+        self.text.mark_set("insert", self._index(end))
+        self.text.see("insert")
+        self.find_status.configure(text=f"{self.session.count(pattern)} FOUND", fg=Theme.MUTED)
+        return "break"
+
+    # -------------------------------------------------------------------------
+    # Latency HUD
+    # -------------------------------------------------------------------------
+
+    def _toggle_hud(self, _event: Optional[tk.Event] = None) -> str:
+        if self.hud_label.winfo_ismapped():
+            self.hud_label.place_forget()
+            self.app.scheduler.remove_ticker("hud")
+        else:
+            self.hud_label.place(relx=1.0, x=-24, y=12, anchor="ne")
+            self.hud_label.lift()
+            self._refresh_hud()
+            # percentiles sort up to a few thousand samples, 4 Hz is plenty for a HUD
+            self.app.scheduler.add_ticker("hud", self._refresh_hud, 250)
+        return "break"
+
+    def _refresh_hud(self) -> None:
+        # memory held by each clipboard register goes under the latency table
+        self.hud_label.configure(text=f"{self.probe.format()}\n\n{self.session.clipboard.format()}"
+                                      f"\n\n{self.app.journal.format()}")
+
+    def _dump_latency(self, label: str) -> None:
+        """Prints the per-stage latency table for the run that just ended and starts over."""
+        if self.probe.stages["total"].count:
+            self.probe.dump(label)
+        self.probe.reset()
+        # restarted by on_show if the HUD is still toggled on
+        self.app.scheduler.remove_ticker("hud")
+
 
 # ============================================================
 # 3.5) Time Trial Page
@@ -950,6 +1687,7 @@ class TimeTrialPage(GamePage):
         Overrides GamePage._tick.
         """
         if not self.app.engine.is_running:
+            self._stop_timer()
             return
 
         elapsed = self.app.engine.get_elapsed_time()
@@ -962,17 +1700,21 @@ class TimeTrialPage(GamePage):
             return
         
         self.timer_label.configure(text=f"{remaining:0.2f}s")
-        self._timer_job = self.after(33, self._tick)
+        self._update_live_stats()
 
     def _handle_timeout(self) -> None:
+        # keys typed just before the buzzer still count (and may finish the passage)
+        self._flush_input()
+        if self._completion_processed:
+            return
         self._completion_processed = True
         self._stop_timer()
         
-        # Force finish in engine to calc stats based on what we have
-        curr_text = self.text.get("1.0", "end")
-        self.app.engine.force_finish(curr_text)
-        
-        res: GameResult = self.app.engine.get_results()
+        # Finish with what we have: the session's live counters score the treap directly,
+        # the widget text is never read back
+        if self.session.checking:
+            self.session.settle()
+        res: GameResult = self.session.result()
         # Override time to 30.00 for consistency in result display
         res.time_seconds = 30.00
         
@@ -1028,6 +1770,10 @@ class ResultsPage(NeonPage):
             justify="left",
         )
         self.stats.pack(pady=(0, 12)) # Adjusted pady
+        # run stats and what _show_par needs once the par of the passage is solved
+        self._text: str = ""
+        self._par_key: Optional[PassageKey] = None
+        self._yours: int = 0
 
         # Buttons for navigation
         btns = tk.Frame(center, bg=Theme.PANEL2) # Changed parent to center
@@ -1035,7 +1781,7 @@ class ResultsPage(NeonPage):
 
         ttk.Button(btns, text="VIEW LEADERBOARD", command=lambda: self.app.show("LeaderboardPage")).grid(row=0, column=0, padx=10)
         # Retry button logic: go to GamePage for normal, TimeTrialPage for time trial
-        ttk.Button(btns, text="RETRY", command=lambda: self.app.show("GamePage") if self.app.last_run_result and self.app.last_run_result.difficulty != "Time-Trial" else self.app.show("TimeTrialPage")).grid(row=0, column=1, padx=10)
+        ttk.Button(btns, text="RETRY", command=self.app.retry).grid(row=0, column=1, padx=10)
         ttk.Button(btns, text="HOME", command=lambda: self.app.show("HomePage")).grid(row=0, column=2, padx=10)
 
     def on_show(self) -> None:
@@ -1052,14 +1798,42 @@ class ResultsPage(NeonPage):
         else:
              self.big.configure(text="RUN COMPLETE!", fg=Theme.NEON_GREEN)
 
-        self.stats.configure(
-            text=(
-                f"PLAYER:   {res.player_name}\n"
-                f"MODE:     {res.difficulty}\n"
-                f"TIME:     {res.time_seconds:0.2f}s\n"
-                f"WPM:      {res.wpm}\n"
-            )
+        self._text = (
+            f"PLAYER:   {res.player_name}\n"
+            f"MODE:     {res.difficulty}\n"
+            f"TIME:     {res.time_seconds:0.2f}s\n"
+            f"WPM:      {res.wpm}\n"
         )
+        self.app.scheduler.remove_ticker("par")
+        # par only means something for a finished passage, a time trial is cut off
+        engine = self.app.engine
+        if res.difficulty != "Time-Trial" and res.edit_log is not None and engine.target is not None:
+            self._par_key = engine.passage_key
+            self._yours = run_cost(res.edit_log)
+            # normally solved during the run; a resumed run may still be waiting for it
+            self.app.par.submit(engine.passage_key, engine.target)
+            if not self._show_par():
+                self.stats.configure(text=self._text + "PAR:      solving…\n")
+                self.app.scheduler.add_ticker("par", self._poll_par, 100)
+        else:
+            self.stats.configure(text=self._text)
+
+    def _show_par(self) -> bool:
+        par = self.app.par.get(self._par_key)
+        if par is None:
+            return False
+        # par is the cheapest way the solver found, not a proven optimum: a run can beat it,
+        # so the efficiency is not capped at 100%
+        self.stats.configure(text=self._text + (
+            f"PAR:      {par.cost} keys (best found)\n"
+            f"YOURS:    {self._yours} keys\n"
+            f"EFFICIENCY: {round(100 * par.cost / max(self._yours, 1))}%\n"
+        ))
+        return True
+
+    def _poll_par(self) -> None:
+        if self._show_par():
+            self.app.scheduler.remove_ticker("par")
 
 
 # ============================================================
@@ -1144,7 +1918,7 @@ class LeaderboardPage(NeonPage):
         footer = tk.Frame(outer, bg=Theme.PANEL2)
         footer.pack(fill="x", pady=(12, 0))
 
-        ttk.Button(footer, text="RETRY", command=lambda: self.app.show("GamePage")).pack(side="left")
+        ttk.Button(footer, text="RETRY", command=self.app.retry).pack(side="left")
         ttk.Button(footer, text="HOME", command=lambda: self.app.show("HomePage")).pack(side="right")
 
     def on_show(self) -> None:
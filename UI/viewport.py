@@ -0,0 +1,85 @@
+from array import array
+from bisect import bisect_right
+from typing import List, Tuple
+
+
+def wrap_rows(text: str, columns: int) -> array:
+    """
+    Word-wraps text at a fixed column count (the pixel font is monospaced).
+
+    Args:
+        text (str): The text to lay out.
+        columns (int): Characters per row.
+
+    Returns:
+        array: Start offset of every row, rows[0] is always 0.
+    """
+    columns = max(1, columns)
+    rows = array("I", [0])
+    n = len(text)
+    start = 0
+    while start < n:
+        limit = start + columns
+        newline = text.find("\n", start, min(limit + 1, n))
+        if newline != -1:
+            nxt = newline + 1
+        elif limit >= n:
+            break
+        else:
+            space = text.rfind(" ", start, limit + 1)
+            # break after the last space that fits, or hard-break words longer than a row
+            nxt = space + 1 if space > start else limit
+        if nxt >= n:
+            break
+        rows.append(nxt)
+        start = nxt
+    return rows
+
+
+class TextViewport:
+    """
+    Tracks which rows of a wrapped text are on screen.
+
+    The layout is computed once per (text, columns); afterwards every query is
+    O(log rows) or O(visible rows), independent of the text length.
+    """
+
+    def __init__(self, text: str, columns: int, visible_rows: int) -> None:
+        self.text: str = text
+        self.columns: int = columns
+        self.visible_rows: int = max(1, visible_rows)
+        self.rows: array = wrap_rows(text, columns)
+        self.first_row: int = 0
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def row_of(self, offset: int) -> int:
+        """Row that contains the character at offset."""
+        return max(0, bisect_right(self.rows, offset) - 1)
+
+    def row_bounds(self, row: int) -> Tuple[int, int]:
+        """[start, end) offsets of a row, excluding its trailing newline."""
+        start = self.rows[row]
+        end = self.rows[row + 1] if row + 1 < len(self.rows) else len(self.text)
+        if end > start and self.text[end - 1] == "\n":
+            end -= 1
+        return start, end
+
+    def visible(self) -> List[Tuple[int, int]]:
+        """Bounds of every row currently on screen, top to bottom."""
+        last = min(self.first_row + self.visible_rows, len(self.rows))
+        return [self.row_bounds(r) for r in range(self.first_row, last)]
+
+    def scroll(self, delta_rows: int) -> None:
+        max_first = max(0, len(self.rows) - self.visible_rows)
+        self.first_row = min(max(0, self.first_row + delta_rows), max_first)
+
+    def follow(self, offset: int, margin: int = 1) -> None:
+        """Scrolls just enough to keep the row holding offset on screen."""
+        row = self.row_of(offset)
+        if row < self.first_row + margin:
+            self.scroll(row - margin - self.first_row)
+        elif row >= self.first_row + self.visible_rows - margin:
+            self.scroll(row - (self.first_row + self.visible_rows - margin - 1))
@@ -0,0 +1,236 @@
+"""
+Reproducible micro-benchmarks for the text buffer and the leaderboard.
+
+Compares the C++ implicittreap (utf-8 bytes) and implicittreap32 (code points)
+against TextEditor's Python string slicing at
+10^2..10^6 characters, and measures LeaderboardTreap.registerTime / getTop10 at
+up to 10^6 players. Results are written as JSON lines (one object per
+measurement) so two commits can be compared with --compare.
+
+Usage (the compiled modules must be importable, e.g. copied into UI/):
+    python benchmarks/bench.py --out bench.jsonl
+    python benchmarks/bench.py --out new.jsonl --compare bench.jsonl
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+UI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "UI")
+sys.path.insert(0, os.path.abspath(UI_DIR))
+
+import implicit_treap  # noqa: E402
+import leaderboard_treap  # noqa: E402
+from engine import UTF32  # noqa: E402
+from text_editor import TextEditor  # noqa: E402
+
+SEED: int = 1234
+ALPHABET: str = "abcdefghijklmnopqrstuvwxyz      .,"
+
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=UI_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _measure(fn: Callable[[int], None], ops: int, repeat: int) -> float:
+    """Best-of-`repeat` nanoseconds per op, fn(i) performs op number i."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for i in range(ops):
+            fn(i)
+        best = min(best, (time.perf_counter_ns() - started) / ops)
+    return best
+
+
+def _random_text(n: int, rng: random.Random) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(n))
+
+
+def _treap_from(text: str, cls=implicit_treap.implicittreap):
+    t = cls()
+    for ch in text:
+        t.insert_last(ch)
+    return t
+
+
+# -------------------------------------------------------------------------
+# Text buffer suite
+# -------------------------------------------------------------------------
+
+def bench_text(sizes: Iterable[int], repeat: int) -> List[Dict]:
+    results: List[Dict] = []
+    for n in sizes:
+        rng = random.Random(SEED)
+        text = _random_text(n, rng)
+        # positions are drawn once so both implementations see the same workload
+        ops = max(10, min(2000, 200_000 // max(1, n // 100)))
+        positions = [rng.randrange(n) for _ in range(ops)]
+        span = min(100, n // 2)
+        needles = [text[p:p + 8] for p in positions]
+
+        for impl, encoding in (("implicittreap", "utf-8"), ("implicittreap32", UTF32)):
+            cls = getattr(implicit_treap, impl)
+            encoded = text.encode(encoding)
+            treap = _treap_from(text, cls)
+            clip = treap.copy(0, span)
+            dump = treap.dumps()
+            treap_cases: List[Tuple[str, Callable[[int], None], int]] = [
+                ("insert", lambda i: treap.insert(positions[i], "x"), ops),
+                ("erase", lambda i: treap.erase(positions[i]), ops),
+                ("copy", lambda i: treap.copy(positions[i] // 2, positions[i] // 2 + span), ops),
+                ("cut", lambda i: treap.paste(positions[i] // 2, treap.cut(positions[i] // 2, positions[i] // 2 + span)), ops),
+                ("paste", lambda i: treap.paste(positions[i], clip), ops),
+                ("check_equal_so_far", lambda i: treap.check_equal_so_far(encoded), max(1, ops // 100)),
+                ("score", lambda i: treap.score(encoded, True), max(1, ops // 100)),
+                ("to_string", lambda i: treap.to_string(), max(1, ops // 100)),
+                ("find", lambda i: treap.find(needles[i]), max(1, ops // 100)),
+                ("dumps", lambda i: treap.dumps(), max(1, ops // 100)),
+                ("loads", lambda i: cls.loads(dump), max(1, ops // 100)),
+            ]
+            for op, fn, count in treap_cases:
+                results.append({"suite": "text", "impl": impl, "op": op, "n": n,
+                                "ns_per_op": _measure(fn, count, repeat)})
+                if op == "paste":
+                    # keep the buffer size stable for the following cases
+                    treap = _treap_from(text, cls)
+
+        # TextEditor is stateless, every op returns a new string
+        state = {"text": text}
+
+        def _type(i: int) -> None:
+            state["text"], _ = TextEditor.type_char(state["text"], positions[i], "x")
+
+        def _erase(i: int) -> None:
+            state["text"], _ = TextEditor.range_delete(state["text"], positions[i], positions[i] + 1)
+
+        def _cut(i: int) -> None:
+            s = positions[i] // 2
+            rest, cur, clipboard = TextEditor.cut(state["text"], s, s + span)
+            state["text"], _ = TextEditor.paste(rest, cur, clipboard)
+
+        clip_text = text[:span]
+        python_cases: List[Tuple[str, Callable[[int], None], int]] = [
+            ("insert", _type, ops),
+            ("erase", _erase, ops),
+            ("copy", lambda i: TextEditor.copy(state["text"], positions[i] // 2, positions[i] // 2 + span), ops),
+            ("cut", _cut, ops),
+            ("paste", lambda i: TextEditor.paste(state["text"], positions[i], clip_text), ops),
+            ("check_equal_so_far", lambda i: state["text"] == text, max(1, ops // 100)),
+            # what GameEngine.submit_text did before the native kernel
+            ("score", lambda i: [a == b for a, b in zip(state["text"], text)].count(True), max(1, ops // 100)),
+            ("to_string", lambda i: str(state["text"]), max(1, ops // 100)),
+            ("find", lambda i: state["text"].find(needles[i]), max(1, ops // 100)),
+        ]
+        for op, fn, count in python_cases:
+            results.append({"suite": "text", "impl": "TextEditor", "op": op, "n": n,
+                            "ns_per_op": _measure(fn, count, repeat)})
+    return results
+
+
+# -------------------------------------------------------------------------
+# Leaderboard suite
+# -------------------------------------------------------------------------
+
+def bench_leaderboard(sizes: Iterable[int], repeat: int) -> List[Dict]:
+    results: List[Dict] = []
+    for n in sizes:
+        rng = random.Random(SEED)
+        players = [(f"P{i:07d}", rng.randrange(10, 150), rng.uniform(10.0, 90.0)) for i in range(n)]
+
+        board: List = [None]
+
+        def _register_all(_i: int) -> None:
+            board[0] = leaderboard_treap.LeaderboardTreap()
+            register = board[0].registerTime
+            for name, wpm, t in players:
+                register(name, wpm, t)
+
+        total = _measure(_register_all, 1, repeat)
+        results.append({"suite": "leaderboard", "impl": "LeaderboardTreap", "op": "registerTime",
+                        "n": n, "ns_per_op": total / n})
+
+        # improvements of existing players go through updateNode (erase + insert)
+        updates = min(n, 10_000)
+        lb = board[0]
+        results.append({"suite": "leaderboard", "impl": "LeaderboardTreap", "op": "registerTime_update",
+                        "n": n, "ns_per_op": _measure(
+                            lambda i: lb.registerTime(players[i][0], players[i][1] + 200 + i, players[i][2]),
+                            updates, 1)})
+
+        # getTop10 copies the whole time treap on every call, keep the count low for large boards
+        calls = max(1, min(100, 1_000_000 // n))
+        results.append({"suite": "leaderboard", "impl": "LeaderboardTreap", "op": "getTop10",
+                        "n": n, "ns_per_op": _measure(lambda i: lb.getTop10(), calls, repeat)})
+    return results
+
+
+# -------------------------------------------------------------------------
+# Reporting
+# -------------------------------------------------------------------------
+
+def _key(r: Dict) -> Tuple:
+    return r["suite"], r["impl"], r["op"], r["n"]
+
+
+def compare(baseline_path: str, results: List[Dict], threshold: float) -> int:
+    """Prints every measurement that got slower than threshold, returns their count."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {_key(r): r for r in map(json.loads, f) if "ns_per_op" in r}
+
+    regressions = 0
+    for r in results:
+        old = baseline.get(_key(r))
+        if old is None:
+            continue
+        ratio = r["ns_per_op"] / max(old["ns_per_op"], 1e-9)
+        if ratio > 1.0 + threshold:
+            regressions += 1
+            print(f"REGRESSION {r['suite']}/{r['impl']}/{r['op']} n={r['n']}: "
+                  f"{old['ns_per_op']:.0f} -> {r['ns_per_op']:.0f} ns/op (x{ratio:.2f})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Panic Paste benchmark suite")
+    parser.add_argument("--suite", choices=("text", "leaderboard", "all"), default="all")
+    parser.add_argument("--max-exp", type=int, default=6, help="largest size is 10^max-exp")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write JSON lines here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON lines file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before reporting")
+    args = parser.parse_args(argv)
+
+    random.seed(SEED)
+    sizes = [10 ** e for e in range(2, args.max_exp + 1)]
+    results: List[Dict] = []
+    if args.suite in ("text", "all"):
+        results += bench_text(sizes, args.repeat)
+    if args.suite in ("leaderboard", "all"):
+        results += bench_leaderboard(sizes, args.repeat)
+
+    meta = {"commit": _commit(), "python": platform.python_version(), "machine": platform.machine()}
+    lines = [json.dumps({**meta, **r}) for r in results]
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    else:
+        print("\n".join(lines))
+
+    if args.compare:
+        return 1 if compare(args.compare, results, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
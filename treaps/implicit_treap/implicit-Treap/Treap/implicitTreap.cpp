@@ -1,40 +1,217 @@
-#pragma once
 #include <iostream>
 #include <string>
 #include <cstdlib>
 #include <stdexcept>
+#include <vector>
+#include <unordered_set>
+#include <utility>
+#include <algorithm>
+#include <deque>
+#include <memory>
+#include <type_traits>
+#include <cstring>
+#include <cstdint>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
 using namespace std;
 
+// One pass scoring of typed text against a target, fed one char at a time so the same
+// kernel works on a treap walk and on a raw buffer. A position is a mismatch when the
+// char differs from the target or lies past its end.
+template<typename T>
+struct Scorer {
+	const T* target;
+	int target_len;
+	std::string* bitmap;   // bit i set = mismatch at i (LSB first), nullptr when not requested
+	int pos = 0;
+	int correct = 0;
+	int first_error = -1;
+
+	Scorer(const T* t, int len, std::string* bits = nullptr) : target(t), target_len(len), bitmap(bits) {}
+
+	void feed(const T& c) {
+		if (pos < target_len && c == target[pos]) {
+			correct++;
+		}
+		else {
+			if (first_error == -1) first_error = pos;
+			if (bitmap) (*bitmap)[pos >> 3] |= (char)(1 << (pos & 7));
+		}
+		pos++;
+	}
+};
+
+// 256-entry character map applied lazily to whole subtrees (case changes, replace-all).
+// Code units past 255 pass through unchanged, and '\n' is never mapped from or to, so the
+// per-node newline counts stay valid under any map.
+template<typename T>
+struct CharMap {
+	T to[256];
+
+	static unsigned code(T c) { return (unsigned)(typename std::make_unsigned<T>::type)c; }
+
+	T operator()(T c) const {
+		unsigned u = code(c);
+		return u < 256 ? to[u] : c;
+	}
+
+	static CharMap identity() {
+		CharMap m;
+		for (unsigned i = 0; i < 256; i++) m.to[i] = (T)i;
+		return m;
+	}
+
+	// ASCII case maps: 'u'pper, 'l'ower, 't'oggle
+	static CharMap ascii_case(char kind) {
+		CharMap m = identity();
+		for (unsigned i = 'a'; i <= 'z'; i++) {
+			if (kind == 'u' || kind == 't') m.to[i] = (T)(i - 'a' + 'A');
+		}
+		for (unsigned i = 'A'; i <= 'Z'; i++) {
+			if (kind == 'l' || kind == 't') m.to[i] = (T)(i - 'A' + 'a');
+		}
+		return m;
+	}
+
+	// src[i] -> dst[i], like str.maketrans. On the utf-8 treap an element is one byte of a
+	// possibly longer sequence, so only ASCII maps there (a non-ASCII char would map its bytes)
+	static CharMap replace(const std::basic_string<T>& src, const std::basic_string<T>& dst) {
+		if (src.size() != dst.size()) throw std::invalid_argument("replace_chars needs src and dst of equal length");
+		CharMap m = identity();
+		for (size_t i = 0; i < src.size(); i++) {
+			if (sizeof(T) == 1 && (code(src[i]) >= 128 || code(dst[i]) >= 128))
+				throw std::invalid_argument("replace_chars on implicittreap only maps ASCII, use implicittreap32");
+			if (code(src[i]) >= 256) throw std::invalid_argument("replace_chars only maps code units below 256");
+			if (src[i] == T('\n') || dst[i] == T('\n')) throw std::invalid_argument("replace_chars cannot map newlines");
+			m.to[code(src[i])] = dst[i];
+		}
+		return m;
+	}
+
+	// outer after inner
+	static CharMap compose(const CharMap& outer, const CharMap& inner) {
+		CharMap m;
+		for (unsigned i = 0; i < 256; i++) m.to[i] = outer(inner.to[i]);
+		return m;
+	}
+};
+
+// Streaming KMP matcher: the text is fed one char at a time (a treap walk), the
+// pattern is preprocessed once. feed() returns true when a match ends at that char.
+template<typename T>
+struct Matcher {
+	const std::basic_string<T>& pattern;
+	std::vector<int> fail;   // fail[i] = length of the longest proper border of pattern[:i+1]
+	int matched = 0;
+
+	Matcher(const std::basic_string<T>& p) : pattern(p), fail(p.size(), 0) {
+		for (int i = 1, k = 0; i < (int)p.size(); i++) {
+			while (k > 0 && p[i] != p[k]) k = fail[k - 1];
+			if (p[i] == p[k]) k++;
+			fail[i] = k;
+		}
+	}
+
+	bool feed(const T& c) {
+		while (matched > 0 && c != pattern[matched]) matched = fail[matched - 1];
+		if (c == pattern[matched]) matched++;
+		if (matched == (int)pattern.size()) {
+			matched = fail[matched - 1];
+			return true;
+		}
+		return false;
+	}
+};
+
 template<typename T>
 class ImplicitTreap {
 
 private:
 
+	// nodes are shared copy-on-write between treaps (clipboards, snapshots): refs counts the
+	// parents / roots pointing at a node, and a node with refs > 1 is never modified in place
 	class node {
 		public:
 			int priority;
 			node* right;
 			node* left;
 			int size;
+			int lines;   // newlines in the subtree, for line.col <-> offset conversion
+			int refs;
 			T value;
+			// some node in this subtree has a tag, lets walks over untagged trees skip the maps
+			bool tagged;
+			// map still owed to both child subtrees (value is already mapped), null when none
+			std::shared_ptr<const CharMap<T>> tag;
 
-			node(T v) : value(v), priority(rand()), size(1),
-				left(nullptr), right(nullptr) {
+			// in declaration order
+			node(T v) : priority(rand()), right(nullptr), left(nullptr), size(1), lines(v == T('\n')), refs(1),
+				value(v), tagged(false) {
 			}
 	};
 
 	typedef node* nodePtr;
 	nodePtr root;
 
+	// per-instance operation counters, plain integers so they can stay on in release builds
+	// (split/merge count recursive steps, i.e. nodes touched, not top level calls)
+	struct Stats {
+		long long splits = 0;
+		long long merges = 0;
+		long long allocs = 0;
+		long long frees = 0;
+	};
+	Stats stats_;
+
+	void depthStats(nodePtr t, int depth, int& maxDepth, long long& depthSum) const {
+		if (!t) return;
+		if (depth > maxDepth) maxDepth = depth;
+		depthSum += depth;
+		depthStats(t->left, depth + 1, maxDepth, depthSum);
+		depthStats(t->right, depth + 1, maxDepth, depthSum);
+	}
+
 	//O(N) print
-	void inOrderTraversal(nodePtr root) {
-		if (!root) return;
-		inOrderTraversal(root->left);
-		std::cout << root->value << " ";
-		inOrderTraversal(root->right);
+	void inOrderTraversal() const {
+		for_each([](const T& c) {
+			std::cout << c << " ";
+			return true;
+		});
+	}
+
+	// maps t's value now and queues the map for its children (a leaf owes nothing, and
+	// push() runs before anything is linked below it); t must be owned
+	void apply_tag(nodePtr t, const std::shared_ptr<const CharMap<T>>& m) {
+		t->value = (*m)(t->value);
+		if (!t->left && !t->right) return;
+		if (t->tag) t->tag = std::make_shared<const CharMap<T>>(CharMap<T>::compose(*m, *t->tag));
+		else t->tag = m;
+		t->tagged = true;
+	}
+
+	// hands t's pending map down one level before t's children are relinked; t must be owned
+	void push(nodePtr t) {
+		if (!t->tag) return;
+		if (t->left) {
+			t->left = own(t->left);
+			apply_tag(t->left, t->tag);
+		}
+		if (t->right) {
+			t->right = own(t->right);
+			apply_tag(t->right, t->tag);
+		}
+		t->tag.reset();
+	}
+
+	// map owed to the children of t, given the map p owed to t itself; read-only walks
+	// compose on the fly (into scratch storage) instead of pushing, so they stay const
+	static const CharMap<T>* below(nodePtr t, const CharMap<T>* p, std::deque<CharMap<T>>& scratch) {
+		const CharMap<T>* tag = t->tag.get();
+		if (!tag) return p;
+		if (!p) return tag;
+		scratch.push_back(CharMap<T>::compose(*p, *tag));
+		return &scratch.back();
 	}
 
 	void update(nodePtr t) {
@@ -42,41 +219,222 @@ private:
 		t->size = 1 +
 			(t->left ? t->left->size : 0) +
 			(t->right ? t->right->size : 0);
+		t->lines = (t->value == T('\n')) +
+			(t->left ? t->left->lines : 0) +
+			(t->right ? t->right->lines : 0);
+		t->tagged = t->tag ||
+			(t->left && t->left->tagged) ||
+			(t->right && t->right->tagged);
 	}
 
-    nodePtr copySubtree(nodePtr root) {
-        if (!root) return nullptr;
-        nodePtr newNode = new node(root->value);
-        newNode->priority = root->priority;
-        newNode->size = root->size;
-        newNode->left = copySubtree(root->left);
-        newNode->right = copySubtree(root->right);
-        return newNode;
+	// newlines in [0, k), one descent
+	int newlines_before(int k) const {
+		int count = 0;
+		nodePtr t = root;
+		while (t && k > 0) {
+			int left = t->left ? t->left->size : 0;
+			if (k <= left) {
+				t = t->left;
+				continue;
+			}
+			count += (t->left ? t->left->lines : 0) + (t->value == T('\n'));
+			k -= left + 1;
+			t = t->right;
+		}
+		return count;
+	}
+
+	// offset of the r-th newline (0-based), -1 when there are not that many
+	int nth_newline(int r) const {
+		if (!root || r < 0 || r >= root->lines) return -1;
+		int offset = 0;
+		nodePtr t = root;
+		while (t) {
+			int leftLines = t->left ? t->left->lines : 0;
+			int left = t->left ? t->left->size : 0;
+			if (r < leftLines) {
+				t = t->left;
+				continue;
+			}
+			r -= leftLines;
+			if (t->value == T('\n')) {
+				if (r == 0) return offset + left;
+				r--;
+			}
+			offset += left + 1;
+			t = t->right;
+		}
+		return -1;
+	}
+
+    // one more reference to a subtree, O(1): this is what copy, paste and snapshots cost now
+    static nodePtr share(nodePtr t) {
+        if (t) t->refs++;
+        return t;
+    }
+
+    // makes t safe to modify: a shared node is replaced by a private clone that points at the
+    // same children (which become shared in turn), so edits only ever copy the path they walk
+    nodePtr own(nodePtr t) {
+        if (!t || t->refs == 1) return t;
+        stats_.allocs++;
+        nodePtr c = new node(t->value);
+        c->priority = t->priority;
+        c->size = t->size;
+        c->lines = t->lines;
+        c->tag = t->tag;
+        c->tagged = t->tagged;
+        c->left = share(t->left);
+        c->right = share(t->right);
+        t->refs--;
+        return c;
     }
 
+    // drops one reference, frees the nodes nobody else points at
     void clear(nodePtr root) {
-        if (!root) return;
+        if (!root || --root->refs > 0) return;
         clear(root->left);
         clear(root->right);
+        stats_.frees++;
         delete root;
     }
 
+    // nodes reachable from t without passing a shared one, i.e. what dropping t would free
+    long long ownedNodes(nodePtr t) const {
+        if (!t || t->refs > 1) return 0;
+        return 1 + ownedNodes(t->left) + ownedNodes(t->right);
+    }
+
+    // physical nodes reachable from t: a subtree pasted twice is one set of nodes. Only a
+    // node with refs > 1 can be reached twice (its subtree with it), so only those are remembered
+    long long uniqueNodes(nodePtr t) const {
+        long long count = 0;
+        std::unordered_set<nodePtr> seen;
+        std::vector<nodePtr> stack;
+        if (t) stack.push_back(t);
+        while (!stack.empty()) {
+            nodePtr x = stack.back();
+            stack.pop_back();
+            if (x->refs > 1 && !seen.insert(x).second) continue;
+            count++;
+            if (x->left) stack.push_back(x->left);
+            if (x->right) stack.push_back(x->right);
+        }
+        return count;
+    }
+
+	// in-order walk with an explicit stack: O(N) total, no recursion; stops when f returns false
+	template<class F>
+	void for_each(F f) const {
+		for_each_from(0, f);
+	}
+
+	// same walk starting at position k: the stack is seeded with the path down to k
+	// (the nodes whose left subtree holds k), so it costs O(log N) plus what is visited.
+	// Every stack entry carries the map still owed to its node, f sees mapped values.
+	template<class F>
+	void for_each_from(int k, F f) const {
+		if (!root || !root->tagged) {
+			for_each_plain(k, f);
+			return;
+		}
+		std::deque<CharMap<T>> scratch;
+		std::vector<std::pair<nodePtr, const CharMap<T>*>> stack;
+		const CharMap<T>* p = nullptr;
+		nodePtr cur = root;
+		while (cur) {
+			int left = cur->left ? cur->left->size : 0;
+			if (k < left) {
+				stack.push_back(std::make_pair(cur, p));
+				p = below(cur, p, scratch);
+				cur = cur->left;
+			}
+			else if (k == left) {
+				stack.push_back(std::make_pair(cur, p));
+				break;
+			}
+			else {
+				k -= left + 1;
+				p = below(cur, p, scratch);
+				cur = cur->right;
+			}
+		}
+		cur = nullptr;
+		while (cur || !stack.empty()) {
+			while (cur) {
+				stack.push_back(std::make_pair(cur, p));
+				p = below(cur, p, scratch);
+				cur = cur->left;
+			}
+			cur = stack.back().first;
+			p = stack.back().second;
+			stack.pop_back();
+			if (!f(p ? (*p)(cur->value) : cur->value)) return;
+			p = below(cur, p, scratch);
+			cur = cur->right;
+		}
+	}
+
+	// the same walk for a tree without pending maps, the common case on the hot path
+	template<class F>
+	void for_each_plain(int k, F f) const {
+		std::vector<nodePtr> stack;
+		nodePtr cur = root;
+		while (cur) {
+			int left = cur->left ? cur->left->size : 0;
+			if (k < left) {
+				stack.push_back(cur);
+				cur = cur->left;
+			}
+			else if (k == left) {
+				stack.push_back(cur);
+				break;
+			}
+			else {
+				k -= left + 1;
+				cur = cur->right;
+			}
+		}
+		cur = nullptr;
+		while (cur || !stack.empty()) {
+			while (cur) {
+				stack.push_back(cur);
+				cur = cur->left;
+			}
+			cur = stack.back();
+			stack.pop_back();
+			if (!f(cur->value)) return;
+			cur = cur->right;
+		}
+	}
+
 	T _search(nodePtr root, int k) {
 		if (!root || k > (root->size) - 1 || k < 0) {
 			throw std::out_of_range("index out of range");
 		}
-		long long num = root->left ? root->left->size : 0;
-		if (k == num) return (root->value);
-		else if (k < num) return _search(root->left, k);
-		else return _search(root->right, k - num - 1);
+		std::deque<CharMap<T>> scratch;
+		const CharMap<T>* p = nullptr;
+		while (true) {
+			long long num = root->left ? root->left->size : 0;
+			if (k == num) return p ? (*p)(root->value) : root->value;
+			p = below(root, p, scratch);
+			if (k < num) root = root->left;
+			else {
+				k -= num + 1;
+				root = root->right;
+			}
+		}
 	}
 
 	void split(nodePtr root, int k, nodePtr& l, nodePtr& r) {
+		stats_.splits++;
 
 		if (root == 0) {
 			r = l = nullptr;
 			return;
 		}
+		root = own(root);
+		push(root);
 
 		long long leftSize = (root->left ? root->left->size : 0);
 
@@ -94,6 +452,7 @@ private:
 	}
 
 	void merge(nodePtr& res, nodePtr l, nodePtr r) {
+		stats_.merges++;
 		if (r == 0) {
 			res = l;
 			return;
@@ -103,13 +462,15 @@ private:
 			return;
 		}
 		if (r->priority >= l->priority) {
-
+			r = own(r);
+			push(r);
 			merge(r->left, l, r->left);
 			res = r;
 			update(res);
 		}
 		else {
-
+			l = own(l);
+			push(l);
 			merge(l->right, l->right, r);
 			res = l;
 			update(res);
@@ -120,8 +481,13 @@ private:
 public:
 
 	ImplicitTreap() : root(nullptr) {}
-	ImplicitTreap(T v) : root(new node(v)) {}
-	ImplicitTreap(const ImplicitTreap& T) : root(copySubtree(T.root)){}
+	ImplicitTreap(T v) : root(new node(v)) { stats_.allocs++; }
+	// O(1): both treaps share every node until one of them edits it
+	ImplicitTreap(const ImplicitTreap& other) : root(share(other.root)){}
+	// lets pybind11 return copy()/cut() results without cloning them a second time
+	ImplicitTreap(ImplicitTreap&& other) noexcept : root(other.root), stats_(other.stats_) {
+		other.root = nullptr;
+	}
 
 
 
@@ -133,7 +499,7 @@ public:
 
 
 	void print() {
-		inOrderTraversal(root);
+		inOrderTraversal();
 		std::cout << endl;
 	}
 
@@ -146,11 +512,31 @@ public:
 		split(root, pos, L, R);
 
 		nodePtr N = new node(val);
+		stats_.allocs++;
 
 		merge(L, L, N);
 		merge(root, L, R);
 	}
 
+	// whole run of chars with one split and two merges: the new chars are merged into
+	// their own treap first, so a burst of typed keys costs one pass over the spine
+	void insert_text(int pos, const std::basic_string<T>& text) {
+		if (pos < 0 || pos > size()) {
+			std::cerr << "Insert position out of range";
+			return;
+		}
+		nodePtr N = nullptr;
+		for (const T& c : text) {
+			nodePtr x = new node(c);
+			stats_.allocs++;
+			merge(N, N, x);
+		}
+		nodePtr L, R;
+		split(root, pos, L, R);
+		merge(L, L, N);
+		merge(root, L, R);
+	}
+
 	void insert_last(T val) {
 		insert(size(), val);
 	}
@@ -163,7 +549,7 @@ public:
 		nodePtr L, R;
 		split(root, pos, L, R);
 
-		nodePtr N = copySubtree(t.root);
+		nodePtr N = share(t.root);
 
 		merge(L, L, N);
 		merge(root, L, R);
@@ -207,7 +593,7 @@ public:
 		split(second, fpos - ipos, second, third);
 
 		ImplicitTreap result;
-		result.root = copySubtree(second);
+		result.root = share(second);
 
 		nodePtr temp = nullptr;
 		merge(temp, first, second);
@@ -234,6 +620,39 @@ public:
 		return result;
 	}
 
+	// applies a char map to [ipos, fpos) in O(log N): only the root of the split-off range
+	// is mapped and tagged, the rest of the range gets the map when an edit walks through it
+	void transform(int ipos, int fpos, const CharMap<T>& map) {
+		if (ipos < 0 || fpos > size() || ipos >= fpos) {
+			std::cerr << "Invalid range for transform";
+			return;
+		}
+		nodePtr first = nullptr, second = nullptr, third = nullptr;
+		split(root, ipos, first, second);
+		split(second, fpos - ipos, second, third);
+
+		second = own(second);
+		apply_tag(second, std::make_shared<const CharMap<T>>(map));
+
+		nodePtr temp = nullptr;
+		merge(temp, first, second);
+		merge(root, temp, third);
+	}
+
+	// chars [ipos, fpos) without materializing the rest of the buffer
+	std::basic_string<T> substr(int ipos, int fpos) const {
+		std::basic_string<T> result;
+		ipos = std::max(ipos, 0);
+		fpos = std::min(fpos, (int)size());
+		if (ipos >= fpos) return result;
+		result.reserve(fpos - ipos);
+		for_each_from(ipos, [&](const T& c) {
+			result.push_back(c);
+			return (int)result.size() < fpos - ipos;
+		});
+		return result;
+	}
+
 	void delete_range(int ipos, int fpos){
 		ImplicitTreap var = cut(ipos, fpos);
 	}
@@ -245,51 +664,364 @@ public:
 		return _search(root, k);
 	}
 
-	int check_equal_so_far(const string &other , bool& complete) {
-		int n = size();
-		int other_len = (int)other.length();
+	int check_equal_so_far(const std::basic_string<T>& other, bool& complete) const {
+		return check_equal_so_far(other.data(), (int)other.length(), complete);
+	}
+
+	// raw buffer version, lets the binding compare against a python bytes object without copying it
+	// single in-order walk that stops at the first mismatch
+	int check_equal_so_far(const T* other, int other_len, bool& complete) const {
+		int i = 0;
+		int first_error = -1;
+		for_each([&](const T& c) {
+			if (i >= other_len || c != other[i]) {
+				first_error = i;
+				return false;
+			}
+			i++;
+			return true;
+		});
+		if (first_error != -1) return first_error;
+		complete = ((int)size() == other_len);
+		return -1;
+	}
+
+	// writes the buffer into out[0, size()) in order, pending maps applied
+	void write_to(T* out) const {
+		for_each([&](const T& c) {
+			*out++ = c;
+			return true;
+		});
+	}
+
+	// treap over data[0, n) in O(N): nodes come in text order, so the tree is the Cartesian
+	// tree of their random priorities, built with a stack of its right spine. No split or
+	// merge per char; a node is finished (and update()d) when it leaves the spine.
+	static ImplicitTreap from_array(const T* data, int n) {
+		ImplicitTreap t;
+		std::vector<nodePtr> spine;
 		for (int i = 0; i < n; i++) {
-			if (search(i) != other[i]) return i;
+			nodePtr x = new node(data[i]);
+			nodePtr last = nullptr;
+			while (!spine.empty() && spine.back()->priority < x->priority) {
+				last = spine.back();
+				spine.pop_back();
+				t.update(last);
+			}
+			x->left = last;
+			if (!spine.empty()) spine.back()->right = x;
+			spine.push_back(x);
+		}
+		while (!spine.empty()) {
+			t.update(spine.back());
+			t.root = spine.front();
+			spine.pop_back();
 		}
-		complete = (n == other_len);
-    	return -1;
+		t.stats_.allocs += n;
+		return t;
+	}
+
+	// feeds the whole buffer through a Scorer (correct count, first error, mismatch bitmap)
+	void score(Scorer<T>& scorer) const {
+		for_each([&](const T& c) {
+			scorer.feed(c);
+			return true;
+		});
+	}
+
+	// Tk style position of an offset: (line starting at 1, column starting at 0), O(log N)
+	std::pair<int, int> offset_to_linecol(int offset) const {
+		offset = std::max(0, std::min(offset, (int)size()));
+		int line = newlines_before(offset);
+		int line_start = line ? nth_newline(line - 1) + 1 : 0;
+		return std::make_pair(line + 1, offset - line_start);
+	}
+
+	// offset of (line, col); like Tk, a line past the end clamps to the end of the text
+	// and a column past the end of its line clamps to the line end, O(log N)
+	int linecol_to_offset(int line, int col) const {
+		int n = (int)size();
+		if (line < 1) return 0;
+		int lines = root ? root->lines : 0;
+		if (line - 1 > lines) return n;
+		int line_start = line > 1 ? nth_newline(line - 2) + 1 : 0;
+		int line_end = line - 1 < lines ? nth_newline(line - 1) : n;
+		return line_start + std::max(0, std::min(col, line_end - line_start));
+	}
+
+	// first occurrence of pattern starting at or after start, -1 if none (or pattern is empty)
+	// streams the buffer through KMP from start, nothing is materialized
+	int find(const std::basic_string<T>& pattern, int start = 0) const {
+		if (pattern.empty() || start < 0 || start >= (int)size()) return -1;
+		Matcher<T> m(pattern);
+		int pos = start;
+		int found = -1;
+		for_each_from(start, [&](const T& c) {
+			pos++;
+			if (m.feed(c)) {
+				found = pos - (int)pattern.size();
+				return false;
+			}
+			return true;
+		});
+		return found;
+	}
+
+	// start of every occurrence of pattern (overlapping ones included), in one walk
+	std::vector<int> find_all(const std::basic_string<T>& pattern) const {
+		std::vector<int> found;
+		if (pattern.empty()) return found;
+		Matcher<T> m(pattern);
+		int pos = 0;
+		for_each([&](const T& c) {
+			pos++;
+			if (m.feed(c)) found.push_back(pos - (int)pattern.size());
+			return true;
+		});
+		return found;
+	}
+
+	// memory held by this treap alone vs. shared with other treaps (clipboards, the buffer)
+	pybind11::dict memory() const {
+		long long n = size();
+		long long owned = ownedNodes(root);
+		pybind11::dict d;
+		d["nodes"] = n;
+		d["owned_nodes"] = owned;
+		d["shared_nodes"] = n - owned;
+		d["owned_bytes"] = owned * (long long)sizeof(node);
+		return d;
+	}
+
+	// live nodes are the physical nodes this treap reaches, shared copy-on-write ones counted
+	// once (a pasted clipboard is one copy however often it was pasted); bytes include the
+	// nodes shared with other treaps, memory() tells how many of them only this one holds
+	pybind11::dict stats() const {
+		int maxDepth = 0;
+		long long depthSum = 0;
+		depthStats(root, 1, maxDepth, depthSum);
+		long long n = size();
+		long long live = uniqueNodes(root);
+
+		pybind11::dict d;
+		d["splits"] = stats_.splits;
+		d["merges"] = stats_.merges;
+		d["allocs"] = stats_.allocs;
+		d["frees"] = stats_.frees;
+		d["size"] = n;
+		d["live_nodes"] = live;
+		d["bytes"] = live * (long long)sizeof(node) + (long long)sizeof(ImplicitTreap);
+		d["max_depth"] = maxDepth;
+		d["avg_depth"] = n ? (double)depthSum / n : 0.0;
+		return d;
+	}
+
+	void reset_stats() {
+		stats_ = Stats();
 	}
 
 	ImplicitTreap& operator=(const ImplicitTreap& other) {
 		if (this != &other) {
-			clear(root);
-			root = copySubtree(other.root);
+			nodePtr old = root;
+			root = share(other.root);
+			clear(old);
 		}
 		return *this;
 	}
 
-	string to_string() {
-		string result = "";
-		for (long long i = 0; i < size(); i++) {
-			result += search(i);
-		}
+	std::basic_string<T> to_string() const {
+		std::basic_string<T> result;
+		result.reserve(size());
+		for_each([&](const T& c) {
+			result.push_back(c);
+			return true;
+		});
 		return result;
 	}
 
 };
 
-PYBIND11_MODULE(implicit_treap, m) {
-	pybind11::class_<ImplicitTreap<char>>(m, "implicittreap")
+// (correct, first_error, bitmap bytes or None) for the python side
+template<typename T>
+static pybind11::tuple score_tuple(const Scorer<T>& s, const std::string* bitmap) {
+	pybind11::object bits = pybind11::none();
+	if (bitmap) bits = pybind11::bytes(*bitmap);
+	return pybind11::make_tuple(s.correct, s.first_error, bits);
+}
+
+// bytes as an array of T without copying: utf-8 for char, native-endian utf-32 for char32_t
+// (PassageTarget.encoded / encoded32)
+template<typename T>
+static const T* bytes_data(const pybind11::bytes& b) {
+	return reinterpret_cast<const T*>(PyBytes_AS_STRING(b.ptr()));
+}
+
+template<typename T>
+static int bytes_len(const pybind11::bytes& b) {
+	return (int)(PyBytes_GET_SIZE(b.ptr()) / sizeof(T));
+}
+
+// buffer text -> python str: utf-8 decode for the byte treap, a single widening copy for
+// the code point treap (no utf-32 codec round trip)
+static pybind11::str to_py(const std::string& s) {
+	return pybind11::str(s);
+}
+
+static pybind11::str to_py(const std::u32string& s) {
+	PyObject* o = PyUnicode_FromKindAndData(PyUnicode_4BYTE_KIND, s.data(), (Py_ssize_t)s.size());
+	if (!o) throw pybind11::error_already_set();
+	return pybind11::reinterpret_steal<pybind11::str>(o);
+}
+
+// dumps() layout: magic, format version, element size, reserved, element count, then the
+// elements themselves in native byte order (utf-8 bytes / utf-32 code units)
+static const char DUMP_MAGIC[4] = {'P', 'P', 'T', 'R'};
+static const unsigned char DUMP_VERSION = 1;
+static const size_t DUMP_HEADER = 12;
+
+template<typename T>
+static pybind11::bytes dump_treap(const ImplicitTreap<T>& t) {
+	size_t n = (size_t)t.size();
+	PyObject* o = PyBytes_FromStringAndSize(nullptr, (Py_ssize_t)(DUMP_HEADER + n * sizeof(T)));
+	if (!o) throw pybind11::error_already_set();
+	char* out = PyBytes_AS_STRING(o);
+	uint32_t count = (uint32_t)n;
+	memcpy(out, DUMP_MAGIC, 4);
+	out[4] = (char)DUMP_VERSION;
+	out[5] = (char)sizeof(T);
+	out[6] = out[7] = 0;
+	memcpy(out + 8, &count, 4);
+	{
+		pybind11::gil_scoped_release release;
+		t.write_to(reinterpret_cast<T*>(out + DUMP_HEADER));
+	}
+	return pybind11::reinterpret_steal<pybind11::bytes>(o);
+}
+
+template<typename T>
+static ImplicitTreap<T> load_treap(const pybind11::bytes& b) {
+	const char* in = PyBytes_AS_STRING(b.ptr());
+	size_t len = (size_t)PyBytes_GET_SIZE(b.ptr());
+	if (len < DUMP_HEADER || memcmp(in, DUMP_MAGIC, 4) != 0 || (unsigned char)in[4] != DUMP_VERSION)
+		throw std::invalid_argument("Invalid treap dump");
+	if ((size_t)in[5] != sizeof(T))
+		throw std::invalid_argument("Invalid treap dump: element size does not match this treap type");
+	uint32_t count;
+	memcpy(&count, in + 8, 4);
+	if (len != DUMP_HEADER + (size_t)count * sizeof(T))
+		throw std::invalid_argument("Invalid treap dump: truncated");
+	// the payload is 4-aligned (bytes data is 8-aligned, the header is 12 bytes)
+	const T* data = reinterpret_cast<const T*>(in + DUMP_HEADER);
+	pybind11::gil_scoped_release release;
+	return ImplicitTreap<T>::from_array(data, (int)count);
+}
+
+// scores typed text against the target without building any per-char python objects
+template<typename T>
+static void bind_score(pybind11::module& m, const char* name) {
+	m.def(name, [](const pybind11::bytes& typed, const pybind11::bytes& target, bool bitmap) {
+		const T* t = bytes_data<T>(typed);
+		int n = bytes_len<T>(typed);
+		std::string bits(bitmap ? (n + 7) / 8 : 0, '\0');
+		Scorer<T> s(bytes_data<T>(target), bytes_len<T>(target), bitmap ? &bits : nullptr);
+		{
+			pybind11::gil_scoped_release release;
+			for (int i = 0; i < n; i++) s.feed(t[i]);
+		}
+		return score_tuple(s, bitmap ? &bits : nullptr);
+	}, pybind11::arg("typed"), pybind11::arg("target"), pybind11::arg("bitmap") = false);
+}
+
+// one binding for both element types; positions are in elements of T (bytes of utf-8 for
+// implicittreap, code points for implicittreap32, the same offsets Tk uses)
+template<typename T>
+static void bind_treap(pybind11::module& m, const char* name) {
+	typedef ImplicitTreap<T> Treap;
+	typedef std::basic_string<T> String;
+
+	pybind11::class_<Treap>(m, name)
 		.def(pybind11::init<>())
-		.def("insert", &ImplicitTreap<char>::insert)
-		.def("erase", &ImplicitTreap<char>::erase)
-		.def("copy", &ImplicitTreap<char>::copy)
-		.def("cut", &ImplicitTreap<char>::cut)
-		.def("size", &ImplicitTreap<char>::size)
-		.def("search", &ImplicitTreap<char>::search)
-		.def("delete_range", &ImplicitTreap<char>::delete_range)
-		.def("print", &ImplicitTreap<char>::print)
-		.def("insert_last", &ImplicitTreap<char>::insert_last)
-		.def("paste", &ImplicitTreap<char>::paste)
-		.def("check_equal_so_far", [](ImplicitTreap<char>& self, const std::string& other) {
+		.def("insert", &Treap::insert)
+		.def("erase", &Treap::erase)
+		.def("copy", &Treap::copy)
+		.def("cut", &Treap::cut)
+		.def("size", &Treap::size)
+		.def("search", &Treap::search)
+		.def("delete_range", &Treap::delete_range)
+		.def("print", &Treap::print)
+		.def("insert_last", &Treap::insert_last)
+		.def("insert_text", &Treap::insert_text)
+		.def("paste", &Treap::paste)
+		// bytes overload first: the std::string caster would also accept bytes, but by copying them
+		// the GIL is released during the walk, so a checker thread does not block the Tk thread;
+		// the caller must not edit this treap concurrently (check a snapshot() from other threads)
+		.def("check_equal_so_far", [](Treap& self, const pybind11::bytes& other) {
+            bool complete = false;
+            const T* data = bytes_data<T>(other);
+            int len = bytes_len<T>(other);
+            int first_error;
+            {
+                pybind11::gil_scoped_release release;
+                first_error = self.check_equal_so_far(data, len, complete);
+            }
+            return pybind11::make_tuple(first_error, complete);
+        })
+		.def("check_equal_so_far", [](Treap& self, const String& other) {
             bool complete = false;
             int first_error = self.check_equal_so_far(other, complete);
             return pybind11::make_tuple(first_error, complete);
         })
-		.def("to_string", &ImplicitTreap<char>::to_string);
-}
\ No newline at end of file
+		.def("to_string", [](const Treap& self) { return to_py(self.to_string()); })
+		.def("score", [](const Treap& self, const pybind11::bytes& target, bool bitmap) {
+			std::string bits(bitmap ? (self.size() + 7) / 8 : 0, '\0');
+			Scorer<T> s(bytes_data<T>(target), bytes_len<T>(target), bitmap ? &bits : nullptr);
+			{
+				pybind11::gil_scoped_release release;
+				self.score(s);
+			}
+			return score_tuple(s, bitmap ? &bits : nullptr);
+		}, "(correct chars, first mismatch or -1, mismatch bitmap or None) against target bytes",
+			pybind11::arg("target"), pybind11::arg("bitmap") = false)
+		.def("offset_to_linecol", &Treap::offset_to_linecol,
+			"(line from 1, column from 0) of an offset, like a Tk text index", pybind11::arg("offset"))
+		.def("linecol_to_offset", &Treap::linecol_to_offset,
+			"Offset of a (line, column) position, clamped like Tk", pybind11::arg("line"), pybind11::arg("col"))
+		.def("upper", [](Treap& self, int ipos, int fpos) {
+			self.transform(ipos, fpos, CharMap<T>::ascii_case('u'));
+		}, "Upper-cases [ipos, fpos) lazily, O(log N)")
+		.def("lower", [](Treap& self, int ipos, int fpos) {
+			self.transform(ipos, fpos, CharMap<T>::ascii_case('l'));
+		}, "Lower-cases [ipos, fpos) lazily, O(log N)")
+		.def("toggle_case", [](Treap& self, int ipos, int fpos) {
+			self.transform(ipos, fpos, CharMap<T>::ascii_case('t'));
+		}, "Swaps the case of [ipos, fpos) lazily, O(log N)")
+		.def("replace_chars", [](Treap& self, int ipos, int fpos, const String& src, const String& dst) {
+			self.transform(ipos, fpos, CharMap<T>::replace(src, dst));
+		}, "Maps src[i] to dst[i] over [ipos, fpos) lazily, O(log N)",
+			pybind11::arg("ipos"), pybind11::arg("fpos"), pybind11::arg("src"), pybind11::arg("dst"))
+		.def("substr", [](const Treap& self, int ipos, int fpos) { return to_py(self.substr(ipos, fpos)); })
+		.def("find", &Treap::find, "First occurrence of pattern at or after start, -1 if none",
+			pybind11::arg("pattern"), pybind11::arg("start") = 0)
+		.def("find_all", &Treap::find_all, "Start of every occurrence of pattern",
+			pybind11::arg("pattern"))
+		.def("snapshot", [](const Treap& self) { return Treap(self); },
+			"Independent copy of the whole buffer, O(1): nodes are shared copy-on-write")
+		.def("dumps", &dump_treap<T>, "Compact binary copy of the buffer (header + raw elements), O(N)")
+		.def_static("loads", &load_treap<T>, "Treap from dumps() output, built in O(N) without splits or merges",
+			pybind11::arg("data"))
+		.def(pybind11::pickle(
+			[](const Treap& self) { return dump_treap<T>(self); },
+			[](const pybind11::bytes& data) { return load_treap<T>(data); }))
+		.def("memory", &Treap::memory)
+		.def("stats", &Treap::stats)
+		.def("reset_stats", &Treap::reset_stats);
+}
+
+PYBIND11_MODULE(implicit_treap, m) {
+	// utf-8 bytes: the original buffer, one element per byte
+	bind_score<char>(m, "score");
+	bind_treap<char>(m, "implicittreap");
+	// one element per code point, indices match Python str and Tk "chars" for any text
+	bind_score<char32_t>(m, "score32");
+	bind_treap<char32_t>(m, "implicittreap32");
+}
@@ -46,6 +46,32 @@ public:
     }
 };
 
+// stats() entry for one of the two treaps, counters are per treap (see treap::Stats)
+template<class dataType>
+pybind11::dict treapStats(treap<dataType>& t) {
+    typedef typename treap<dataType>::Node Node;
+    const typename treap<dataType>::Stats& s = t.stats;
+    int maxDepth = 0;
+    long long depthSum = 0;
+    t.depthStats(maxDepth, depthSum);
+    int nodes = t.isEmpty() ? 0 : t.size();
+
+    pybind11::dict d;
+    d["allocs"] = s.allocs;
+    d["frees"] = s.frees;
+    d["live_nodes"] = s.liveNodes;   // all live nodes of this treap, leaked copies included
+    d["tree_nodes"] = nodes;         // nodes reachable from this treap
+    d["bytes"] = s.liveNodes * (long long)sizeof(Node);
+    d["inserts"] = s.inserts;
+    d["erases"] = s.erases;
+    d["rotations"] = s.rotations;
+    d["merges"] = s.merges;
+    d["splits"] = s.splits;
+    d["max_depth"] = maxDepth;
+    d["avg_depth"] = nodes ? (double)depthSum / nodes : 0.0;
+    return d;
+}
+
 
 PYBIND11_MODULE(leaderboard_treap, m) {
      // defining the leaderboard time class variables as the getTop10 function returns a pointer to an array of Leaderboard_time objects
@@ -65,5 +91,15 @@ PYBIND11_MODULE(leaderboard_treap, m) {
                 result.append(top10[i]);
             }
             return result;
-        }, "A function to get the top 10 players");
+        }, "A function to get the top 10 players")
+        .def("stats", [](leaderboard_treap& self) {
+            pybind11::dict d;
+            d["time"] = treapStats(self.time_Leaderboard);
+            d["player"] = treapStats(self.player_Times);
+            return d;
+        }, "Operation counters, node counts and depth of both treaps")
+        .def("reset_stats", [](leaderboard_treap& self) {
+            self.time_Leaderboard.resetStats();
+            self.player_Times.resetStats();
+        }, "Zeroes the operation counters (live node counts are kept)");
 }
\ No newline at end of file
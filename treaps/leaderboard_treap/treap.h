@@ -22,7 +22,57 @@ public:
         }
     };
 
+    // Operation counters of this treap (plain integers, cheap enough to leave on).
+    // liveNodes is never reset: it counts every Node this treap allocated and did not
+    // delete yet, including the copies leaked by split()/getTopK().
+    struct Stats {
+        long long allocs = 0;
+        long long frees = 0;
+        long long liveNodes = 0;
+        long long inserts = 0;
+        long long erases = 0;
+        long long rotations = 0;
+        long long merges = 0;
+        long long splits = 0;
+    };
+    Stats stats;
+
+    void resetStats() {
+        long long live = stats.liveNodes;
+        stats = Stats();
+        stats.liveNodes = live;
+    }
+
+    // max depth and sum of node depths (root has depth 1), O(N)
+    void depthStats(int& maxDepth, long long& depthSum) {
+        maxDepth = 0;
+        depthSum = 0;
+        depthStats(root, 1, maxDepth, depthSum);
+    }
+
 private:
+    // every Node of this treap is made here, so the allocation lands in its own stats
+    Node* newNode(dataType key) {
+        stats.allocs++;
+        stats.liveNodes++;
+        return new Node(key);
+    }
+    void deleteNode(Node* node) {
+        stats.frees++;
+        stats.liveNodes--;
+        delete node;
+    }
+    // counters of a temporary treap whose nodes this one leaked or took over
+    void absorbStats(const Stats& other) {
+        stats.allocs += other.allocs;
+        stats.frees += other.frees;
+        stats.liveNodes += other.liveNodes;
+        stats.inserts += other.inserts;
+        stats.erases += other.erases;
+        stats.rotations += other.rotations;
+        stats.merges += other.merges;
+        stats.splits += other.splits;
+    }
     Node* rightRotate(Node* root);
     Node* leftRotate(Node* root);
     Node* copyTree(Node* node);
@@ -32,6 +82,7 @@ private:
     void updateSize(Node* n);
     Node* getK(Node* root, int k);
     dataType* convertToArray(Node* root);
+    void depthStats(Node* node, int depth, int& maxDepth, long long& depthSum);
 
     // FIX 1: Removed 'treap<dataType>::' qualifier from inside the class
     void fillArray(Node* root, dataType* arr, int& index);
@@ -64,6 +115,15 @@ public:
 
 // --- Implementations ---
 
+template<class dataType>
+void treap<dataType>::depthStats(Node* node, int depth, int& maxDepth, long long& depthSum) {
+    if (node == nullptr) return;
+    if (depth > maxDepth) maxDepth = depth;
+    depthSum += depth;
+    depthStats(node->left, depth + 1, maxDepth, depthSum);
+    depthStats(node->right, depth + 1, maxDepth, depthSum);
+}
+
 template<class dataType>
 treap<dataType>::treap() {
     root = nullptr;
@@ -77,6 +137,7 @@ bool treap<dataType>::isEmpty() {
 // Right Rotation
 template<class dataType>
 typename treap<dataType>::Node* treap<dataType>::rightRotate(Node* root) {
+    stats.rotations++;
     Node* newRoot = root->left;
     root->left = newRoot->right;
     newRoot->right = root;
@@ -90,6 +151,7 @@ typename treap<dataType>::Node* treap<dataType>::rightRotate(Node* root) {
 // Left Rotation
 template<class dataType>
 typename treap<dataType>::Node* treap<dataType>::leftRotate(Node* root) {
+    stats.rotations++;
     Node* newRoot = root->right;
     root->right = newRoot->left;
     newRoot->left = root;
@@ -103,7 +165,7 @@ typename treap<dataType>::Node* treap<dataType>::leftRotate(Node* root) {
 template<class dataType>
 typename treap<dataType>::Node* treap<dataType>::insert(Node* root, dataType key) {
     if (root == nullptr) {
-        return new Node(key);
+        return newNode(key);
     }
     if (key <= root->key) {
         root->left = insert(root->left, key);
@@ -122,8 +184,9 @@ typename treap<dataType>::Node* treap<dataType>::insert(Node* root, dataType key
 
 template<class dataType>
 void treap<dataType>::insert(dataType key) {
+    stats.inserts++;
     if (this->isEmpty()) {
-        root = new Node(key);
+        root = newNode(key);
         return;
     }
     root = insert(root, key);
@@ -151,6 +214,7 @@ typename treap<dataType>::Node* treap<dataType>::search(dataType key) {
 
 template<class dataType>
 void treap<dataType>::erase(dataType key) {
+    stats.erases++;
     root = erase(root, key);
 }
 
@@ -168,13 +232,13 @@ typename treap<dataType>::Node* treap<dataType>::erase(Node* root, dataType key)
     }
     else if (root->left == nullptr) {
         Node* temp = root->right;
-        delete(root);
+        deleteNode(root);
         root = temp;
         updateSize(root);
     }
     else if (root->right == nullptr) {
         Node* temp = root->left;
-        delete(root);
+        deleteNode(root);
         root = temp;
         updateSize(root);
     }
@@ -194,9 +258,9 @@ typename treap<dataType>::Node* treap<dataType>::erase(Node* root, dataType key)
 template<class dataType>
 typename treap<dataType>::Node* treap<dataType>::insert(Node* root, dataType key, int priority) {
     if (root == nullptr) {
-        Node* newNode = new Node(key);
-        newNode->priority = priority;
-        return newNode;
+        Node* node = newNode(key);
+        node->priority = priority;
+        return node;
     }
     if (key <= root->key) {
         root->left = insert(root->left, key, priority);
@@ -216,12 +280,12 @@ typename treap<dataType>::Node* treap<dataType>::insert(Node* root, dataType key
 template<class dataType>
 typename treap<dataType>::Node* treap<dataType>::copyTree(Node* node) {
     if (node == nullptr) return nullptr;
-    Node* newNode = new Node(node->key);
-    newNode->priority = node->priority;
-    newNode->subtreeSize = node->subtreeSize;
-    newNode->left = copyTree(node->left);
-    newNode->right = copyTree(node->right);
-    return newNode;
+    Node* copy = newNode(node->key);
+    copy->priority = node->priority;
+    copy->subtreeSize = node->subtreeSize;
+    copy->left = copyTree(node->left);
+    copy->right = copyTree(node->right);
+    return copy;
 }
 
 template<class dataType>
@@ -233,6 +297,7 @@ template<class dataType>
 tuple<typename treap<dataType>::Node*, typename treap<dataType>::Node*> treap<dataType>::split(dataType pivot) {
     // Note: This implementation copies the tree, splits the copy, and returns pointers to the copy.
     // Be careful with memory management here as 'newtreap' goes out of scope.
+    stats.splits++;
     treap<dataType> newtreap = treap(*this);
     newtreap.root = newtreap.insert(newtreap.root, pivot, -1);
 
@@ -247,6 +312,9 @@ tuple<typename treap<dataType>::Node*, typename treap<dataType>::Node*> treap<da
     newtreap.root->left = nullptr;
     newtreap.root->right = nullptr;
 
+    // the copy's nodes (and its counters) now belong to this treap's books
+    absorbStats(newtreap.stats);
+
     return make_tuple(l, r);
 }
 
@@ -258,6 +326,8 @@ typename treap<dataType>::Node* treap<dataType>::rangeQuery(dataType min, dataTy
     treap<dataType> temp;
     temp.root = right;
     tuple<Node*, Node*> y = temp.split(max);
+    // right was counted when this treap's split() copied it; only temp's own work is new
+    absorbStats(temp.stats);
 
     Node* middle = get<0>(y);
     // Important: Prevent temp destructor from deleting 'middle'
@@ -281,6 +351,7 @@ void treap<dataType>::inorder() {
 
 template<class dataType>
 typename treap<dataType>::Node* treap<dataType>::merge(Node* a, Node* b) {
+    stats.merges++;
     if (a == nullptr) return b;
     if (b == nullptr) return a;
 